@@ -2,132 +2,1275 @@
 # -*- coding: utf-8 -*-
 """
 Script de Backup Automático do Banco de Dados
-Cria backups do banco de dados estoque.db com timestamp
+Cria backups do banco SQLite com timestamp, com o banco em uso
+
+A cópia usa a API de backup do SQLite (sqlite3.Connection.backup), um bloco de páginas
+por passo: entre os passos o banco fica livre para quem escreve, e a cópia é sempre um
+banco consistente (inclui o conteúdo do -wal no modo WAL). Depois a cópia é comprimida
+(gzip, ou zstd com o pacote zstandard) e um manifesto JSON registra tamanhos e SHA-256
+
+Com o PostgreSQL configurado em database.py (DATABASE_URL), cada tabela sai por
+COPY ... TO STDOUT direto para um arquivo comprimido, várias tabelas em paralelo, todas
+do mesmo snapshot (pg_export_snapshot); a restauração usa COPY ... FROM STDIN
+
+Uso:
+    python backup.py                          # backup em backups/ com gzip
+    python backup.py --compressao zstd        # requer: pip install zstandard
+    python backup.py --paginas-por-passo 256 --pausa-ms 10
+    python backup.py --incremental            # só os chunks que mudaram, em backups/chunks/
+    python backup.py --restaurar backups/estoque_incremental_20250101_230000.json --destino restaurado.db
+    python backup.py --workers 4              # PostgreSQL: tabelas exportadas em paralelo
+    python backup.py --restaurar backups/estoque_pg_20250101_230000.json --forcar
+    python backup.py --listar                 # pelo catálogo (backups/catalogo.db)
+    python backup.py --gfs --diarios 7 --semanais 4 --mensais 12
+    python backup.py --apenas-retencao --gfs --simular
 """
 
-import shutil
+import argparse
+import gzip
+import hashlib
+import json
 import os
-from datetime import datetime
+import shutil
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from catalogo_backups import (
+    abrir_catalogo, caminho_catalogo, listar_catalogo, registrar_backup, remover_backups,
+    selecionar_gfs, ultimo_backup,
+)
+
+
+# Páginas copiadas por passo (1024 páginas de 4 KB = 4 MB); o banco fica livre entre os passos
+PAGINAS_POR_PASSO = 1024
+
+# Pausa entre os passos (segundos), para dar vez a quem escreve em bancos muito ativos
+PAUSA_ENTRE_PASSOS = 0.0
+
+# Escritas de outras conexões reiniciam a cópia; depois de tantos reinícios, copia em um passo só
+MAX_REINICIOS = 3
+
+# Bloco de leitura/escrita da compressão
+TAMANHO_BLOCO = 1024 * 1024
+
+EXTENSOES = {'gzip': '.gz', 'zstd': '.zst', 'nenhuma': ''}
+
+PREFIXO_BACKUP = 'estoque_backup_'
+
+# Backups incrementais: manifestos com a lista de chunks, guardados por SHA-256 em backups/chunks/
+PREFIXO_INCREMENTAL = 'estoque_incremental_'
+PASTA_CHUNKS = 'chunks'
+
+# Páginas por chunk (64 páginas de 4 KB = 256 KB): menor guarda menos a cada backup, com mais arquivos
+PAGINAS_POR_CHUNK = 64
+
+# Backups do PostgreSQL: manifesto estoque_pg_*.json e uma pasta com um arquivo COPY por tabela
+PREFIXO_POSTGRESQL = 'estoque_pg_'
+
+# Tabelas exportadas ao mesmo tempo (uma conexão cada, além da que segura o snapshot)
+WORKERS_COPY = 4
+
+# Calculada pelos triggers a partir de equipments: não vai no backup, é recalculada na restauração
+TABELAS_DERIVADAS = ('stock_summary',)
+
+# Preenchidas pelas migrações num banco novo; não contam como "destino com dados"
+TABELAS_DAS_MIGRACOES = ('schema_version', 'change_sequence')
+
+# Retenção GFS padrão: backups diários da última semana, semanais do último mês, mensais do último ano
+DIARIOS = 7
+SEMANAIS = 4
+MENSAIS = 12
+
+
+class _MuitosReinicios(Exception):
+    """A cópia foi reiniciada mais vezes que MAX_REINICIOS"""
+
+
+class _EscritaComHash:
+    """Arquivo de saída que calcula o SHA-256 e o tamanho do que é escrito"""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.sha256 = hashlib.sha256()
+        self.tamanho = 0
+
+    def write(self, dados):
+        self.sha256.update(dados)
+        self.tamanho += len(dados)
+        return self.arquivo.write(dados)
+
+    def flush(self):
+        self.arquivo.flush()
+
+
+class _EscritaEmBlocos:
+    """Junta escritas pequenas (o COPY entrega uma linha por vez) em blocos de TAMANHO_BLOCO"""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.buffer = bytearray()
+
+    def write(self, dados):
+        self.buffer += dados
+        if len(self.buffer) >= TAMANHO_BLOCO:
+            self.flush()
+        return len(dados)
+
+    def flush(self):
+        if self.buffer:
+            self.arquivo.write(bytes(self.buffer))
+            self.buffer.clear()
+
+
+class _LeituraComHash:
+    """Arquivo de entrada que calcula o SHA-256 e o tamanho do que é lido"""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.sha256 = hashlib.sha256()
+        self.tamanho = 0
 
+    def read(self, tamanho=-1):
+        dados = self.arquivo.read(tamanho)
+        self.sha256.update(dados)
+        self.tamanho += len(dados)
+        return dados
+
+
+def _caminho_banco_configurado() -> str:
+    """Caminho do banco SQLite configurado em database.py (DATABASE_URL / SQLITE_PATH)"""
+    from database import engine
+
+    if engine.dialect.name != 'sqlite':
+        raise ValueError("O banco configurado não é SQLite; este backup usa a API de backup do SQLite")
+    return engine.url.database
+
+
+def _verificar_compressao(compressao: str) -> str:
+    """Troca zstd por gzip se o pacote zstandard não estiver instalado"""
+    if compressao == 'zstd':
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            print("⚠️ Pacote zstandard não instalado (pip install zstandard), usando gzip")
+            return 'gzip'
+    return compressao
+
+
+def _abrir_compressor(saida, compressao: str, nivel: int = None):
+    """Retorna o escritor que comprime para `saida` (gzip, zstd ou sem compressão)"""
+    if compressao == 'gzip':
+        return gzip.GzipFile(fileobj=saida, mode='wb', compresslevel=nivel or 6, mtime=0)
+
+    if compressao == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=nivel or 3, threads=-1).stream_writer(saida, closefd=False)
+
+    return None
+
+
+def copiar_banco(origem: str, destino: str, paginas_por_passo: int = PAGINAS_POR_PASSO,
+                 pausa: float = PAUSA_ENTRE_PASSOS, progresso=None) -> dict:
+    """
+    Copia o banco com a API de backup do SQLite, `paginas_por_passo` páginas por passo
+
+    No modo WAL a cópia lê um snapshot fixo do banco e nunca reinicia. No modo rollback,
+    uma escrita de outra conexão durante a cópia faz o SQLite reiniciar do começo; depois de
+    MAX_REINICIOS o restante é copiado em um passo só, e as escritas esperam até o fim
+
+    Args:
+        progresso: função (paginas_copiadas, total_paginas) chamada após cada passo
+
+    Returns:
+        dict: {'paginas', 'tamanho_pagina', 'reinicios', 'passo_unico', 'modo_wal'}
+    """
+    estado = {'restante': None, 'reinicios': 0, 'limitar': True}
+
+    def _apos_passo(status, restante, total):
+        if estado['restante'] is not None and restante > estado['restante']:
+            estado['reinicios'] += 1
+            if estado['limitar'] and estado['reinicios'] > MAX_REINICIOS:
+                raise _MuitosReinicios()
+        estado['restante'] = restante
+
+        if progresso:
+            progresso(total - restante, total)
+        if pausa:
+            time.sleep(pausa)
+
+    conexao_origem = sqlite3.connect(origem, timeout=30)
+    try:
+        modo_wal = conexao_origem.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'wal'
+        if modo_wal:
+            # Snapshot fixo: uma transação de leitura aberta durante toda a cópia. No WAL ela não
+            # bloqueia quem escreve, e as escritas novas não reiniciam a cópia
+            conexao_origem.execute("BEGIN")
+            conexao_origem.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+        conexao_destino = sqlite3.connect(destino)
+        try:
+            try:
+                conexao_origem.backup(conexao_destino, pages=paginas_por_passo, progress=_apos_passo)
+            except _MuitosReinicios:
+                print(f"⚠️ Banco muito ativo: cópia reiniciada {estado['reinicios']} vezes, copiando em um passo só")
+                estado.update(restante=None, limitar=False)
+                conexao_origem.backup(conexao_destino, pages=-1, progress=_apos_passo)
+
+            paginas = conexao_destino.execute("PRAGMA page_count").fetchone()[0]
+            tamanho_pagina = conexao_destino.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            conexao_destino.close()
+    finally:
+        conexao_origem.close()
+
+    return {
+        'paginas': paginas,
+        'tamanho_pagina': tamanho_pagina,
+        'reinicios': estado['reinicios'],
+        'passo_unico': not estado['limitar'],
+        'modo_wal': modo_wal,
+    }
+
+
+def comprimir_arquivo(origem: str, destino: str, compressao: str = 'gzip', nivel: int = None) -> dict:
+    """
+    Comprime `origem` em `destino` em blocos, calculando o SHA-256 do original e do comprimido
+
+    Returns:
+        dict: {'sha256_banco', 'sha256_arquivo', 'tamanho_arquivo'}
+    """
+    sha256_banco = hashlib.sha256()
+
+    with open(origem, 'rb') as entrada, open(destino, 'wb') as arquivo:
+        saida = _EscritaComHash(arquivo)
+        compressor = _abrir_compressor(saida, compressao, nivel)
+        escritor = compressor or saida
+
+        while True:
+            bloco = entrada.read(TAMANHO_BLOCO)
+            if not bloco:
+                break
+            sha256_banco.update(bloco)
+            escritor.write(bloco)
+
+        if compressor is not None:
+            compressor.close()
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+
+    return {
+        'sha256_banco': sha256_banco.hexdigest(),
+        'sha256_arquivo': saida.sha256.hexdigest(),
+        'tamanho_arquivo': saida.tamanho,
+    }
+
+
+def _preparar_backup(banco: str, pasta_backups: str, compressao: str):
+    """
+    Resolve o banco, confere se existe, troca zstd por gzip sem o zstandard e cria a pasta
+
+    Returns:
+        tuple: (banco, compressao), ou None se não há banco para copiar
+    """
+    try:
+        banco = banco or _caminho_banco_configurado()
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        return None
 
-def criar_backup():
-    """Cria backup do banco de dados com timestamp"""
-    
-    # Nome do banco original
-    banco_original = 'estoque.db'
-    
     # Verifica se o banco existe
-    if not os.path.exists(banco_original):
-        print(f"❌ Erro: Banco de dados '{banco_original}' não encontrado!")
+    if not os.path.exists(banco):
+        print(f"❌ Erro: Banco de dados '{banco}' não encontrado!")
         print(f"   Certifique-se de estar na pasta do projeto.")
-        return False
-    
-    # Cria pasta de backups se não existir
-    pasta_backups = 'backups'
+        return None
+
+    compressao = _verificar_compressao(compressao)
+    _criar_pasta_backups(pasta_backups)
+
+    return banco, compressao
+
+
+def _criar_pasta_backups(pasta_backups: str):
+    """Cria pasta de backups se não existir"""
     if not os.path.exists(pasta_backups):
         os.makedirs(pasta_backups)
         print(f"📁 Pasta '{pasta_backups}' criada")
-    
+
+
+def criar_backup(banco: str = None, pasta_backups: str = 'backups', compressao: str = 'gzip',
+                 nivel: int = None, paginas_por_passo: int = PAGINAS_POR_PASSO,
+                 pausa: float = PAUSA_ENTRE_PASSOS, progresso=None):
+    """
+    Cria backup do banco de dados com timestamp: cópia online + compressão + manifesto
+
+    Args:
+        banco: caminho do SQLite (padrão: o configurado em database.py)
+        compressao: 'gzip', 'zstd' (requer zstandard) ou 'nenhuma'
+        progresso: função (paginas_copiadas, total_paginas) chamada durante a cópia
+
+    Returns:
+        dict: o manifesto do backup, ou None em caso de erro
+    """
+    preparado = _preparar_backup(banco, pasta_backups, compressao)
+    if preparado is None:
+        return None
+    banco, compressao = preparado
+
     # Nome do backup com data e hora
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_nome = f"{pasta_backups}/estoque_backup_{timestamp}.db"
-    
+    criado_em = datetime.now()
+    nome_backup = f"{PREFIXO_BACKUP}{criado_em.strftime('%Y%m%d_%H%M%S')}.db{EXTENSOES[compressao]}"
+    caminho_backup = os.path.join(pasta_backups, nome_backup)
+    copia_temporaria = os.path.join(pasta_backups, f".{nome_backup}.copia")
+    parcial = f"{caminho_backup}.parcial"
+
     try:
-        # Copia o banco
-        shutil.copy2(banco_original, backup_nome)
-        
-        # Informações sobre o backup
-        tamanho = os.path.getsize(backup_nome) / 1024  # KB
-        
+        inicio = time.perf_counter()
+        copia = copiar_banco(banco, copia_temporaria, paginas_por_passo, pausa, progresso)
+        duracao_copia = time.perf_counter() - inicio
+
+        inicio_compressao = time.perf_counter()
+        resultado = comprimir_arquivo(copia_temporaria, parcial, compressao, nivel)
+        duracao_compressao = time.perf_counter() - inicio_compressao
+
+        tamanho_banco = os.path.getsize(copia_temporaria)
+        os.replace(parcial, caminho_backup)
+        duracao = time.perf_counter() - inicio
+
+        manifesto = {
+            'tipo': 'completo',
+            'arquivo': nome_backup,
+            'origem': os.path.abspath(banco),
+            'criado_em': criado_em.isoformat(timespec='seconds'),
+            'compressao': compressao,
+            'tamanho_banco': tamanho_banco,
+            'tamanho_arquivo': resultado['tamanho_arquivo'],
+            'sha256_banco': resultado['sha256_banco'],
+            'sha256_arquivo': resultado['sha256_arquivo'],
+            'paginas': copia['paginas'],
+            'tamanho_pagina': copia['tamanho_pagina'],
+            'paginas_por_passo': paginas_por_passo,
+            'reinicios': copia['reinicios'],
+            'passo_unico': copia['passo_unico'],
+            'modo_wal': copia['modo_wal'],
+            'duracao_copia': round(duracao_copia, 3),
+            'duracao_compressao': round(duracao_compressao, 3),
+            'duracao': round(duracao, 3),
+            'mb_por_segundo': round(tamanho_banco / 2**20 / duracao, 1) if duracao else None,
+        }
+        with open(f"{caminho_backup}.json", 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, ensure_ascii=False, indent=2)
+        _registrar_no_catalogo(pasta_backups, manifesto)
+
         print("=" * 60)
         print("✅ BACKUP CRIADO COM SUCESSO!")
         print("=" * 60)
-        print(f"📁 Arquivo: {backup_nome}")
-        print(f"📊 Tamanho: {tamanho:.2f} KB")
-        print(f"🕐 Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+        print(f"📁 Arquivo: {caminho_backup}")
+        print(f"📊 Banco: {tamanho_banco / 2**20:.2f} MB → arquivo: {resultado['tamanho_arquivo'] / 2**20:.2f} MB ({compressao})")
+        print(f"⏱️ Cópia: {duracao_copia:.2f}s, compressão: {duracao_compressao:.2f}s ({manifesto['mb_por_segundo']} MB/s)")
+        if copia['reinicios']:
+            print(f"🔁 Cópia reiniciada {copia['reinicios']} vez(es) por escritas concorrentes")
+        print(f"🔐 SHA-256: {resultado['sha256_arquivo']}")
+        print(f"🕐 Data/Hora: {criado_em.strftime('%d/%m/%Y %H:%M:%S')}")
         print("=" * 60)
-        
-        # Lista backups existentes
-        listar_backups()
-        
-        return True
-        
+
+        return manifesto
+
     except Exception as e:
         print(f"❌ Erro ao criar backup: {str(e)}")
+        if os.path.exists(parcial):
+            os.remove(parcial)
+        return None
+
+    finally:
+        if os.path.exists(copia_temporaria):
+            os.remove(copia_temporaria)
+
+
+def _comprimir_bytes(dados: bytes, compressao: str, nivel: int = None) -> bytes:
+    """Comprime um bloco inteiro em memória"""
+    if compressao == 'gzip':
+        return gzip.compress(dados, compresslevel=nivel or 6, mtime=0)
+    if compressao == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=nivel or 3).compress(dados)
+    return dados
+
+
+def _descomprimir_bytes(dados: bytes, compressao: str) -> bytes:
+    """Descomprime um bloco inteiro em memória"""
+    if compressao == 'gzip':
+        return gzip.decompress(dados)
+    if compressao == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(dados)
+    return dados
+
+
+def _abrir_descompressor(caminho: str, compressao: str):
+    """Abre o arquivo de backup para leitura já descomprimida"""
+    if compressao == 'gzip':
+        return gzip.open(caminho, 'rb')
+    if compressao == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(caminho, 'rb'), closefd=True)
+    return open(caminho, 'rb')
+
+
+def _caminho_chunk(pasta_chunks: str, sha256: str):
+    """
+    Chunk já guardado com este SHA-256, em qualquer compressão
+
+    Returns:
+        tuple: (caminho, compressao), ou (None, None) se o chunk ainda não existe
+    """
+    for compressao, extensao in EXTENSOES.items():
+        caminho = os.path.join(pasta_chunks, sha256[:2], f"{sha256}{extensao}")
+        if os.path.exists(caminho):
+            return caminho, compressao
+    return None, None
+
+
+def criar_backup_incremental(banco: str = None, pasta_backups: str = 'backups', compressao: str = 'gzip',
+                             nivel: int = None, paginas_por_chunk: int = PAGINAS_POR_CHUNK,
+                             paginas_por_passo: int = PAGINAS_POR_PASSO,
+                             pausa: float = PAUSA_ENTRE_PASSOS, progresso=None):
+    """
+    Backup incremental endereçado por conteúdo: a cópia online do banco é dividida em chunks
+    de `paginas_por_chunk` páginas, e só os chunks com SHA-256 ainda não guardado em
+    backups/chunks/ são gravados. O backup em si é um manifesto com a lista de hashes
+
+    Returns:
+        dict: o manifesto do backup, ou None em caso de erro
+    """
+    preparado = _preparar_backup(banco, pasta_backups, compressao)
+    if preparado is None:
+        return None
+    banco, compressao = preparado
+
+    criado_em = datetime.now()
+    nome_manifesto = f"{PREFIXO_INCREMENTAL}{criado_em.strftime('%Y%m%d_%H%M%S')}.json"
+    pasta_chunks = os.path.join(pasta_backups, PASTA_CHUNKS)
+    copia_temporaria = os.path.join(pasta_backups, f".{nome_manifesto}.copia")
+
+    try:
+        inicio = time.perf_counter()
+        copia = copiar_banco(banco, copia_temporaria, paginas_por_passo, pausa, progresso)
+        duracao_copia = time.perf_counter() - inicio
+
+        tamanho_chunk = copia['tamanho_pagina'] * paginas_por_chunk
+        sha256_banco = hashlib.sha256()
+        chunks = []
+        arquivos_chunks = {}
+        chunks_novos = 0
+        bytes_novos = 0
+
+        with open(copia_temporaria, 'rb') as entrada:
+            while True:
+                dados = entrada.read(tamanho_chunk)
+                if not dados:
+                    break
+                sha256_banco.update(dados)
+                sha256 = hashlib.sha256(dados).hexdigest()
+                chunks.append(sha256)
+
+                existente = _caminho_chunk(pasta_chunks, sha256)[0]
+                if existente:
+                    arquivos_chunks[sha256] = os.path.relpath(existente, pasta_backups)
+                    continue
+
+                # Chunk novo: grava comprimido, com rename atômico
+                caminho = os.path.join(pasta_chunks, sha256[:2], f"{sha256}{EXTENSOES[compressao]}")
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                comprimido = _comprimir_bytes(dados, compressao, nivel)
+                with open(f"{caminho}.parcial", 'wb') as f:
+                    f.write(comprimido)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(f"{caminho}.parcial", caminho)
+                arquivos_chunks[sha256] = os.path.relpath(caminho, pasta_backups)
+                chunks_novos += 1
+                bytes_novos += len(comprimido)
+
+        tamanho_banco = os.path.getsize(copia_temporaria)
+        duracao = time.perf_counter() - inicio
+
+        manifesto = {
+            'tipo': 'incremental',
+            'arquivo': nome_manifesto,
+            'origem': os.path.abspath(banco),
+            'criado_em': criado_em.isoformat(timespec='seconds'),
+            'compressao': compressao,
+            'tamanho_banco': tamanho_banco,
+            'sha256_banco': sha256_banco.hexdigest(),
+            'paginas': copia['paginas'],
+            'tamanho_pagina': copia['tamanho_pagina'],
+            'tamanho_chunk': tamanho_chunk,
+            'chunks': chunks,
+            'chunks_novos': chunks_novos,
+            'bytes_novos': bytes_novos,
+            'reinicios': copia['reinicios'],
+            'passo_unico': copia['passo_unico'],
+            'modo_wal': copia['modo_wal'],
+            'duracao_copia': round(duracao_copia, 3),
+            'duracao': round(duracao, 3),
+            'mb_por_segundo': round(tamanho_banco / 2**20 / duracao, 1) if duracao else None,
+        }
+        caminho_manifesto = os.path.join(pasta_backups, nome_manifesto)
+        with open(f"{caminho_manifesto}.parcial", 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, ensure_ascii=False)
+        os.replace(f"{caminho_manifesto}.parcial", caminho_manifesto)
+        _registrar_no_catalogo(pasta_backups, manifesto, arquivos_chunks)
+
+        print("=" * 60)
+        print("✅ BACKUP INCREMENTAL CRIADO COM SUCESSO!")
+        print("=" * 60)
+        print(f"📁 Manifesto: {caminho_manifesto}")
+        print(f"📊 Banco: {tamanho_banco / 2**20:.2f} MB em {len(chunks)} chunks de {tamanho_chunk // 1024} KB")
+        print(f"🧩 Chunks novos: {chunks_novos} ({bytes_novos / 2**20:.2f} MB gravados, {compressao})")
+        print(f"⏱️ Duração: {duracao:.2f}s ({manifesto['mb_por_segundo']} MB/s)")
+        print(f"🕐 Data/Hora: {criado_em.strftime('%d/%m/%Y %H:%M:%S')}")
+        print("=" * 60)
+
+        return manifesto
+
+    except Exception as e:
+        print(f"❌ Erro ao criar backup incremental: {str(e)}")
+        return None
+
+    finally:
+        if os.path.exists(copia_temporaria):
+            os.remove(copia_temporaria)
+
+
+def verificar_integridade(caminho: str) -> str:
+    """Resultado do PRAGMA integrity_check ('ok' se o banco está íntegro)"""
+    conexao = sqlite3.connect(caminho)
+    try:
+        return "\n".join(linha[0] for linha in conexao.execute("PRAGMA integrity_check"))
+    finally:
+        conexao.close()
+
+
+def restaurar_backup(manifesto: str, destino: str = None, forcar: bool = False) -> bool:
+    """
+    Reconstrói o banco de um backup (completo ou incremental) a partir do manifesto,
+    confere o SHA-256 e roda PRAGMA integrity_check antes de colocá-lo no destino
+
+    Se o destino existe (só com forcar=True), ele e seus arquivos -wal/-shm são renomeados
+    para *.antes_restauracao. Pare o Streamlit antes de restaurar sobre o banco em uso
+
+    Backups do PostgreSQL vão para restaurar_backup_postgresql; aí o destino é uma URL do
+    SQLAlchemy (padrão: o banco configurado em database.py)
+
+    Returns:
+        bool: True se o banco foi restaurado e passou na verificação
+    """
+    with open(manifesto, encoding='utf-8') as f:
+        dados = json.load(f)
+
+    if dados.get('tipo') == 'postgresql':
+        if destino:
+            from sqlalchemy import create_engine
+            return restaurar_backup_postgresql(manifesto, create_engine(destino), forcar)
+        return restaurar_backup_postgresql(manifesto, forcar=forcar)
+
+    if not destino:
+        print("❌ Informe o banco a criar na restauração (--destino)")
+        return False
+
+    if os.path.exists(destino) and not forcar:
+        print(f"❌ '{destino}' já existe. Use outro destino ou --forcar para substituí-lo")
+        return False
+
+    pasta_backups = os.path.dirname(os.path.abspath(manifesto))
+    restaurando = f"{destino}.restaurando"
+    sha256_banco = hashlib.sha256()
+    inicio = time.perf_counter()
+
+    try:
+        with open(restaurando, 'wb') as saida:
+            if dados.get('tipo') == 'incremental':
+                pasta_chunks = os.path.join(pasta_backups, PASTA_CHUNKS)
+                for sha256 in dados['chunks']:
+                    caminho, compressao = _caminho_chunk(pasta_chunks, sha256)
+                    if caminho is None:
+                        print(f"❌ Chunk {sha256} não encontrado em {pasta_chunks}")
+                        return False
+                    try:
+                        with open(caminho, 'rb') as f:
+                            bloco = _descomprimir_bytes(f.read(), compressao)
+                    except Exception:
+                        bloco = None
+                    if bloco is None or hashlib.sha256(bloco).hexdigest() != sha256:
+                        print(f"❌ Chunk {sha256} corrompido (SHA-256 não confere)")
+                        return False
+                    sha256_banco.update(bloco)
+                    saida.write(bloco)
+            else:
+                with _abrir_descompressor(os.path.join(pasta_backups, dados['arquivo']), dados['compressao']) as entrada:
+                    while True:
+                        try:
+                            bloco = entrada.read(TAMANHO_BLOCO)
+                        except Exception as erro:
+                            print(f"❌ Arquivo {dados['arquivo']} corrompido: {erro}")
+                            return False
+                        if not bloco:
+                            break
+                        sha256_banco.update(bloco)
+                        saida.write(bloco)
+            saida.flush()
+            os.fsync(saida.fileno())
+
+        if sha256_banco.hexdigest() != dados['sha256_banco']:
+            print("❌ SHA-256 do banco restaurado não confere com o manifesto")
+            return False
+
+        integridade = verificar_integridade(restaurando)
+        if integridade != 'ok':
+            print(f"❌ PRAGMA integrity_check falhou:\n{integridade}")
+            return False
+
+        if os.path.exists(destino):
+            for sufixo in ('', '-wal', '-shm'):
+                if os.path.exists(f"{destino}{sufixo}"):
+                    os.replace(f"{destino}{sufixo}", f"{destino}{sufixo}.antes_restauracao")
+            print(f"📦 Banco anterior guardado em {destino}.antes_restauracao")
+        os.replace(restaurando, destino)
+
+        print("=" * 60)
+        print("✅ BACKUP RESTAURADO COM SUCESSO!")
+        print("=" * 60)
+        print(f"📁 Backup: {dados['arquivo']} ({dados['criado_em']})")
+        print(f"💾 Destino: {destino} ({dados['tamanho_banco'] / 2**20:.2f} MB)")
+        print(f"🔐 SHA-256 e PRAGMA integrity_check: ok")
+        print(f"⏱️ Duração: {time.perf_counter() - inicio:.2f}s")
+        print("=" * 60)
+        return True
+
+    finally:
+        if os.path.exists(restaurando):
+            os.remove(restaurando)
+
+
+def _versao_schema(cursor) -> int:
+    """Versão do schema gravada no banco (0 se ainda não inicializado)"""
+    cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return 0
+    cursor.execute("SELECT MAX(versao) FROM schema_version")
+    return cursor.fetchone()[0] or 0
+
+
+def _tabelas_para_backup(cursor) -> list:
+    """
+    Tabelas de models.py existentes no banco (menos as derivadas), maiores primeiro para
+    equilibrar os workers, com as colunas na ordem do banco
+
+    Returns:
+        list: [(tabela, [colunas])]
+    """
+    from models import Base
+
+    tabelas = []
+    for tabela in Base.metadata.sorted_tables:
+        if tabela.name in TABELAS_DERIVADAS:
+            continue
+        cursor.execute("SELECT pg_total_relation_size(to_regclass(%s))", (tabela.name,))
+        tamanho = cursor.fetchone()[0]
+        if tamanho is None:
+            continue  # tabela ainda não criada neste banco
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position",
+            (tabela.name,)
+        )
+        tabelas.append((tamanho, tabela.name, [linha[0] for linha in cursor.fetchall()]))
+
+    tabelas.sort(reverse=True)
+    return [(nome, colunas) for _, nome, colunas in tabelas]
+
+
+def _exportar_tabela(engine, snapshot: str, tabela: str, colunas: list, destino: str,
+                     compressao: str, nivel: int = None) -> dict:
+    """
+    COPY da tabela para `destino` (comprimido), numa conexão própria que importa o snapshot
+    O COPY entrega linha a linha para o compressor: a tabela nunca fica inteira em memória
+    """
+    inicio = time.perf_counter()
+
+    with engine.connect().execution_options(isolation_level='REPEATABLE READ') as conn:
+        cursor = conn.connection.cursor()
+        cursor.execute("SET TRANSACTION READ ONLY")
+        cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+        cursor.execute("SET client_encoding TO 'UTF8'")
+
+        with open(destino, 'wb') as arquivo:
+            saida = _EscritaComHash(arquivo)
+            compressor = _abrir_compressor(saida, compressao, nivel)
+            dados = _EscritaComHash(compressor or saida)
+            blocos = _EscritaEmBlocos(dados)
+
+            cursor.copy_expert(f"COPY {tabela} ({', '.join(colunas)}) TO STDOUT", blocos)
+
+            blocos.flush()
+            if compressor is not None:
+                compressor.close()
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+
+        linhas = cursor.rowcount
+        conn.rollback()
+
+    return {
+        'tabela': tabela,
+        'arquivo': os.path.basename(destino),
+        'colunas': colunas,
+        'linhas': linhas,
+        'tamanho_dados': dados.tamanho,
+        'tamanho_arquivo': saida.tamanho,
+        'sha256_dados': dados.sha256.hexdigest(),
+        'sha256_arquivo': saida.sha256.hexdigest(),
+        'duracao': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def criar_backup_postgresql(engine=None, pasta_backups: str = 'backups', compressao: str = 'gzip',
+                            nivel: int = None, workers: int = WORKERS_COPY):
+    """
+    Backup do PostgreSQL por COPY: uma conexão abre uma transação REPEATABLE READ e exporta
+    o snapshot (pg_export_snapshot); até `workers` conexões o importam e exportam uma tabela
+    cada com COPY ... TO STDOUT direto para o arquivo comprimido. Todas as tabelas saem do
+    mesmo instante, sem bloquear quem escreve
+
+    Args:
+        engine: engine do PostgreSQL (padrão: o configurado em database.py)
+        compressao: 'gzip', 'zstd' (requer zstandard) ou 'nenhuma'
+
+    Returns:
+        dict: o manifesto do backup, ou None em caso de erro
+    """
+    if engine is None:
+        from database import engine
+
+    compressao = _verificar_compressao(compressao)
+    _criar_pasta_backups(pasta_backups)
+
+    criado_em = datetime.now()
+    nome = f"{PREFIXO_POSTGRESQL}{criado_em.strftime('%Y%m%d_%H%M%S')}"
+    pasta_tabelas = os.path.join(pasta_backups, nome)
+    parcial = f"{pasta_tabelas}.parcial"
+
+    try:
+        inicio = time.perf_counter()
+
+        # A transação que exportou o snapshot fica aberta até o último COPY terminar
+        with engine.connect().execution_options(isolation_level='REPEATABLE READ') as conn:
+            cursor = conn.connection.cursor()
+            cursor.execute("SET TRANSACTION READ ONLY")
+            cursor.execute("SELECT pg_export_snapshot(), current_setting('server_version')")
+            snapshot, versao_servidor = cursor.fetchone()
+            versao_schema = _versao_schema(cursor)
+            tabelas = _tabelas_para_backup(cursor)
+
+            os.makedirs(parcial)
+            extensao = EXTENSOES[compressao]
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tabelas)))) as executor:
+                futuros = [
+                    executor.submit(_exportar_tabela, engine, snapshot, tabela, colunas,
+                                    os.path.join(parcial, f"{tabela}.copy{extensao}"), compressao, nivel)
+                    for tabela, colunas in tabelas
+                ]
+                resultados = [futuro.result() for futuro in futuros]
+
+            conn.rollback()
+
+        os.replace(parcial, pasta_tabelas)
+        duracao = time.perf_counter() - inicio
+        tamanho_dados = sum(t['tamanho_dados'] for t in resultados)
+
+        manifesto = {
+            'tipo': 'postgresql',
+            'arquivo': nome,
+            'origem': engine.url.render_as_string(hide_password=True),
+            'criado_em': criado_em.isoformat(timespec='seconds'),
+            'compressao': compressao,
+            'versao_servidor': versao_servidor,
+            'versao_schema': versao_schema,
+            'tamanho_dados': tamanho_dados,
+            'tamanho_arquivo': sum(t['tamanho_arquivo'] for t in resultados),
+            'workers': workers,
+            'tabelas': resultados,
+            'duracao': round(duracao, 3),
+            'mb_por_segundo': round(tamanho_dados / 2**20 / duracao, 1) if duracao else None,
+        }
+        caminho_manifesto = f"{pasta_tabelas}.json"
+        with open(f"{caminho_manifesto}.parcial", 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, ensure_ascii=False, indent=2)
+        os.replace(f"{caminho_manifesto}.parcial", caminho_manifesto)
+        _registrar_no_catalogo(pasta_backups, manifesto)
+
+        print("=" * 60)
+        print("✅ BACKUP DO POSTGRESQL CRIADO COM SUCESSO!")
+        print("=" * 60)
+        print(f"📁 Manifesto: {caminho_manifesto}")
+        for tabela in resultados:
+            print(f"   - {tabela['tabela']}: {tabela['linhas']} linhas, "
+                  f"{tabela['tamanho_dados'] / 2**20:.2f} MB → {tabela['tamanho_arquivo'] / 2**20:.2f} MB "
+                  f"({tabela['duracao']:.2f}s)")
+        print(f"📊 Dados: {tamanho_dados / 2**20:.2f} MB → arquivos: {manifesto['tamanho_arquivo'] / 2**20:.2f} MB ({compressao})")
+        print(f"⏱️ Duração: {duracao:.2f}s com {workers} worker(s) ({manifesto['mb_por_segundo']} MB/s)")
+        print(f"🕐 Data/Hora: {criado_em.strftime('%d/%m/%Y %H:%M:%S')}")
+        print("=" * 60)
+
+        return manifesto
+
+    except Exception as e:
+        print(f"❌ Erro ao criar backup do PostgreSQL: {str(e)}")
+        if os.path.exists(parcial):
+            shutil.rmtree(parcial)
+        return None
+
+
+def restaurar_backup_postgresql(manifesto: str, engine=None, forcar: bool = False) -> bool:
+    """
+    Restaura um backup do PostgreSQL com COPY ... FROM STDIN, numa única transação:
+    qualquer falha (SHA-256 ou número de linhas diferente do manifesto) desfaz tudo
+
+    O banco de destino precisa estar vazio ou na mesma versão de schema do backup. Com dados
+    (usuários, equipamentos...) só com forcar=True: as tabelas são esvaziadas (TRUNCATE)
+    antes da carga. Depois o resumo do estoque é recalculado e as sequências dos ids ajustadas
+
+    Returns:
+        bool: True se o banco foi restaurado
+    """
+    with open(manifesto, encoding='utf-8') as f:
+        dados = json.load(f)
+
+    if engine is None:
+        from database import engine
+
+    if engine.dialect.name != 'postgresql':
+        print("❌ Backup do PostgreSQL só pode ser restaurado num banco PostgreSQL")
+        return False
+
+    pasta_tabelas = os.path.join(os.path.dirname(os.path.abspath(manifesto)), dados['arquivo'])
+    tabelas = [t['tabela'] for t in dados['tabelas']]
+    inicio = time.perf_counter()
+
+    with engine.connect() as conn:
+        versao = _versao_schema(conn.connection.cursor())
+        conn.rollback()
+
+    if versao == 0:
+        # Banco vazio: cria o schema como o init_db, mas sem os usuários padrão
+        from models import Base
+        from migrations import executar_migracoes
+        Base.metadata.create_all(bind=engine)
+        executar_migracoes(engine)
+    elif versao != dados['versao_schema']:
+        print(f"❌ Schema do destino na versão {versao}, backup na versão {dados['versao_schema']}")
+        return False
+
+    try:
+        with engine.begin() as conn:
+            cursor = conn.connection.cursor()
+            cursor.execute("SET client_encoding TO 'UTF8'")
+
+            if not forcar:
+                com_dados = []
+                for tabela in tabelas:
+                    if tabela in TABELAS_DAS_MIGRACOES:
+                        continue
+                    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {tabela})")
+                    if cursor.fetchone()[0]:
+                        com_dados.append(tabela)
+                if com_dados:
+                    print(f"❌ O destino já tem dados ({', '.join(com_dados)}). Use --forcar para substituí-los")
+                    return False
+
+            cursor.execute(f"TRUNCATE {', '.join(tabelas + list(TABELAS_DERIVADAS))}")
+
+            for tabela in dados['tabelas']:
+                caminho = os.path.join(pasta_tabelas, tabela['arquivo'])
+                with _abrir_descompressor(caminho, dados['compressao']) as arquivo:
+                    entrada = _LeituraComHash(arquivo)
+                    cursor.copy_expert(
+                        f"COPY {tabela['tabela']} ({', '.join(tabela['colunas'])}) FROM STDIN",
+                        entrada, size=TAMANHO_BLOCO
+                    )
+
+                if entrada.sha256.hexdigest() != tabela['sha256_dados']:
+                    raise ValueError(f"SHA-256 de {tabela['arquivo']} não confere com o manifesto")
+                if cursor.rowcount != tabela['linhas']:
+                    raise ValueError(f"{tabela['tabela']}: {cursor.rowcount} linhas carregadas, "
+                                     f"manifesto tem {tabela['linhas']}")
+                print(f"   - {tabela['tabela']}: {tabela['linhas']} linhas")
+
+            # Próximo id depois do maior restaurado, para os INSERTs seguintes não colidirem
+            cursor.execute(
+                "SELECT table_name, column_name, pg_get_serial_sequence(table_name, column_name) "
+                "FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = ANY(%s) "
+                "AND pg_get_serial_sequence(table_name, column_name) IS NOT NULL",
+                (tabelas,)
+            )
+            for tabela, coluna, sequencia in cursor.fetchall():
+                cursor.execute(
+                    f"SELECT setval(%s, COALESCE((SELECT MAX({coluna}) FROM {tabela}), 0) + 1, false)",
+                    (sequencia,)
+                )
+
+            from resumo import reconstruir_resumo
+            reconstruir_resumo(conn)
+
+    except Exception as e:
+        print(f"❌ Erro ao restaurar backup do PostgreSQL (nada foi alterado): {str(e)}")
         return False
 
+    print("=" * 60)
+    print("✅ BACKUP DO POSTGRESQL RESTAURADO COM SUCESSO!")
+    print("=" * 60)
+    print(f"📁 Backup: {dados['arquivo']} ({dados['criado_em']})")
+    print(f"💾 Destino: {engine.url.render_as_string(hide_password=True)}")
+    print(f"🔐 SHA-256 e número de linhas de {len(tabelas)} tabela(s): ok")
+    print(f"⏱️ Duração: {time.perf_counter() - inicio:.2f}s")
+    print("=" * 60)
+    return True
+
+
+def _eh_backup(arquivo: str) -> bool:
+    """Arquivo de backup: completo (.db, .db.gz, .db.zst) ou manifesto incremental/PostgreSQL"""
+    if arquivo.startswith((PREFIXO_INCREMENTAL, PREFIXO_POSTGRESQL)):
+        return arquivo.endswith('.json')
+    return arquivo.startswith(PREFIXO_BACKUP) and arquivo.endswith(('.db', '.db.gz', '.db.zst'))
+
+
+def _registro_do_manifesto(manifesto: dict, pasta_backups: str, arquivos_chunks: dict = None):
+    """
+    Entrada do catálogo para o backup descrito pelo manifesto; o id é o nome do manifesto
+    (o arquivo que se passa ao --restaurar)
+
+    Returns:
+        tuple: (registro, {sha256: caminho relativo} dos chunks, para incrementais)
+    """
+    tipo = manifesto.get('tipo', 'completo')
+    registro = {
+        'tipo': tipo,
+        'criado_em': manifesto['criado_em'],
+        'tamanho_banco': manifesto.get('tamanho_banco') or manifesto.get('tamanho_dados'),
+    }
 
-def listar_backups():
-    """Lista todos os backups existentes"""
-    pasta_backups = 'backups'
-    
+    if tipo == 'incremental':
+        if arquivos_chunks is None:
+            pasta_chunks = os.path.join(pasta_backups, PASTA_CHUNKS)
+            arquivos_chunks = {}
+            for sha256 in manifesto['chunks']:
+                caminho = _caminho_chunk(pasta_chunks, sha256)[0]
+                if caminho:
+                    arquivos_chunks[sha256] = os.path.relpath(caminho, pasta_backups)
+        registro.update(id=manifesto['arquivo'], tamanho=manifesto['bytes_novos'],
+                        sha256=manifesto['sha256_banco'], arquivos=[manifesto['arquivo']])
+        return registro, arquivos_chunks
+
+    if tipo == 'postgresql':
+        # Um SHA-256 para o backup todo, a partir dos SHA-256 de cada tabela
+        sha256 = hashlib.sha256(''.join(t['sha256_dados'] for t in manifesto['tabelas']).encode()).hexdigest()
+        registro.update(id=f"{manifesto['arquivo']}.json", tamanho=manifesto['tamanho_arquivo'],
+                        sha256=sha256, arquivos=[f"{manifesto['arquivo']}.json", manifesto['arquivo']])
+        return registro, None
+
+    registro.update(id=f"{manifesto['arquivo']}.json", tamanho=manifesto['tamanho_arquivo'],
+                    sha256=manifesto['sha256_banco'], arquivos=[manifesto['arquivo'], f"{manifesto['arquivo']}.json"])
+    return registro, None
+
+
+def _registro_sem_manifesto(arquivo: str, pasta_backups: str) -> dict:
+    """Entrada do catálogo para um backup completo antigo, de antes dos manifestos"""
+    caminho = os.path.join(pasta_backups, arquivo)
+    try:
+        criado_em = datetime.strptime(arquivo[len(PREFIXO_BACKUP):].split('.')[0], '%Y%m%d_%H%M%S')
+    except ValueError:
+        criado_em = datetime.fromtimestamp(os.path.getmtime(caminho))
+
+    return {
+        'id': arquivo,
+        'tipo': 'completo',
+        'criado_em': criado_em.isoformat(timespec='seconds'),
+        'tamanho': os.path.getsize(caminho),
+        'arquivos': [arquivo],
+    }
+
+
+def reconstruir_catalogo(pasta_backups: str = 'backups') -> int:
+    """
+    Refaz o catálogo varrendo a pasta e lendo os manifestos (a única varredura completa);
+    depois apaga os chunks que nenhum manifesto usa
+
+    Returns:
+        int: quantidade de backups catalogados
+    """
+    registros = []
+    for arquivo in os.listdir(pasta_backups):
+        if not _eh_backup(arquivo):
+            continue
+        caminho = os.path.join(pasta_backups, arquivo)
+        manifesto = caminho if arquivo.endswith('.json') else f"{caminho}.json"
+        if os.path.exists(manifesto):
+            with open(manifesto, encoding='utf-8') as f:
+                registros.append(_registro_do_manifesto(json.load(f), pasta_backups))
+        else:
+            registros.append((_registro_sem_manifesto(arquivo, pasta_backups), None))
+
+    conexao = abrir_catalogo(pasta_backups)
+    try:
+        conexao.execute("DELETE FROM backups")
+        conexao.execute("DELETE FROM backup_chunks")
+        conexao.execute("DELETE FROM chunks")
+
+        # Em ordem cronológica, para cada incremental apontar o anterior como pai
+        for registro, arquivos_chunks in sorted(registros, key=lambda r: r[0]['criado_em']):
+            if registro['tipo'] == 'incremental':
+                registro['pai'] = ultimo_backup(conexao, 'incremental', registro['criado_em'])
+            registrar_backup(conexao, registro, arquivos_chunks)
+        conexao.commit()
+    finally:
+        conexao.close()
+
+    print(f"📇 Catálogo refeito com {len(registros)} backup(s)")
+    remover_chunks_orfaos(pasta_backups)
+    return len(registros)
+
+
+def _abrir_catalogo_atualizado(pasta_backups: str):
+    """Abre o catálogo da pasta, montando-o dos backups existentes se ainda não existir"""
+    if not os.path.exists(caminho_catalogo(pasta_backups)):
+        reconstruir_catalogo(pasta_backups)
+    return abrir_catalogo(pasta_backups)
+
+
+def _registrar_no_catalogo(pasta_backups: str, manifesto: dict, arquivos_chunks: dict = None):
+    """Acrescenta ao catálogo o backup recém-criado; uma falha aqui não desfaz o backup"""
+    try:
+        conexao = _abrir_catalogo_atualizado(pasta_backups)
+        try:
+            registro, arquivos_chunks = _registro_do_manifesto(manifesto, pasta_backups, arquivos_chunks)
+            if registro['tipo'] == 'incremental':
+                registro['pai'] = ultimo_backup(conexao, 'incremental', registro['criado_em'])
+            registrar_backup(conexao, registro, arquivos_chunks)
+            conexao.commit()
+        finally:
+            conexao.close()
+    except Exception as e:
+        print(f"⚠️ Backup criado, mas o catálogo não foi atualizado: {str(e)}")
+        print("   Execute: python backup.py --reconstruir-catalogo")
+
+
+def listar_backups(pasta_backups: str = 'backups'):
+    """Lista todos os backups existentes (pelo catálogo)"""
     if not os.path.exists(pasta_backups):
         print("\n📭 Nenhum backup encontrado")
         return
-    
-    backups = [f for f in os.listdir(pasta_backups) if f.endswith('.db')]
-    
+
+    conexao = _abrir_catalogo_atualizado(pasta_backups)
+    try:
+        backups = listar_catalogo(conexao)
+    finally:
+        conexao.close()
+
     if not backups:
         print("\n📭 Nenhum backup encontrado")
         return
-    
+
     print("\n📚 BACKUPS EXISTENTES:")
     print("-" * 60)
-    
-    backups.sort(reverse=True)  # Mais recentes primeiro
-    
+
     for i, backup in enumerate(backups, 1):
-        caminho = os.path.join(pasta_backups, backup)
-        tamanho = os.path.getsize(caminho) / 1024  # KB
-        data_mod = datetime.fromtimestamp(os.path.getmtime(caminho))
-        
-        print(f"{i}. {backup}")
-        print(f"   Tamanho: {tamanho:.2f} KB")
-        print(f"   Data: {data_mod.strftime('%d/%m/%Y %H:%M:%S')}")
+        print(f"{i}. {backup['id']}")
+        print(f"   Tipo: {backup['tipo']}, {backup['tamanho'] / 1024:.2f} KB em disco")
+        if backup['pai']:
+            print(f"   Anterior: {backup['pai']}")
+        if not backup['sha256']:
+            print("   ⚠️ Sem manifesto (backup antigo)")
+        print(f"   Data: {datetime.fromisoformat(backup['criado_em']).strftime('%d/%m/%Y %H:%M:%S')}")
         print()
 
 
-def limpar_backups_antigos(dias=30):
-    """Remove backups mais antigos que X dias"""
-    pasta_backups = 'backups'
-    
-    if not os.path.exists(pasta_backups):
-        return
-    
-    from datetime import timedelta
-    limite = datetime.now() - timedelta(days=dias)
-    removidos = 0
-    
+def remover_chunks_orfaos(pasta_backups: str = 'backups') -> int:
+    """
+    Remove de backups/chunks/ os chunks que nenhum manifesto incremental referencia mais
+    Varre a pasta e lê todos os manifestos: é o reparo do reconstruir_catalogo; a poda normal
+    acha os órfãos pelo catálogo
+
+    Returns:
+        int: quantidade de chunks removidos
+    """
+    pasta_chunks = os.path.join(pasta_backups, PASTA_CHUNKS)
+    if not os.path.exists(pasta_chunks):
+        return 0
+
+    referenciados = set()
     for arquivo in os.listdir(pasta_backups):
-        if arquivo.endswith('.db'):
-            caminho = os.path.join(pasta_backups, arquivo)
-            data_arquivo = datetime.fromtimestamp(os.path.getmtime(caminho))
-            
-            if data_arquivo < limite:
-                os.remove(caminho)
+        if arquivo.startswith(PREFIXO_INCREMENTAL) and arquivo.endswith('.json'):
+            with open(os.path.join(pasta_backups, arquivo), encoding='utf-8') as f:
+                referenciados.update(json.load(f)['chunks'])
+
+    removidos = 0
+    for subpasta in os.listdir(pasta_chunks):
+        for arquivo in os.listdir(os.path.join(pasta_chunks, subpasta)):
+            if arquivo.split('.')[0] not in referenciados:
+                os.remove(os.path.join(pasta_chunks, subpasta, arquivo))
                 removidos += 1
-                print(f"🗑️  Backup antigo removido: {arquivo}")
-    
+
     if removidos > 0:
-        print(f"\n✅ {removidos} backup(s) antigo(s) removido(s)")
+        print(f"🧹 {removidos} chunk(s) sem referência removido(s)")
+    return removidos
+
+
+def _podar(pasta_backups: str, conexao, remover: list, simular: bool) -> dict:
+    """Remove (ou, simulando, só lista) os backups escolhidos pela retenção"""
+    for backup in remover:
+        print(f"🗑️  {'Seria removido' if simular else 'Backup removido'}: {backup['id']}")
+
+    if simular:
+        return {'backups': len(remover), 'chunks': 0, 'bytes': sum(b['tamanho'] for b in remover)}
+
+    resultado = remover_backups(pasta_backups, conexao, [b['id'] for b in remover])
+    if resultado['backups']:
+        print(f"\n✅ {resultado['backups']} backup(s) removido(s), {resultado['chunks']} chunk(s), "
+              f"{resultado['bytes'] / 2**20:.2f} MB liberados")
+    return resultado
+
+
+def limpar_backups_antigos(dias=30, pasta_backups: str = 'backups', simular: bool = False) -> dict:
+    """
+    Remove backups (e seus manifestos e chunks exclusivos) mais antigos que X dias
+
+    Returns:
+        dict: {'backups', 'chunks', 'bytes'} removidos
+    """
+    if not os.path.exists(pasta_backups):
+        return {'backups': 0, 'chunks': 0, 'bytes': 0}
+
+    limite = (datetime.now() - timedelta(days=dias)).isoformat(timespec='seconds')
+    conexao = _abrir_catalogo_atualizado(pasta_backups)
+    try:
+        remover = [b for b in listar_catalogo(conexao) if b['criado_em'] < limite]
+        return _podar(pasta_backups, conexao, remover, simular)
+    finally:
+        conexao.close()
+
+
+def aplicar_retencao_gfs(pasta_backups: str = 'backups', diarios: int = DIARIOS, semanais: int = SEMANAIS,
+                         mensais: int = MENSAIS, simular: bool = False) -> dict:
+    """
+    Retenção avô-pai-filho: de cada tipo de backup mantém o mais recente de cada um dos
+    últimos `diarios` dias, `semanais` semanas e `mensais` meses que têm backup, e remove
+    o resto (com os chunks que só eles usavam)
+
+    Returns:
+        dict: {'backups', 'chunks', 'bytes'} removidos
+    """
+    if not os.path.exists(pasta_backups):
+        return {'backups': 0, 'chunks': 0, 'bytes': 0}
+
+    conexao = _abrir_catalogo_atualizado(pasta_backups)
+    try:
+        backups = listar_catalogo(conexao)
+        manter = selecionar_gfs(backups, diarios, semanais, mensais)
+        print(f"📅 Retenção GFS: {diarios} diário(s), {semanais} semanal(is), {mensais} mensal(is) "
+              f"- mantendo {len(manter)} de {len(backups)} backup(s)")
+        return _podar(pasta_backups, conexao, [b for b in backups if b['id'] not in manter], simular)
+    finally:
+        conexao.close()
+
+
+def _barra_progresso(copiadas: int, total: int):
+    """Progresso da cópia na mesma linha do terminal"""
+    if not total:
+        return
+    print(f"\r📦 Copiando páginas: {copiadas}/{total} ({copiadas / total:.0%})", end="", flush=True)
+    if copiadas == total:
+        print()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backup online do banco do estoque (SQLite ou PostgreSQL)")
+    parser.add_argument('--banco', help="Caminho do SQLite (padrão: o configurado em database.py)")
+    parser.add_argument('--pasta', default='backups', help="Pasta dos backups")
+    parser.add_argument('--compressao', choices=list(EXTENSOES), default='gzip', help="Compressão do arquivo")
+    parser.add_argument('--nivel', type=int, help="Nível de compressão (gzip 1-9, zstd 1-22)")
+    parser.add_argument('--paginas-por-passo', type=int, default=PAGINAS_POR_PASSO, help="Páginas copiadas por passo")
+    parser.add_argument('--pausa-ms', type=float, default=PAUSA_ENTRE_PASSOS * 1000, help="Pausa entre os passos (ms)")
+    parser.add_argument('--incremental', action='store_true', help="Grava só os chunks que mudaram (backups/chunks/)")
+    parser.add_argument('--paginas-por-chunk', type=int, default=PAGINAS_POR_CHUNK, help="Páginas por chunk do incremental")
+    parser.add_argument('--workers', type=int, default=WORKERS_COPY, help="PostgreSQL: tabelas exportadas em paralelo")
+    parser.add_argument('--restaurar', metavar='MANIFESTO', help="Restaura o backup deste manifesto (.json)")
+    parser.add_argument('--destino', help="Banco a criar na restauração (PostgreSQL: URL; padrão: o configurado)")
+    parser.add_argument('--forcar', action='store_true', help="Substitui o destino se ele já existir")
+    parser.add_argument('--listar', action='store_true', help="Só lista os backups existentes")
+    parser.add_argument('--limpar-dias', type=int, help="Remove backups com mais de N dias após o backup")
+    parser.add_argument('--gfs', action='store_true', help="Aplica a retenção GFS após o backup")
+    parser.add_argument('--diarios', type=int, default=DIARIOS, help="GFS: dias com backup mantidos")
+    parser.add_argument('--semanais', type=int, default=SEMANAIS, help="GFS: semanas com backup mantidas")
+    parser.add_argument('--mensais', type=int, default=MENSAIS, help="GFS: meses com backup mantidos")
+    parser.add_argument('--apenas-retencao', action='store_true', help="Só aplica --gfs/--limpar-dias, sem novo backup")
+    parser.add_argument('--simular', action='store_true', help="Mostra o que a retenção removeria, sem remover")
+    parser.add_argument('--reconstruir-catalogo', action='store_true', help="Refaz o catálogo a partir da pasta")
+    args = parser.parse_args()
+
+    def aplicar_retencao():
+        if args.limpar_dias:
+            limpar_backups_antigos(args.limpar_dias, args.pasta, args.simular)
+        if args.gfs:
+            aplicar_retencao_gfs(args.pasta, args.diarios, args.semanais, args.mensais, args.simular)
+
     print("\n🔧 SISTEMA DE BACKUP - ESTOQUE")
     print("=" * 60)
-    
+
+    if args.reconstruir_catalogo:
+        reconstruir_catalogo(args.pasta)
+        raise SystemExit(0)
+
+    if args.listar:
+        listar_backups(args.pasta)
+        raise SystemExit(0)
+
+    if args.apenas_retencao:
+        aplicar_retencao()
+        raise SystemExit(0)
+
+    if args.restaurar:
+        raise SystemExit(0 if restaurar_backup(args.restaurar, args.destino, args.forcar) else 1)
+
+    # Sem --banco, o banco configurado em database.py decide: arquivo SQLite ou PostgreSQL
+    postgresql = False
+    if not args.banco:
+        from database import engine
+        postgresql = engine.dialect.name == 'postgresql'
+
     # Cria backup
-    sucesso = criar_backup()
-    
-    if sucesso:
-        # Remove backups com mais de 30 dias (opcional)
-        # Descomente a linha abaixo para ativar limpeza automática
-        # limpar_backups_antigos(30)
-        
-        print("\n💡 DICA: Configure este script para rodar automaticamente!")
-        print("   Use o Agendador de Tarefas do Windows para backups diários.")
-    
-    print()
+    if postgresql:
+        if args.incremental:
+            parser.error("--incremental é só para SQLite")
+        manifesto = criar_backup_postgresql(engine, args.pasta, args.compressao, args.nivel, args.workers)
+    elif args.incremental:
+        manifesto = criar_backup_incremental(
+            args.banco, args.pasta, args.compressao, args.nivel, args.paginas_por_chunk,
+            args.paginas_por_passo, args.pausa_ms / 1000, progresso=_barra_progresso
+        )
+    else:
+        manifesto = criar_backup(
+            args.banco, args.pasta, args.compressao, args.nivel,
+            args.paginas_por_passo, args.pausa_ms / 1000, progresso=_barra_progresso
+        )
 
+    if manifesto:
+        listar_backups(args.pasta)
+        aplicar_retencao()
 
+        print("\n💡 DICA: Configure este script para rodar automaticamente!")
+        print("   Use o manutencao.py (qualquer sistema) ou o Agendador de Tarefas do Windows.")
 
+    print()
+    raise SystemExit(0 if manifesto else 1)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark da leitura da lista completa de equipamentos
+Compara o caminho antigo (objetos Equipment do ORM + um dict por linha) com o caminho
+enxuto (select() do Core direto para o DataFrame, em consultas.carregar_equipamentos_df)
+
+Uso: python benchmark_leitura.py [--linhas 100000] [--repeticoes 3]
+Usa um banco SQLite temporário; o estoque.db não é alterado
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from models import Base, Equipment
+from consultas import carregar_equipamentos_df
+
+
+def carregar_via_orm(db) -> pd.DataFrame:
+    """Caminho antigo do dashboard: instâncias Equipment e getattr campo a campo"""
+    equipments = db.query(Equipment).all()
+
+    return pd.DataFrame([{
+        'Código': eq.codigo,
+        'Nome': getattr(eq, 'nome', 'N/A'),
+        'Tipo': eq.tipo,
+        'Quantidade': eq.quantidade,
+        'Data Adição': getattr(eq, 'data_adicao', None),
+        'Última Atualização': getattr(eq, 'ultima_atualizacao', None)
+    } for eq in equipments])
+
+
+def popular_banco(engine, linhas: int):
+    """Insere equipamentos sintéticos em lotes"""
+    agora = datetime.now()
+    with engine.begin() as conn:
+        for inicio in range(0, linhas, 10000):
+            conn.execute(insert(Equipment), [{
+                'codigo': f"EQ{i // 2:07d}",
+                'nome': f"Equipamento de teste {i // 2}",
+                'tipo': 'NOVO' if i % 2 == 0 else 'USADO',
+                'quantidade': i % 500,
+                'data_adicao': agora,
+                'ultima_atualizacao': agora,
+            } for i in range(inicio, min(inicio + 10000, linhas))])
+
+
+def medir(Session, carregar, repeticoes: int) -> dict:
+    """Menor tempo entre as repetições, pico de memória alocada e tamanho do DataFrame"""
+    tempos = []
+    for _ in range(repeticoes):
+        db = Session()
+        gc.collect()
+        inicio = time.perf_counter()
+        carregar(db)
+        tempos.append(time.perf_counter() - inicio)
+        db.close()
+
+    db = Session()
+    gc.collect()
+    tracemalloc.start()
+    df = carregar(db)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+
+    return {
+        'tempo': min(tempos),
+        'pico': pico,
+        'dataframe': df.memory_usage(deep=True).sum(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da leitura da lista de equipamentos")
+    parser.add_argument('--linhas', type=int, default=100000, help="Equipamentos no banco de teste")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Execuções por caminho (vale a mais rápida)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        engine = create_engine(f"sqlite:///{os.path.join(pasta, 'benchmark.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        print(f"📦 Populando banco de teste com {args.linhas} equipamentos...")
+        popular_banco(engine, args.linhas)
+
+        resultados = {
+            'ORM + dicts': medir(Session, carregar_via_orm, args.repeticoes),
+            'Core enxuto': medir(Session, carregar_equipamentos_df, args.repeticoes),
+        }
+        engine.dispose()
+
+    print("=" * 70)
+    print(f"{'Caminho':<15}{'Tempo (s)':>12}{'Pico alocado (MB)':>22}{'DataFrame (MB)':>18}")
+    print("-" * 70)
+    for nome, r in resultados.items():
+        print(f"{nome:<15}{r['tempo']:>12.3f}{r['pico'] / 2**20:>22.1f}{r['dataframe'] / 2**20:>18.1f}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Busca indexada de equipamentos por código e nome
+- SQLite: tabela virtual FTS5 (tokenizer trigram) sincronizada por triggers
+- PostgreSQL: índices GIN pg_trgm em equipments.codigo e equipments.nome
+Sem os índices disponíveis, cai para LIKE/ILIKE (varredura completa)
+"""
+
+import threading
+from collections import OrderedDict
+from sqlalchemy import text, select, literal_column, func
+from sqlalchemy.orm import Session
+from models import Equipment
+from cache import versao_dados
+
+
+# Tamanho mínimo de termo que o índice de trigramas consegue atender
+TAMANHO_MINIMO_TRIGRAMA = 3
+
+# Cache por processo de qual índice de busca está disponível no banco
+_indice_disponivel = None
+
+# Autocompletar: sugestões por prefixo e quantos prefixos recentes ficam em memória
+LIMITE_AUTOCOMPLETAR = 20
+MAX_PREFIXOS_EM_CACHE = 256
+_lock_prefixos = threading.Lock()
+_prefixos_recentes = OrderedDict()
+
+
+def configurar_busca(engine) -> str:
+    """
+    Cria (se necessário) a estrutura de busca indexada do banco
+
+    Returns:
+        str: 'fts5', 'pg_trgm' ou 'like' (sem índice de busca)
+    """
+    global _indice_disponivel
+
+    if engine.dialect.name == 'postgresql':
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_equipments_codigo_trgm ON equipments USING gin (codigo gin_trgm_ops)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_equipments_nome_trgm ON equipments USING gin (nome gin_trgm_ops)"))
+            _indice_disponivel = 'pg_trgm'
+        except Exception as e:
+            print(f"⚠️ pg_trgm indisponível, busca usará ILIKE: {str(e).splitlines()[0]}")
+            _indice_disponivel = 'like'
+        return _indice_disponivel
+
+    try:
+        with engine.begin() as conn:
+            existe = conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name='equipments_fts'"
+            )).fetchone()
+
+            conn.execute(text("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS equipments_fts USING fts5(
+                    codigo, nome,
+                    content='equipments', content_rowid='id',
+                    tokenize='trigram'
+                )
+            """))
+
+            # Triggers mantêm o índice em sincronia com insert, update e delete
+            conn.execute(text("""
+                CREATE TRIGGER IF NOT EXISTS equipments_fts_ai AFTER INSERT ON equipments BEGIN
+                    INSERT INTO equipments_fts(rowid, codigo, nome) VALUES (new.id, new.codigo, new.nome);
+                END
+            """))
+            conn.execute(text("""
+                CREATE TRIGGER IF NOT EXISTS equipments_fts_ad AFTER DELETE ON equipments BEGIN
+                    INSERT INTO equipments_fts(equipments_fts, rowid, codigo, nome) VALUES ('delete', old.id, old.codigo, old.nome);
+                END
+            """))
+            conn.execute(text("""
+                CREATE TRIGGER IF NOT EXISTS equipments_fts_au AFTER UPDATE OF codigo, nome ON equipments BEGIN
+                    INSERT INTO equipments_fts(equipments_fts, rowid, codigo, nome) VALUES ('delete', old.id, old.codigo, old.nome);
+                    INSERT INTO equipments_fts(rowid, codigo, nome) VALUES (new.id, new.codigo, new.nome);
+                END
+            """))
+
+            # Índice recém-criado: popula com os registros já existentes
+            if not existe:
+                conn.execute(text("INSERT INTO equipments_fts(equipments_fts) VALUES ('rebuild')"))
+        _indice_disponivel = 'fts5'
+    except Exception as e:
+        print(f"⚠️ FTS5 indisponível, busca usará LIKE: {str(e)}")
+        _indice_disponivel = 'like'
+
+    return _indice_disponivel
+
+
+def _detectar_indice(db: Session) -> str:
+    """Descobre (uma vez por processo) qual índice de busca existe no banco"""
+    global _indice_disponivel
+
+    if _indice_disponivel is None:
+        if db.bind.dialect.name == 'postgresql':
+            existe = db.execute(text(
+                "SELECT 1 FROM pg_indexes WHERE tablename = 'equipments' AND indexname = 'ix_equipments_codigo_trgm'"
+            )).fetchone()
+            _indice_disponivel = 'pg_trgm' if existe else 'like'
+        else:
+            existe = db.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='equipments_fts'"
+            )).fetchone()
+            _indice_disponivel = 'fts5' if existe else 'like'
+
+    return _indice_disponivel
+
+
+def _escapar_like(termo: str) -> str:
+    """Escapa os curingas do LIKE digitados pelo usuário"""
+    return termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _frase_fts(termo: str) -> str:
+    """Transforma o termo em uma frase FTS5 literal (busca por substring no trigram)"""
+    return '"' + termo.replace('"', '""') + '"'
+
+
+def _consulta_fts(termo: str, campo: str = None, fuzzy: bool = False) -> str:
+    """
+    Monta a expressão MATCH do FTS5
+    No modo fuzzy, qualquer trigrama do termo casa e o bm25 ordena pelos que casam mais
+    """
+    if fuzzy:
+        termo = termo.lower()
+        trigramas = sorted({termo[i:i + 3] for i in range(len(termo) - 2)})
+        expressao = "(" + " OR ".join(_frase_fts(t) for t in trigramas) + ")"
+    else:
+        expressao = _frase_fts(termo)
+
+    return f"{campo} : {expressao}" if campo else expressao
+
+
+def condicao_busca(db: Session, termo: str, campo: str):
+    """
+    Retorna a condição SQL de "contém" para o campo ('codigo' ou 'nome'),
+    atendida pelo índice de busca quando disponível
+    """
+    coluna = getattr(Equipment, campo)
+    indice = _detectar_indice(db)
+
+    if indice == 'fts5' and len(termo) >= TAMANHO_MINIMO_TRIGRAMA:
+        ids = select(literal_column('rowid')).select_from(text('equipments_fts')).where(
+            text('equipments_fts MATCH :consulta_fts_' + campo).bindparams(
+                **{'consulta_fts_' + campo: _consulta_fts(termo, campo)}
+            )
+        )
+        return Equipment.id.in_(ids)
+
+    # No PostgreSQL o ILIKE '%termo%' é atendido pelo índice GIN de trigramas
+    return coluna.ilike(f"%{_escapar_like(termo)}%", escape='\\')
+
+
+def buscar_equipamentos(db: Session, termo: str, campo: str = None,
+                        fuzzy: bool = False, limite: int = 20) -> list:
+    """
+    Busca equipamentos por código e/ou nome, ordenados por relevância
+    Correspondências exatas e por prefixo do código vêm primeiro
+
+    Args:
+        campo: 'codigo', 'nome' ou None para ambos
+        fuzzy: tolera erros de digitação (similaridade por trigramas)
+
+    Returns:
+        list: [{'id', 'codigo', 'nome', 'tipo', 'quantidade', 'minimo'}]
+    """
+    termo = (termo or "").strip()
+    if not termo:
+        return []
+
+    indice = _detectar_indice(db)
+    campos = [campo] if campo else ['codigo', 'nome']
+    prefixo = f"{_escapar_like(termo.upper())}%"
+
+    if indice == 'fts5' and len(termo) >= TAMANHO_MINIMO_TRIGRAMA:
+        sql = text("""
+            SELECT e.id, e.codigo, e.nome, e.tipo, e.quantidade, e.minimo
+            FROM equipments_fts
+            JOIN equipments e ON e.id = equipments_fts.rowid
+            WHERE equipments_fts MATCH :consulta
+            ORDER BY (e.codigo = :exato) DESC,
+                     (e.codigo LIKE :prefixo ESCAPE '\\') DESC,
+                     bm25(equipments_fts)
+            LIMIT :limite
+        """)
+        parametros = {'consulta': _consulta_fts(termo, campo, fuzzy)}
+
+    elif indice == 'pg_trgm' and fuzzy:
+        similaridade = "GREATEST(" + ", ".join(f"similarity(e.{c}, :termo)" for c in campos) + ")"
+        sql = text(f"""
+            SELECT e.id, e.codigo, e.nome, e.tipo, e.quantidade, e.minimo
+            FROM equipments e
+            WHERE {' OR '.join(f"e.{c} % :termo" for c in campos)}
+            ORDER BY (e.codigo = :exato) DESC, {similaridade} DESC
+            LIMIT :limite
+        """)
+        parametros = {'termo': termo}
+
+    else:
+        # Substring (ILIKE usa o GIN pg_trgm no PostgreSQL; no SQLite é o fallback sem índice)
+        if db.bind.dialect.name == 'postgresql':
+            contem = [f"e.{c} ILIKE :contem ESCAPE '\\'" for c in campos]
+        else:
+            contem = [f"LOWER(e.{c}) LIKE LOWER(:contem) ESCAPE '\\'" for c in campos]
+        sql = text(f"""
+            SELECT e.id, e.codigo, e.nome, e.tipo, e.quantidade, e.minimo
+            FROM equipments e
+            WHERE {' OR '.join(contem)}
+            ORDER BY (e.codigo = :exato) DESC,
+                     (e.codigo LIKE :prefixo ESCAPE '\\') DESC,
+                     e.codigo, e.tipo
+            LIMIT :limite
+        """)
+        parametros = {'contem': f"%{_escapar_like(termo)}%"}
+
+    parametros.update({'exato': termo.upper(), 'prefixo': prefixo, 'limite': limite})
+    linhas = db.execute(sql, parametros).all()
+
+    return [{
+        'id': linha.id,
+        'codigo': linha.codigo,
+        'nome': linha.nome,
+        'tipo': linha.tipo,
+        'quantidade': linha.quantidade,
+        'minimo': linha.minimo
+    } for linha in linhas]
+
+
+def _proximo_prefixo(prefixo: str) -> str:
+    """Menor string maior que todas as que começam com o prefixo ('EQ' -> 'ER')"""
+    return prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+
+
+def _sugestoes_em_cache(prefixo: str, limite: int, versao: int):
+    """
+    Procura o prefixo entre os recentes (LRU); um prefixo mais curto cujo resultado
+    veio completo (menos que o limite) também atende, filtrando em memória
+    """
+    with _lock_prefixos:
+        for tamanho in range(len(prefixo), -1, -1):
+            chave = (prefixo[:tamanho], limite)
+            entrada = _prefixos_recentes.get(chave)
+            if entrada is None or entrada[0] != versao:
+                continue
+            if tamanho == len(prefixo):
+                _prefixos_recentes.move_to_end(chave)
+                return entrada[1]
+            if len(entrada[1]) < limite:
+                return [s for s in entrada[1] if s['codigo'].startswith(prefixo)]
+    return None
+
+
+def autocompletar_codigos(db: Session, prefixo: str, limite: int = LIMITE_AUTOCOMPLETAR) -> list:
+    """
+    Sugere os códigos que começam com o prefixo, em ordem alfabética, com uma varredura
+    de intervalo no índice do código (codigo >= :p AND codigo < :p_next) limitada a N códigos
+
+    Os prefixos consultados recentemente ficam em memória até a próxima escrita
+    (versão dos dados do cache compartilhado)
+
+    Returns:
+        list: [{'codigo', 'nome'}] com no máximo `limite` itens
+    """
+    prefixo = (prefixo or "").strip().upper()
+    versao = versao_dados()
+
+    sugestoes = _sugestoes_em_cache(prefixo, limite, versao)
+    if sugestoes is not None:
+        return sugestoes
+
+    consulta = select(Equipment.codigo, func.min(Equipment.nome).label('nome'))
+    if prefixo:
+        consulta = consulta.where(Equipment.codigo >= prefixo, Equipment.codigo < _proximo_prefixo(prefixo))
+
+    linhas = db.execute(
+        consulta.group_by(Equipment.codigo).order_by(Equipment.codigo).limit(limite)
+    ).all()
+
+    # Em collations não binárias (PostgreSQL) o intervalo pode trazer vizinhos sem o prefixo
+    sugestoes = [{'codigo': linha.codigo, 'nome': linha.nome}
+                 for linha in linhas if linha.codigo.startswith(prefixo)]
+
+    with _lock_prefixos:
+        if versao_dados() == versao:
+            _prefixos_recentes[(prefixo, limite)] = (versao, sugestoes)
+            _prefixos_recentes.move_to_end((prefixo, limite))
+            while len(_prefixos_recentes) > MAX_PREFIXOS_EM_CACHE:
+                _prefixos_recentes.popitem(last=False)
+
+    return sugestoes
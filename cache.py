@@ -0,0 +1,55 @@
+"""
+Cache compartilhado do estoque
+Guarda o snapshot do inventário e os agregados do dashboard para todas as sessões
+do processo, invalidado por um contador de versão dos dados
+"""
+
+import threading
+
+# O módulo é importado uma única vez por processo do Streamlit, então este estado
+# é compartilhado entre todas as sessões (o main.py é reexecutado, este módulo não)
+_lock = threading.Lock()
+_versao_dados = 0
+_entradas = {}
+
+
+def versao_dados() -> int:
+    """Retorna a versão atual dos dados"""
+    return _versao_dados
+
+
+def invalidar_cache() -> int:
+    """
+    Incrementa a versão dos dados; deve ser chamada após cada commit de escrita
+    Todas as entradas em cache passam a ser recarregadas na próxima leitura
+
+    Returns:
+        int: nova versão dos dados
+    """
+    global _versao_dados
+    with _lock:
+        _versao_dados += 1
+        _entradas.clear()
+        return _versao_dados
+
+
+def obter_em_cache(chave, carregar):
+    """
+    Retorna o valor em cache para a chave na versão atual dos dados,
+    chamando carregar() apenas quando não existir entrada válida
+
+    O valor retornado é compartilhado entre sessões e não deve ser alterado
+    """
+    versao = _versao_dados
+    entrada = _entradas.get(chave)
+    if entrada is not None and entrada[0] == versao:
+        return entrada[1]
+
+    valor = carregar()
+
+    # Só guarda se nenhuma escrita aconteceu durante a carga
+    with _lock:
+        if _versao_dados == versao:
+            _entradas[chave] = (versao, valor)
+
+    return valor
@@ -0,0 +1,197 @@
+"""
+Catálogo dos backups
+Um índice SQLite (backups/catalogo.db) com uma linha por backup: id, tipo, data, tamanho,
+SHA-256, backup pai e os arquivos que o compõem. Listar e podar consultam o catálogo, sem
+varrer a pasta nem abrir manifestos. Os chunks dos backups incrementais também ficam
+indexados (qual backup usa qual chunk), então os chunks órfãos saem de uma consulta
+
+O catálogo não conhece o formato dos backups: backup.py registra cada backup com a lista
+de arquivos (relativos à pasta) a apagar quando ele for removido
+
+Retenção avô-pai-filho (GFS): de cada tipo de backup ficam o mais recente de cada um dos
+últimos N dias, M semanas e K meses que têm backup (e sempre o mais recente de todos)
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+
+ARQUIVO_CATALOGO = 'catalogo.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    criado_em TEXT NOT NULL,
+    tamanho INTEGER NOT NULL,
+    tamanho_banco INTEGER,
+    sha256 TEXT,
+    pai TEXT,
+    arquivos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_backups_criado_em ON backups (criado_em);
+CREATE INDEX IF NOT EXISTS ix_backups_tipo_criado_em ON backups (tipo, criado_em);
+
+CREATE TABLE IF NOT EXISTS chunks (
+    sha256 TEXT PRIMARY KEY,
+    arquivo TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS backup_chunks (
+    backup_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (backup_id, sha256)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_backup_chunks_sha256 ON backup_chunks (sha256);
+"""
+
+COLUNAS = ('id', 'tipo', 'criado_em', 'tamanho', 'tamanho_banco', 'sha256', 'pai', 'arquivos')
+
+
+def caminho_catalogo(pasta_backups: str) -> str:
+    """Caminho do catálogo dentro da pasta de backups"""
+    return os.path.join(pasta_backups, ARQUIVO_CATALOGO)
+
+
+def abrir_catalogo(pasta_backups: str) -> sqlite3.Connection:
+    """Abre (criando se necessário) o catálogo da pasta; o commit fica com quem chama"""
+    conexao = sqlite3.connect(caminho_catalogo(pasta_backups), timeout=30)
+    conexao.row_factory = sqlite3.Row
+    conexao.executescript(_SCHEMA)
+    return conexao
+
+
+def registrar_backup(conexao: sqlite3.Connection, registro: dict, chunks: dict = None):
+    """
+    Grava (ou substitui) um backup no catálogo
+
+    Args:
+        registro: {'id', 'tipo', 'criado_em', 'tamanho', 'tamanho_banco', 'sha256', 'pai', 'arquivos'}
+                  com 'arquivos' uma lista de caminhos relativos à pasta de backups
+        chunks: {sha256: caminho relativo} dos chunks usados (backups incrementais)
+    """
+    valores = dict(registro, arquivos=json.dumps(registro['arquivos']))
+    conexao.execute(
+        f"INSERT OR REPLACE INTO backups ({', '.join(COLUNAS)}) VALUES ({', '.join('?' * len(COLUNAS))})",
+        [valores.get(coluna) for coluna in COLUNAS]
+    )
+    if chunks:
+        conexao.executemany("INSERT OR IGNORE INTO chunks (sha256, arquivo) VALUES (?, ?)", chunks.items())
+        conexao.executemany(
+            "INSERT OR IGNORE INTO backup_chunks (backup_id, sha256) VALUES (?, ?)",
+            ((registro['id'], sha256) for sha256 in chunks)
+        )
+
+
+def ultimo_backup(conexao: sqlite3.Connection, tipo: str, antes_de: str):
+    """Id do backup mais recente do tipo criado antes da data (ISO); None se não há nenhum"""
+    linha = conexao.execute(
+        "SELECT id FROM backups WHERE tipo = ? AND criado_em < ? ORDER BY criado_em DESC LIMIT 1",
+        (tipo, antes_de)
+    ).fetchone()
+    return linha['id'] if linha else None
+
+
+def listar_catalogo(conexao: sqlite3.Connection) -> list:
+    """Backups do catálogo, mais recentes primeiro"""
+    return conexao.execute(
+        f"SELECT {', '.join(COLUNAS)} FROM backups ORDER BY criado_em DESC, id DESC"
+    ).fetchall()
+
+
+def selecionar_gfs(backups: list, diarios: int = 0, semanais: int = 0, mensais: int = 0) -> set:
+    """
+    Ids a manter pela retenção GFS, considerando cada tipo de backup separadamente:
+    o mais recente de cada um dos `diarios` últimos dias com backup, idem para semanas
+    (ISO) e meses, e sempre o mais recente do tipo
+
+    Args:
+        backups: linhas com 'id', 'tipo' e 'criado_em' (ISO), mais recentes primeiro
+    """
+    regras = (
+        (diarios, lambda data: data.date()),
+        (semanais, lambda data: data.isocalendar()[:2]),
+        (mensais, lambda data: (data.year, data.month)),
+    )
+    manter = set()
+    por_tipo = {}
+    for backup in backups:
+        por_tipo.setdefault(backup['tipo'], []).append(backup)
+
+    for lista in por_tipo.values():
+        manter.add(lista[0]['id'])
+        for limite, periodo in regras:
+            vistos = set()
+            for backup in lista:
+                if len(vistos) >= limite:
+                    break
+                chave = periodo(datetime.fromisoformat(backup['criado_em']))
+                if chave not in vistos:
+                    vistos.add(chave)
+                    manter.add(backup['id'])
+
+    return manter
+
+
+def _tamanho_em_disco(caminho: str) -> int:
+    """Bytes ocupados por um arquivo ou pasta (0 se já não existe)"""
+    if os.path.isdir(caminho):
+        return sum(
+            os.path.getsize(os.path.join(raiz, arquivo))
+            for raiz, _, arquivos in os.walk(caminho) for arquivo in arquivos
+        )
+    return os.path.getsize(caminho) if os.path.exists(caminho) else 0
+
+
+def _apagar(caminho: str):
+    """Apaga um arquivo ou pasta, se existir"""
+    if os.path.isdir(caminho):
+        shutil.rmtree(caminho)
+    elif os.path.exists(caminho):
+        os.remove(caminho)
+
+
+def remover_backups(pasta_backups: str, conexao: sqlite3.Connection, ids: list) -> dict:
+    """
+    Remove os backups do catálogo e do disco, com os chunks que só eles usavam
+    O catálogo é atualizado (commit) antes de apagar os arquivos: uma falha no meio deixa
+    só arquivos sobrando, nunca um backup no catálogo sem seus arquivos
+
+    Returns:
+        dict: {'backups', 'chunks', 'bytes'} removidos
+    """
+    if not ids:
+        return {'backups': 0, 'chunks': 0, 'bytes': 0}
+
+    conexao.execute("CREATE TEMP TABLE IF NOT EXISTS remover (id TEXT PRIMARY KEY)")
+    conexao.execute("DELETE FROM remover")
+    conexao.executemany("INSERT OR IGNORE INTO remover (id) VALUES (?)", ((i,) for i in ids))
+
+    arquivos = [
+        caminho
+        for linha in conexao.execute("SELECT arquivos FROM backups WHERE id IN (SELECT id FROM remover)")
+        for caminho in json.loads(linha['arquivos'])
+    ]
+    chunks_orfaos = conexao.execute("""
+        SELECT c.sha256, c.arquivo FROM chunks c
+        WHERE c.sha256 IN (SELECT sha256 FROM backup_chunks WHERE backup_id IN (SELECT id FROM remover))
+          AND NOT EXISTS (
+              SELECT 1 FROM backup_chunks b
+              WHERE b.sha256 = c.sha256 AND b.backup_id NOT IN (SELECT id FROM remover)
+          )
+    """).fetchall()
+
+    removidos = conexao.execute("DELETE FROM backups WHERE id IN (SELECT id FROM remover)").rowcount
+    conexao.execute("DELETE FROM backup_chunks WHERE backup_id IN (SELECT id FROM remover)")
+    conexao.executemany("DELETE FROM chunks WHERE sha256 = ?", ((linha['sha256'],) for linha in chunks_orfaos))
+    conexao.commit()
+
+    liberados = 0
+    for caminho in arquivos + [linha['arquivo'] for linha in chunks_orfaos]:
+        caminho = os.path.join(pasta_backups, caminho)
+        liberados += _tamanho_em_disco(caminho)
+        _apagar(caminho)
+
+    return {'backups': removidos, 'chunks': len(chunks_orfaos), 'bytes': liberados}
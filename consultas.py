@@ -0,0 +1,324 @@
+"""
+Camada de consultas do estoque
+Concentra as leituras usadas pelo dashboard, calculadas direto no banco
+"""
+
+import pandas as pd
+from sqlalchemy import func, select, tuple_, case
+from sqlalchemy.orm import Session
+from models import Equipment, StockMovement, EquipmentTombstone, ChangeSequence, StockSummary
+from busca import condicao_busca
+from resumo import TIPO_TOTAL
+
+
+# Colunas da lista de equipamentos, na ordem exibida: (rótulo, coluna)
+COLUNAS_LISTA = [
+    ('Código', Equipment.codigo),
+    ('Nome', Equipment.nome),
+    ('Tipo', Equipment.tipo),
+    ('Quantidade', Equipment.quantidade),
+    ('Data Adição', Equipment.data_adicao),
+    ('Última Atualização', Equipment.ultima_atualizacao),
+]
+
+# Colunas permitidas para ordenação da lista (todas NOT NULL, exigência da paginação por chave)
+COLUNAS_ORDENACAO = {
+    'Código': Equipment.codigo,
+    'Nome': Equipment.nome,
+    'Tipo': Equipment.tipo,
+    'Quantidade': Equipment.quantidade,
+}
+
+
+def obter_estatisticas(db: Session) -> dict:
+    """
+    Lê as métricas do dashboard do resumo pré-calculado (stock_summary): uma linha por tipo
+    e a linha '*' com o total geral, mantidas por triggers. O custo não cresce com o estoque
+
+    Returns:
+        dict: {'total_itens', 'total_quantidade', 'total_novo', 'total_usado',
+               'codigos_unicos', 'por_tipo': [{'Tipo': str, 'Quantidade': int}]}
+    """
+    linhas = db.execute(
+        select(StockSummary.tipo, StockSummary.itens, StockSummary.quantidade, StockSummary.codigos_unicos)
+    ).all()
+
+    resumo = {tipo: (int(itens), int(quantidade), int(codigos)) for tipo, itens, quantidade, codigos in linhas}
+    itens, quantidade, codigos = resumo.pop(TIPO_TOTAL, (0, 0, 0))
+
+    return {
+        'total_itens': itens,
+        'total_quantidade': quantidade,
+        'total_novo': resumo.get('NOVO', (0, 0, 0))[1],
+        'total_usado': resumo.get('USADO', (0, 0, 0))[1],
+        'codigos_unicos': codigos,
+        # Tipos que ficaram sem registros continuam no resumo zerados
+        'por_tipo': [
+            {'Tipo': tipo, 'Quantidade': quantidade_tipo}
+            for tipo, (itens_tipo, quantidade_tipo, _) in sorted(resumo.items()) if itens_tipo > 0
+        ],
+    }
+
+
+def obter_top_equipamentos(db: Session, limite: int = 5, tipo: str = None, menores: bool = False) -> list:
+    """
+    Retorna os N equipamentos com maior (ou menor) quantidade, opcionalmente de um tipo
+    O ORDER BY segue a ordem dos índices (quantidade, id) e (tipo, quantidade, id): o banco
+    percorre o índice e para nas N primeiras linhas, sem ordenar a tabela
+
+    Returns:
+        list: [{'Código', 'Nome', 'Quantidade', 'Tipo'}]
+    """
+    if menores:
+        ordem = (Equipment.quantidade.asc(), Equipment.id.asc())
+    else:
+        ordem = (Equipment.quantidade.desc(), Equipment.id.desc())
+
+    consulta = select(Equipment.codigo, Equipment.nome, Equipment.quantidade, Equipment.tipo)
+    if tipo:
+        consulta = consulta.where(Equipment.tipo == tipo)
+
+    linhas = db.execute(consulta.order_by(*ordem).limit(limite)).all()
+
+    return [
+        {'Código': codigo, 'Nome': nome, 'Quantidade': quantidade, 'Tipo': tipo}
+        for codigo, nome, quantidade, tipo in linhas
+    ]
+
+
+def contar_alertas_estoque(db: Session) -> int:
+    """Quantos itens estão abaixo do estoque mínimo (lido do índice parcial ix_equipments_abaixo_minimo)"""
+    return db.execute(
+        select(func.count()).select_from(Equipment).where(Equipment.quantidade < Equipment.minimo)
+    ).scalar_one()
+
+
+def listar_alertas_estoque(db: Session, limite: int = 200) -> list:
+    """
+    Itens abaixo do estoque mínimo, na ordem do índice parcial (tipo, código)
+    O índice só contém esses itens: o custo acompanha o número de alertas, não o estoque
+
+    Returns:
+        list: [{'Código', 'Nome', 'Tipo', 'Quantidade', 'Mínimo', 'Faltam'}]
+    """
+    linhas = db.execute(
+        select(Equipment.codigo, Equipment.nome, Equipment.tipo, Equipment.quantidade, Equipment.minimo)
+        .where(Equipment.quantidade < Equipment.minimo)
+        .order_by(Equipment.tipo, Equipment.codigo)
+        .limit(limite)
+    ).all()
+
+    return [
+        {'Código': codigo, 'Nome': nome, 'Tipo': tipo, 'Quantidade': quantidade,
+         'Mínimo': minimo, 'Faltam': minimo - quantidade}
+        for codigo, nome, tipo, quantidade, minimo in linhas
+    ]
+
+
+def _dataframe_enxuto(linhas, colunas: list, excluir: list = None, indice: str = None) -> pd.DataFrame:
+    """
+    Monta o DataFrame direto das tuplas do cursor (sem objetos ORM nem dicts por linha),
+    com 'Tipo' categórico e 'Quantidade' no menor inteiro que comporta os valores
+    """
+    df = pd.DataFrame.from_records(linhas, columns=colunas, exclude=excluir, index=indice)
+    df['Tipo'] = df['Tipo'].astype('category')
+    df['Quantidade'] = pd.to_numeric(df['Quantidade'], downcast='integer')
+    return df
+
+
+def carregar_equipamentos_df(db: Session, desde_seq: int = None) -> pd.DataFrame:
+    """
+    Carrega os equipamentos em um DataFrame indexado pelo id, com as colunas exibidas no
+    dashboard, com um select() do Core apenas das colunas necessárias
+
+    Args:
+        desde_seq: se informado, só os registros alterados depois dessa sequência
+                   (intervalo no índice ix_equipments_seq)
+    """
+    consulta = select(Equipment.id, *(coluna for _, coluna in COLUNAS_LISTA))
+    if desde_seq is not None:
+        consulta = consulta.where(Equipment.seq > desde_seq)
+
+    # Executa na conexão (Core), sem passar pela camada de carregamento do ORM
+    linhas = db.connection().execute(consulta).all()
+    return _dataframe_enxuto(linhas, ['id'] + [rotulo for rotulo, _ in COLUNAS_LISTA], indice='id')
+
+
+def listar_remocoes(db: Session, desde_seq: int) -> list:
+    """Ids dos equipamentos removidos (equipment_tombstones) depois da sequência"""
+    return list(db.execute(
+        select(EquipmentTombstone.equipment_id).where(EquipmentTombstone.seq > desde_seq)
+    ).scalars())
+
+
+def sequencia_atual(db: Session) -> int:
+    """Última sequência de alteração com commit (todas as anteriores também estão visíveis)"""
+    return db.execute(
+        select(ChangeSequence.valor).where(ChangeSequence.nome == 'equipments')
+    ).scalar() or 0
+
+
+def alteracoes_desde(db: Session, seq: int, limite: int = 1000) -> dict:
+    """
+    Alterações em equipments depois da sequência `seq`, em ordem de sequência:
+    'upsert' com o estado atual do registro e 'delete' para as remoções (tombstones)
+    Uma sequência nunca é dividida entre chamadas, então o lote pode passar do limite
+    para trazer todas as alterações da última sequência
+
+    Returns:
+        dict: {'alteracoes': [{'seq', 'operacao', 'id', 'codigo', 'tipo', 'nome',
+               'quantidade', 'minimo', 'ultima_atualizacao'}], 'seq': cursor para a próxima chamada}
+
+    Raises:
+        ValueError: se o limite for menor que 1
+    """
+    if limite < 1:
+        raise ValueError(f"limite deve ser pelo menos 1 (recebido {limite})")
+
+    colunas_upsert = (Equipment.seq, Equipment.id, Equipment.codigo, Equipment.tipo,
+                      Equipment.nome, Equipment.quantidade, Equipment.minimo, Equipment.ultima_atualizacao)
+    colunas_delete = (EquipmentTombstone.seq, EquipmentTombstone.equipment_id,
+                      EquipmentTombstone.codigo, EquipmentTombstone.tipo)
+
+    def buscar(*condicoes, limitar=True):
+        upserts = select(*colunas_upsert).where(*(c(Equipment.seq) for c in condicoes)).order_by(Equipment.seq)
+        deletes = select(*colunas_delete).where(*(c(EquipmentTombstone.seq) for c in condicoes)).order_by(EquipmentTombstone.seq)
+        if limitar:
+            upserts, deletes = upserts.limit(limite), deletes.limit(limite)
+
+        alteracoes = [{
+            'seq': linha.seq, 'operacao': 'upsert', 'id': linha.id, 'codigo': linha.codigo,
+            'tipo': linha.tipo, 'nome': linha.nome, 'quantidade': linha.quantidade,
+            'minimo': linha.minimo, 'ultima_atualizacao': linha.ultima_atualizacao,
+        } for linha in db.execute(upserts)]
+        alteracoes += [{
+            'seq': linha.seq, 'operacao': 'delete', 'id': linha.equipment_id, 'codigo': linha.codigo,
+            'tipo': linha.tipo, 'nome': None, 'quantidade': 0, 'minimo': 0, 'ultima_atualizacao': None,
+        } for linha in db.execute(deletes)]
+
+        # Remoção antes do upsert na mesma sequência (id reaproveitado é recriado)
+        alteracoes.sort(key=lambda a: (a['seq'], a['operacao'] == 'upsert'))
+        return alteracoes
+
+    alteracoes = buscar(lambda coluna: coluna > seq)
+
+    if len(alteracoes) >= limite:
+        # Corta no limite, mas completa a última sequência
+        ultima = alteracoes[limite - 1]['seq']
+        alteracoes = [a for a in alteracoes if a['seq'] < ultima]
+        alteracoes += buscar(lambda coluna: coluna == ultima, limitar=False)
+
+    return {'alteracoes': alteracoes, 'seq': alteracoes[-1]['seq'] if alteracoes else seq}
+
+
+def _filtros_lista(db: Session, tipos=None, codigo: str = "", nome: str = "") -> list:
+    """Converte os filtros da tela em condições SQL parametrizadas (busca indexada em código e nome)"""
+    condicoes = []
+    if tipos:
+        condicoes.append(Equipment.tipo.in_(tipos))
+    if codigo:
+        condicoes.append(condicao_busca(db, codigo.upper(), 'codigo'))
+    if nome:
+        condicoes.append(condicao_busca(db, nome, 'nome'))
+    return condicoes
+
+
+def contar_equipamentos(db: Session, tipos=None, codigo: str = "", nome: str = "") -> int:
+    """Conta os equipamentos que atendem aos filtros da lista"""
+    return db.execute(
+        select(func.count(Equipment.id)).where(*_filtros_lista(db, tipos, codigo, nome))
+    ).scalar_one()
+
+
+def listar_equipamentos(db: Session, tipos=None, codigo: str = "", nome: str = "",
+                        ordenar_por: str = 'Código', decrescente: bool = False,
+                        apos=None, limite: int = 50) -> dict:
+    """
+    Retorna uma página da lista de equipamentos, filtrada e ordenada no banco,
+    usando paginação por chave (sort key, id) em vez de OFFSET
+
+    Args:
+        apos: cursor (valor da chave, id) da última linha da página anterior, ou None
+
+    Returns:
+        dict: {'df': DataFrame da página, 'proximo': cursor da próxima página ou None}
+    """
+    coluna = COLUNAS_ORDENACAO[ordenar_por]
+    condicoes = _filtros_lista(db, tipos, codigo, nome)
+
+    if apos is not None:
+        chave = tuple_(coluna, Equipment.id)
+        condicoes.append(chave < tuple_(*apos) if decrescente else chave > tuple_(*apos))
+
+    ordem = (coluna.desc(), Equipment.id.desc()) if decrescente else (coluna.asc(), Equipment.id.asc())
+
+    # Busca uma linha a mais para saber se existe próxima página
+    linhas = db.execute(
+        select(
+            *(coluna for _, coluna in COLUNAS_LISTA),
+            Equipment.id,
+            coluna.label('chave_ordenacao'),
+        )
+        .where(*condicoes)
+        .order_by(*ordem)
+        .limit(limite + 1)
+    ).all()
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = (linhas[-1].chave_ordenacao, linhas[-1].id)
+
+    df = _dataframe_enxuto(
+        linhas,
+        [rotulo for rotulo, _ in COLUNAS_LISTA] + ['id', 'chave_ordenacao'],
+        excluir=['id', 'chave_ordenacao']
+    )
+
+    return {'df': df, 'proximo': proximo}
+
+
+def resumo_movimentacoes(db: Session, inicio, fim) -> dict:
+    """
+    Totais de entradas e saídas no período [inicio, fim), lidos do livro de movimentações
+    pelo índice de criado_em (sem varrer o histórico inteiro)
+
+    Returns:
+        dict: {'entradas', 'saidas', 'movimentacoes'}
+    """
+    entradas, saidas, total = db.execute(
+        select(
+            func.coalesce(func.sum(case((StockMovement.delta > 0, StockMovement.delta), else_=0)), 0),
+            func.coalesce(func.sum(case((StockMovement.delta < 0, -StockMovement.delta), else_=0)), 0),
+            func.count(StockMovement.id),
+        ).where(StockMovement.criado_em >= inicio, StockMovement.criado_em < fim)
+    ).one()
+
+    return {'entradas': int(entradas), 'saidas': int(saidas), 'movimentacoes': int(total)}
+
+
+def listar_movimentacoes(db: Session, inicio, fim, equipment_id: int = None, limite: int = 100) -> pd.DataFrame:
+    """Movimentações do período [inicio, fim), mais recentes primeiro"""
+    condicoes = [StockMovement.criado_em >= inicio, StockMovement.criado_em < fim]
+    if equipment_id is not None:
+        condicoes.append(StockMovement.equipment_id == equipment_id)
+
+    linhas = db.execute(
+        select(
+            StockMovement.criado_em,
+            StockMovement.codigo,
+            StockMovement.tipo,
+            StockMovement.delta,
+            StockMovement.quantidade_apos,
+            StockMovement.usuario,
+            StockMovement.motivo,
+        )
+        .where(*condicoes)
+        .order_by(StockMovement.criado_em.desc(), StockMovement.id.desc())
+        .limit(limite)
+    ).all()
+
+    return pd.DataFrame(
+        [tuple(linha) for linha in linhas],
+        columns=['Data', 'Código', 'Tipo', 'Movimento', 'Saldo', 'Usuário', 'Motivo']
+    )
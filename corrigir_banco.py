@@ -6,128 +6,36 @@ Remove a constraint UNIQUE do campo codigo permitindo códigos duplicados com ti
 """
 
 import sqlite3
-import os
-from datetime import datetime
+from database import engine
+from migrations import executar_migracoes
+
 
 def corrigir_banco():
-    """Corrige a constraint UNIQUE do campo codigo"""
-    
-    banco = 'estoque.db'
-    
-    if not os.path.exists(banco):
-        print("❌ Banco de dados não encontrado!")
-        return False
+    """Corrige a constraint UNIQUE do campo codigo aplicando as migrações pendentes"""
     
     print("\n" + "=" * 70)
     print("🔧 CORREÇÃO DA CONSTRAINT UNIQUE")
     print("=" * 70)
     
     try:
-        conn = sqlite3.connect(banco)
-        cursor = conn.cursor()
+        # A correção (reconstrução em lotes, retomável) fica no sistema de migrations
+        print("\n1️⃣ Aplicando migrações pendentes...")
+        aplicadas = executar_migracoes(engine)
         
-        # Verifica estrutura atual
-        print("\n1️⃣ Verificando estrutura atual...")
-        cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='equipments'")
-        table_sql = cursor.fetchone()
-        
-        if table_sql:
-            print(f"\n📋 Estrutura atual:")
-            print(table_sql[0])
-            
-            if 'UNIQUE' in table_sql[0].upper() and 'CODIGO' in table_sql[0].upper():
-                print("\n⚠️  PROBLEMA DETECTADO: Campo 'codigo' tem constraint UNIQUE")
-                print("🔄 Iniciando correção...\n")
-                
-                # Faz backup dos dados
-                print("2️⃣ Fazendo backup dos dados...")
-                cursor.execute("SELECT * FROM equipments")
-                dados = cursor.fetchall()
-                print(f"✅ {len(dados)} registro(s) copiado(s)")
-                
-                # Cria nova tabela sem UNIQUE
-                print("\n3️⃣ Criando nova estrutura...")
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS equipments_new (
-                        id INTEGER PRIMARY KEY,
-                        codigo TEXT NOT NULL,
-                        nome TEXT NOT NULL,
-                        tipo TEXT NOT NULL,
-                        quantidade INTEGER NOT NULL DEFAULT 0,
-                        data_adicao DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        ultima_atualizacao DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                print("✅ Nova tabela criada")
-                
-                # Copia dados
-                print("\n4️⃣ Copiando dados para nova estrutura...")
-                cursor.execute("""
-                    INSERT INTO equipments_new 
-                    (id, codigo, nome, tipo, quantidade, data_adicao, ultima_atualizacao)
-                    SELECT 
-                        id, 
-                        codigo, 
-                        COALESCE(nome, 'Sem nome'), 
-                        tipo, 
-                        quantidade,
-                        COALESCE(data_adicao, CURRENT_TIMESTAMP),
-                        COALESCE(ultima_atualizacao, CURRENT_TIMESTAMP)
-                    FROM equipments
-                """)
-                print(f"✅ {cursor.rowcount} registro(s) copiado(s)")
-                
-                # Remove tabela antiga
-                print("\n5️⃣ Removendo tabela antiga...")
-                cursor.execute("DROP TABLE equipments")
-                print("✅ Tabela antiga removida")
-                
-                # Renomeia nova tabela
-                print("\n6️⃣ Renomeando nova tabela...")
-                cursor.execute("ALTER TABLE equipments_new RENAME TO equipments")
-                print("✅ Tabela renomeada")
-                
-                # Cria índice
-                print("\n7️⃣ Criando índice (não-único)...")
-                cursor.execute("CREATE INDEX IF NOT EXISTS ix_equipments_codigo ON equipments (codigo)")
-                print("✅ Índice criado")
-                
-                # Commit
-                conn.commit()
-                
-                # Verifica nova estrutura
-                print("\n8️⃣ Verificando nova estrutura...")
-                cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='equipments'")
-                new_table_sql = cursor.fetchone()
-                print(f"\n📋 Nova estrutura:")
-                print(new_table_sql[0])
-                
-                # Verifica dados
-                print("\n9️⃣ Verificando dados...")
-                cursor.execute("SELECT COUNT(*) FROM equipments")
-                total = cursor.fetchone()[0]
-                print(f"✅ Total de registros: {total}")
-                
-                print("\n" + "=" * 70)
-                print("✅ CORREÇÃO CONCLUÍDA COM SUCESSO!")
-                print("=" * 70)
-                print("\n💡 Agora você pode adicionar o mesmo código com tipos diferentes!")
-                print("   Exemplo: EQ001 NOVO e EQ001 USADO são permitidos.\n")
-                
-                return True
-            else:
-                print("\n✅ Banco já está correto! Não há constraint UNIQUE no campo codigo.")
-                return True
+        if aplicadas:
+            print("\n" + "=" * 70)
+            print("✅ CORREÇÃO CONCLUÍDA COM SUCESSO!")
+            print("=" * 70)
+            print("\n💡 Agora você pode adicionar o mesmo código com tipos diferentes!")
+            print("   Exemplo: EQ001 NOVO e EQ001 USADO são permitidos.\n")
         else:
-            print("❌ Tabela 'equipments' não encontrada!")
-            return False
+            print("\n✅ Banco já está correto! Todas as migrações já foram aplicadas.")
+        
+        return True
             
     except Exception as e:
         print(f"\n❌ ERRO: {str(e)}")
-        conn.rollback()
         return False
-    finally:
-        conn.close()
 
 
 def testar_insercao():
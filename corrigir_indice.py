@@ -1,34 +1,26 @@
-import sqlite3
+from sqlalchemy import text
+from database import engine
+from migrations import executar_migracoes
 
 print("\n" + "=" * 70)
 print("CORRIGINDO INDICE UNIQUE")
 print("=" * 70)
 
-conn = sqlite3.connect('estoque.db')
-cursor = conn.cursor()
-
 try:
-    # Remove índice UNIQUE antigo
-    print("\n1. Removendo indice UNIQUE antigo...")
-    cursor.execute("DROP INDEX IF EXISTS ix_equipments_codigo")
-    print("OK - Indice removido")
-    
-    # Cria índice normal (não-único)
-    print("\n2. Criando indice normal (nao-unico)...")
-    cursor.execute("CREATE INDEX IF NOT EXISTS ix_equipments_codigo ON equipments (codigo)")
-    print("OK - Indice criado")
+    # A troca do indice UNIQUE por um indice normal e feita pela migracao 002
+    print("\n1. Aplicando migracoes pendentes...")
+    aplicadas = executar_migracoes(engine, progresso=lambda mensagem: print(mensagem.encode('ascii', 'ignore').decode()))
+    print(f"OK - {len(aplicadas)} migracao(oes) aplicada(s)")
     
     # Verifica
-    print("\n3. Verificando indices...")
-    cursor.execute("PRAGMA index_list(equipments)")
-    indices = cursor.fetchall()
+    print("\n2. Verificando indices...")
+    with engine.connect() as conn:
+        indices = conn.execute(text("PRAGMA index_list(equipments)")).fetchall()
     
     for idx in indices:
         is_unique = "SIM" if idx[2] == 1 else "NAO"
         print(f"   - {idx[1]}: Unique = {is_unique}")
     
-    conn.commit()
-    
     print("\n" + "=" * 70)
     print("CORRECAO CONCLUIDA!")
     print("=" * 70)
@@ -36,8 +28,3 @@ try:
     
 except Exception as e:
     print(f"\nERRO: {str(e)}")
-    conn.rollback()
-finally:
-    conn.close()
-
-
@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, Session
 from models import Base, User, Equipment
+from migrations import executar_migracoes, versao_mais_recente
 import bcrypt
 import os
 
@@ -13,6 +14,75 @@ except Exception:
     StreamlitSecretNotFoundError = Exception  # fallback
 
 
+def _get_config(nome: str):
+    """Lê uma configuração da variável de ambiente ou, se ausente, de st.secrets"""
+    valor = os.environ.get(nome)
+    
+    if not valor and st:
+        try:
+            valor = st.secrets.get(nome, None)
+        except (StreamlitSecretNotFoundError, Exception):
+            valor = None
+    
+    return valor
+
+
+# Perfis de PRAGMA aplicados a cada conexão SQLite do pool (SQLITE_PERFIL)
+SQLITE_PERFIS = {
+    # Modo rollback-journal padrão; apenas espera por locks em vez de falhar com "database is locked"
+    'padrao': {
+        'journal_mode': 'DELETE',
+        'busy_timeout': 5000,
+    },
+    # WAL: leitores não bloqueiam o escritor; synchronous=NORMAL é seguro em WAL
+    'desempenho': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,      # 64 MB (valor negativo = KB)
+        'mmap_size': 268435456,    # 256 MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    # WAL com fsync a cada commit (durabilidade máxima)
+    'seguro': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16384,      # 16 MB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+    },
+}
+
+
+def _get_sqlite_perfil() -> str:
+    """Nome do perfil SQLite via SQLITE_PERFIL (env ou st.secrets); padrão: 'padrao'"""
+    perfil = (_get_config("SQLITE_PERFIL") or "padrao").lower()
+    
+    if perfil not in SQLITE_PERFIS:
+        print(f"⚠️ Perfil SQLite '{perfil}' desconhecido, usando 'padrao'. Opções: {', '.join(SQLITE_PERFIS)}")
+        perfil = "padrao"
+    
+    return perfil
+
+
+def _configurar_sqlite(engine, perfil: str):
+    """Registra o hook que aplica os PRAGMAs do perfil em cada nova conexão do pool"""
+    pragmas = SQLITE_PERFIS[perfil]
+    
+    @event.listens_for(engine, "connect")
+    def _aplicar_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {valor}")
+        cursor.close()
+
+
+def configuracoes_sqlite(conn) -> dict:
+    """Lê do banco os PRAGMAs efetivamente em vigor na conexão"""
+    nomes = ['journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout']
+    return {nome: conn.exec_driver_sql(f"PRAGMA {nome}").scalar() for nome in nomes}
+
+
 def _get_database_url() -> str:
     """
     Retorna a URL do banco de dados, permitindo configuração via:
@@ -23,28 +93,16 @@ def _get_database_url() -> str:
     Caso não definido, usa o estoque.db na pasta atual (SQLite).
     """
     # 1) DATABASE_URL completa (prioridade máxima) - suporta PostgreSQL
-    db_url = os.environ.get("DATABASE_URL")
-    
     # 2) DATABASE_URL via Streamlit secrets
-    if not db_url and st:
-        try:
-            db_url = st.secrets.get("DATABASE_URL", None)
-        except (StreamlitSecretNotFoundError, Exception):
-            db_url = None
+    db_url = _get_config("DATABASE_URL")
     
     # Se encontrou DATABASE_URL, retorna ela (pode ser PostgreSQL ou SQLite completo)
     if db_url:
         return db_url
     
     # 3) SQLITE_PATH via variável de ambiente (fallback para SQLite)
-    path = os.environ.get("SQLITE_PATH")
-    
     # 4) SQLITE_PATH via Streamlit secrets
-    if not path and st:
-        try:
-            path = st.secrets.get("SQLITE_PATH", None)
-        except (StreamlitSecretNotFoundError, Exception):
-            path = None
+    path = _get_config("SQLITE_PATH")
     
     # 5) Padrão local (SQLite)
     if not path:
@@ -68,6 +126,8 @@ if DATABASE_URL.startswith("postgresql"):
 else:
     print(f"📊 Usando SQLite: {DATABASE_URL}")
 
+SQLITE_PERFIL = _get_sqlite_perfil()
+
 try:
     engine = create_engine(
         DATABASE_URL,
@@ -75,6 +135,8 @@ try:
         pool_pre_ping=True,  # Testa conexão antes de usar
         pool_recycle=3600,   # Recicla conexões a cada hora
     )
+    if DATABASE_URL.startswith("sqlite"):
+        _configurar_sqlite(engine, SQLITE_PERFIL)
     
     # Testa a conexão
     with engine.connect() as conn:
@@ -84,6 +146,8 @@ try:
             print(f"✅ PostgreSQL conectado: {version[:50]}...")
         else:
             print("✅ SQLite conectado")
+            ativas = ", ".join(f"{nome}={valor}" for nome, valor in configuracoes_sqlite(conn).items())
+            print(f"⚙️ Perfil SQLite '{SQLITE_PERFIL}': {ativas}")
             
 except Exception as e:
     print(f"❌ Erro ao conectar ao banco: {str(e)}")
@@ -93,117 +157,38 @@ except Exception as e:
         DATABASE_URL,
         connect_args={"check_same_thread": False},
     )
+    _configurar_sqlite(engine, SQLITE_PERFIL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 def migrate_db():
-    """Adiciona colunas necessárias e corrige constraints da tabela equipments"""
+    """Aplica as migrações versionadas pendentes (ver migrations.py)"""
     try:
-        # Detecta se é PostgreSQL ou SQLite
-        is_postgres = DATABASE_URL.startswith("postgresql")
-        
-        with engine.connect() as conn:
-            # Verifica se a tabela existe (compatível com ambos)
-            if is_postgres:
-                result = conn.execute(text("""
-                    SELECT table_name FROM information_schema.tables 
-                    WHERE table_schema='public' AND table_name='equipments'
-                """))
-            else:
-                result = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name='equipments'"))
-            
-            if not result.fetchone():
-                return  # Tabela não existe, será criada pelo create_all
-            
-            # PostgreSQL não precisa de migração (modelo já está correto)
-            # Apenas SQLite pode ter problemas de UNIQUE constraint
-            if is_postgres:
-                return
-            
-            # Verifica quais colunas já existem (SQLite)
-            result = conn.execute(text("PRAGMA table_info(equipments)"))
-            columns = [row[1] for row in result]
-            
-            # Verifica se há constraint UNIQUE no código (problema a corrigir)
-            result = conn.execute(text("SELECT sql FROM sqlite_master WHERE type='table' AND name='equipments'"))
-            table_sql = result.fetchone()[0]
-            
-            # Verifica se o SQL da tabela contém UNIQUE na definição do código
-            needs_fix = False
-            if table_sql:
-                lines = table_sql.split('\n')
-                for line in lines:
-                    line_upper = line.upper().strip()
-                    if 'CODIGO' in line_upper and 'UNIQUE' in line_upper and 'CONSTRAINT' not in line_upper:
-                        needs_fix = True
-                        break
-            
-            # Se a tabela tem UNIQUE no codigo, precisamos recriá-la
-            if needs_fix:
-                print("🔄 Corrigindo constraint UNIQUE do código...")
-                
-                # Cria tabela temporária com estrutura correta
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS equipments_new (
-                        id INTEGER PRIMARY KEY,
-                        codigo TEXT NOT NULL,
-                        nome TEXT NOT NULL,
-                        tipo TEXT NOT NULL,
-                        quantidade INTEGER NOT NULL DEFAULT 0,
-                        data_adicao DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        ultima_atualizacao DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                """))
-                
-                # Copia dados da tabela antiga para a nova
-                conn.execute(text("""
-                    INSERT INTO equipments_new (id, codigo, nome, tipo, quantidade, data_adicao, ultima_atualizacao)
-                    SELECT id, codigo, 
-                           COALESCE(nome, 'Sem nome'), 
-                           tipo, 
-                           quantidade,
-                           COALESCE(data_adicao, CURRENT_TIMESTAMP),
-                           COALESCE(ultima_atualizacao, CURRENT_TIMESTAMP)
-                    FROM equipments
-                """))
-                
-                # Remove tabela antiga
-                conn.execute(text("DROP TABLE equipments"))
-                
-                # Renomeia tabela nova
-                conn.execute(text("ALTER TABLE equipments_new RENAME TO equipments"))
-                
-                # Cria índice no código (mas não UNIQUE)
-                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_equipments_codigo ON equipments (codigo)"))
-                
-                conn.commit()
-                print("✅ Constraint corrigida! Agora você pode ter o mesmo código com tipos diferentes.")
-                
-            else:
-                # Adiciona colunas faltantes normalmente
-                if 'nome' not in columns:
-                    conn.execute(text("ALTER TABLE equipments ADD COLUMN nome TEXT DEFAULT ''"))
-                    conn.execute(text("UPDATE equipments SET nome = 'Sem nome' WHERE nome IS NULL OR nome = ''"))
-                
-                if 'data_adicao' not in columns:
-                    conn.execute(text("ALTER TABLE equipments ADD COLUMN data_adicao DATETIME DEFAULT CURRENT_TIMESTAMP"))
-                
-                if 'ultima_atualizacao' not in columns:
-                    conn.execute(text("ALTER TABLE equipments ADD COLUMN ultima_atualizacao DATETIME DEFAULT CURRENT_TIMESTAMP"))
-                
-                conn.commit()
-                
+        executar_migracoes(engine)
     except Exception as e:
         print(f"⚠️ Erro na migração: {str(e)}")
-        # Se der erro, pode ser que a tabela não exista ainda, então ignora
-        pass
+
+
+def _versao_schema_atual() -> int:
+    """Retorna a versão do schema gravada no banco (0 se ainda não inicializado)"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT MAX(versao) FROM schema_version")).scalar() or 0
+    except Exception:
+        return 0  # Tabela schema_version ainda não existe
 
 
 def init_db():
-    """Inicializa o banco de dados e cria as tabelas"""
+    """
+    Inicializa o banco de dados e cria as tabelas
+    Se o schema já está na versão atual, não executa DDL nem introspecção (uma única consulta)
+    """
+    if _versao_schema_atual() >= versao_mais_recente():
+        return
+    
     Base.metadata.create_all(bind=engine)
     
-    # Executa migração para adicionar coluna 'nome' se necessário
+    # Executa as migrações versionadas pendentes
     migrate_db()
     
     # Cria usuários padrão se não existirem
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Feed de alterações do estoque (change data capture)
+Entrega as alterações de equipments depois de um cursor (número de sequência) como
+linhas JSON, em lotes, para sistemas que espelham o estoque sincronizarem só o que mudou
+
+Uso pela linha de comando (JSON lines na saída padrão, mensagens na saída de erro):
+    python feed_alteracoes.py --desde 0
+    python feed_alteracoes.py --cursor-arquivo cursor.txt --seguir
+
+Uso por HTTP (somente local):
+    python feed_alteracoes.py --http --porta 8765
+    GET /alteracoes?desde=0&limite=500   (limite de 1 a 10000)
+    Responde um lote em JSON lines; o próximo cursor vem no cabeçalho X-Proximo-Cursor
+
+Cada linha: {"seq", "operacao" ("upsert" ou "delete"), "id", "codigo", "tipo", "nome",
+"quantidade", "minimo", "ultima_atualizacao"}. Uma sequência nunca é dividida entre lotes.
+O próximo lote só é lido depois que o anterior foi entregue: um consumidor lento
+segura o ritmo do feed (pipe ou socket cheio bloqueia a escrita).
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# As mensagens de conexão do database vão para a saída de erro: a saída padrão é o feed
+with contextlib.redirect_stdout(sys.stderr):
+    from database import init_db, get_db_session
+from consultas import alteracoes_desde
+
+
+# Alterações por lote (uma sequência grande pode passar disso)
+TAMANHO_LOTE_FEED = 500
+
+# Maior lote aceito (limite do HTTP e do --limite)
+LIMITE_MAXIMO_FEED = 10000
+
+# Espera entre consultas no modo --seguir quando não há alterações novas
+INTERVALO_SEGUIR = 2.0
+
+
+def _linha_json(alteracao: dict) -> str:
+    """Serializa uma alteração como uma linha JSON"""
+    if alteracao['ultima_atualizacao'] is not None:
+        alteracao = dict(alteracao, ultima_atualizacao=alteracao['ultima_atualizacao'].isoformat())
+    return json.dumps(alteracao, ensure_ascii=False) + "\n"
+
+
+def ler_lote(desde: int, limite: int = TAMANHO_LOTE_FEED) -> dict:
+    """Lê um lote de alterações depois do cursor em uma sessão curta"""
+    db = get_db_session()
+    try:
+        return alteracoes_desde(db, desde, limite)
+    finally:
+        db.close()
+
+
+def ler_cursor(caminho: str) -> int:
+    """Último cursor confirmado no arquivo (0 se o arquivo ainda não existe)"""
+    if not caminho or not os.path.exists(caminho):
+        return 0
+    with open(caminho, encoding='utf-8') as f:
+        return int(f.read().strip() or 0)
+
+
+def salvar_cursor(caminho: str, seq: int):
+    """Grava o cursor de forma atômica (arquivo temporário + rename)"""
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(str(seq))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+def transmitir(desde: int, limite: int, seguir: bool, cursor_arquivo: str = None, saida=sys.stdout) -> int:
+    """
+    Escreve as alterações depois do cursor na saída, lote a lote
+    O cursor só avança no arquivo depois que o lote inteiro foi escrito e descarregado,
+    então uma interrupção no meio reenvia o lote (entrega pelo menos uma vez)
+
+    Returns:
+        int: último cursor entregue
+    """
+    while True:
+        lote = ler_lote(desde, limite)
+
+        if lote['alteracoes']:
+            saida.writelines(_linha_json(alteracao) for alteracao in lote['alteracoes'])
+            saida.flush()
+            desde = lote['seq']
+            if cursor_arquivo:
+                salvar_cursor(cursor_arquivo, desde)
+            print(f"📤 {len(lote['alteracoes'])} alterações entregues (cursor {desde})", file=sys.stderr)
+            continue
+
+        if not seguir:
+            return desde
+        time.sleep(INTERVALO_SEGUIR)
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """GET /alteracoes?desde=N&limite=M → um lote em JSON lines"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/alteracoes':
+            self.send_error(404, "Use /alteracoes?desde=N")
+            return
+
+        parametros = parse_qs(url.query)
+        try:
+            desde = int(parametros.get('desde', ['0'])[0])
+            limite = int(parametros.get('limite', [str(TAMANHO_LOTE_FEED)])[0])
+        except ValueError:
+            self.send_error(400, "desde e limite devem ser inteiros")
+            return
+        if not 1 <= limite <= LIMITE_MAXIMO_FEED:
+            self.send_error(400, f"limite deve estar entre 1 e {LIMITE_MAXIMO_FEED}")
+            return
+
+        lote = ler_lote(desde, limite)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('X-Proximo-Cursor', str(lote['seq']))
+        self.send_header('X-Quantidade', str(len(lote['alteracoes'])))
+        self.end_headers()
+
+        # Escrita linha a linha: com o socket cheio, a escrita bloqueia até o cliente ler
+        for alteracao in lote['alteracoes']:
+            self.wfile.write(_linha_json(alteracao).encode('utf-8'))
+
+    def log_message(self, formato, *args):
+        print(f"🌐 {self.address_string()} - {formato % args}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed de alterações do estoque em JSON lines")
+    parser.add_argument('--desde', type=int, help="Cursor inicial (sequência); padrão: o do --cursor-arquivo ou 0")
+    parser.add_argument('--limite', type=int, default=TAMANHO_LOTE_FEED, help="Alterações por lote")
+    parser.add_argument('--cursor-arquivo', help="Arquivo onde o cursor é lido e salvo após cada lote")
+    parser.add_argument('--seguir', action='store_true', help="Continua aguardando novas alterações")
+    parser.add_argument('--http', action='store_true', help="Serve o feed por HTTP em vez da saída padrão")
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço do servidor HTTP")
+    parser.add_argument('--porta', type=int, default=8765, help="Porta do servidor HTTP")
+    args = parser.parse_args()
+
+    if not 1 <= args.limite <= LIMITE_MAXIMO_FEED:
+        parser.error(f"--limite deve estar entre 1 e {LIMITE_MAXIMO_FEED}")
+
+    with contextlib.redirect_stdout(sys.stderr):
+        init_db()
+
+    if args.http:
+        servidor = ThreadingHTTPServer((args.host, args.porta), FeedHandler)
+        print(f"🌐 Feed de alterações em http://{args.host}:{args.porta}/alteracoes?desde=0", file=sys.stderr)
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            servidor.server_close()
+        return
+
+    desde = args.desde if args.desde is not None else ler_cursor(args.cursor_arquivo)
+    try:
+        cursor = transmitir(desde, args.limite, args.seguir, args.cursor_arquivo)
+        print(f"✅ Feed em dia (cursor {cursor})", file=sys.stderr)
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Importação em lote de estoque a partir de arquivos CSV ou Excel (XLSX)
+O arquivo é lido em lotes e validado de forma vetorizada com pandas; cada lote vai para
+uma tabela temporária (COPY no PostgreSQL, executemany no SQLite) e no final tudo é
+mesclado em equipments como upserts (codigo, tipo), com registro no livro de movimentações
+A importação inteira roda na transação da sessão; o commit fica com quem chama
+"""
+
+import io
+import os
+import time
+import unicodedata
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, text
+from sqlalchemy.orm import Session
+from models import Equipment
+from operacoes import proxima_sequencia, SQL_INSERIDO_POSTGRESQL
+
+
+# Linhas do arquivo lidas e validadas por vez
+TAMANHO_LOTE_IMPORTACAO = 5000
+
+TIPOS_VALIDOS = ('NOVO', 'USADO')
+COLUNAS_OBRIGATORIAS = ['codigo', 'tipo', 'quantidade']
+COLUNAS_REJEITADOS = ['Linha', 'Código', 'Motivo']
+
+# Nomes alternativos aceitos no cabeçalho (comparados sem acento e em minúsculas)
+_SINONIMOS_COLUNAS = {
+    'cod': 'codigo',
+    'qtd': 'quantidade',
+    'qtde': 'quantidade',
+}
+
+
+def _normalizar_coluna(nome) -> str:
+    """'Código ' -> 'codigo'"""
+    texto = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode()
+    texto = texto.strip().lower()
+    return _SINONIMOS_COLUNAS.get(texto, texto)
+
+
+def _detectar_separador(arquivo) -> str:
+    """Escolhe entre ',' e ';' (padrão do Excel em português) pela primeira linha"""
+    posicao = arquivo.tell()
+    linha = arquivo.readline()
+    arquivo.seek(posicao)
+
+    if isinstance(linha, bytes):
+        linha = linha.decode('utf-8', errors='ignore')
+    return ';' if linha.count(';') > linha.count(',') else ','
+
+
+def _lotes_csv(arquivo, tamanho_lote: int):
+    """Lê o CSV em lotes de texto (sem carregar o arquivo inteiro)"""
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, 'rb') as f:
+            yield from _lotes_csv(f, tamanho_lote)
+        return
+
+    yield from pd.read_csv(
+        arquivo,
+        sep=_detectar_separador(arquivo),
+        dtype=str,
+        keep_default_na=False,
+        encoding='utf-8-sig',
+        chunksize=tamanho_lote
+    )
+
+
+def _lotes_excel(arquivo, tamanho_lote: int):
+    """Lê a primeira planilha do XLSX em lotes, no modo somente leitura (streaming)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("Importação de Excel requer o pacote openpyxl (pip install openpyxl)")
+
+    planilha = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = planilha.active.iter_rows(values_only=True)
+        cabecalho = ['' if valor is None else str(valor) for valor in next(linhas, ())]
+
+        lote = []
+        for linha in linhas:
+            lote.append(['' if valor is None else str(valor) for valor in linha[:len(cabecalho)]])
+            if len(lote) == tamanho_lote:
+                yield pd.DataFrame(lote, columns=cabecalho)
+                lote = []
+        if lote:
+            yield pd.DataFrame(lote, columns=cabecalho)
+    finally:
+        planilha.close()
+
+
+def ler_em_lotes(arquivo, nome_arquivo: str, tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO):
+    """
+    Gera DataFrames de até tamanho_lote linhas com as colunas
+    'linha' (número da linha no arquivo), 'codigo', 'nome', 'tipo' e 'quantidade' (texto)
+
+    Args:
+        arquivo: caminho ou arquivo aberto em modo binário (ex: st.file_uploader)
+        nome_arquivo: usado para identificar o formato pela extensão (.csv ou .xlsx)
+    """
+    extensao = os.path.splitext(nome_arquivo)[1].lower()
+    if extensao in ('.csv', '.txt'):
+        lotes = _lotes_csv(arquivo, tamanho_lote)
+    elif extensao in ('.xlsx', '.xlsm'):
+        lotes = _lotes_excel(arquivo, tamanho_lote)
+    else:
+        raise ValueError(f"Formato não suportado: '{extensao}' (use CSV ou XLSX)")
+
+    proxima_linha = 2  # linha 1 é o cabeçalho
+    for lote in lotes:
+        lote.columns = [_normalizar_coluna(coluna) for coluna in lote.columns]
+
+        faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in lote.columns]
+        if faltando:
+            raise ValueError(f"Colunas obrigatórias ausentes no arquivo: {', '.join(faltando)}")
+        if 'nome' not in lote.columns:
+            lote['nome'] = ''
+
+        lote['linha'] = np.arange(proxima_linha, proxima_linha + len(lote))
+        proxima_linha += len(lote)
+
+        yield lote[['linha', 'codigo', 'nome', 'tipo', 'quantidade']]
+
+
+def validar_lote(lote: pd.DataFrame):
+    """
+    Normaliza e valida um lote de forma vetorizada (sem laço por linha)
+
+    Returns:
+        tuple: (DataFrame válido com quantidade inteira, DataFrame de rejeitados)
+    """
+    lote = lote.copy()
+    for coluna in ('codigo', 'nome', 'tipo', 'quantidade'):
+        lote[coluna] = lote[coluna].astype(str).str.strip()
+
+    # Linhas totalmente em branco (comuns no fim de planilhas) são ignoradas
+    lote = lote[(lote[['codigo', 'nome', 'tipo', 'quantidade']] != '').any(axis=1)]
+
+    lote['codigo'] = lote['codigo'].str.upper()
+    lote['tipo'] = lote['tipo'].str.upper()
+    quantidade = pd.to_numeric(lote['quantidade'].str.replace(',', '.', regex=False), errors='coerce')
+
+    # A primeira regra violada é o motivo da rejeição
+    motivo = np.select(
+        [
+            (lote['codigo'] == '').to_numpy(),
+            (~lote['tipo'].isin(TIPOS_VALIDOS)).to_numpy(),
+            quantidade.isna().to_numpy(),
+            (quantidade % 1 != 0).to_numpy(),
+            (quantidade <= 0).to_numpy(),
+        ],
+        [
+            'Código vazio',
+            'Tipo inválido (use NOVO ou USADO)',
+            'Quantidade não numérica',
+            'Quantidade não inteira',
+            'Quantidade deve ser maior que zero',
+        ],
+        default=''
+    )
+
+    invalido = motivo != ''
+    rejeitados = pd.DataFrame({
+        'Linha': lote['linha'][invalido],
+        'Código': lote['codigo'][invalido],
+        'Motivo': motivo[invalido],
+    }, columns=COLUNAS_REJEITADOS)
+
+    validos = lote[~invalido].copy()
+    validos['quantidade'] = quantidade[~invalido].astype('int64')
+
+    return validos, rejeitados
+
+
+def _completar_nomes(db: Session, validos: pd.DataFrame, nomes_conhecidos: dict):
+    """
+    Preenche o nome vazio de códigos já conhecidos (de linhas anteriores do arquivo ou
+    do banco, em uma consulta por lote); código novo sem nome é rejeitado
+
+    Returns:
+        tuple: (DataFrame com nomes, DataFrame de rejeitados)
+    """
+    com_nome = validos['nome'] != ''
+    for codigo, nome in validos.loc[com_nome, ['codigo', 'nome']].drop_duplicates('codigo').itertuples(index=False):
+        nomes_conhecidos.setdefault(codigo, nome)
+
+    sem_nome = ~com_nome
+    if sem_nome.any():
+        desconhecidos = [codigo for codigo in validos.loc[sem_nome, 'codigo'].unique() if codigo not in nomes_conhecidos]
+        if desconhecidos:
+            nomes_conhecidos.update(db.execute(
+                select(Equipment.codigo, func.min(Equipment.nome))
+                .where(Equipment.codigo.in_(desconhecidos))
+                .group_by(Equipment.codigo)
+            ).all())
+        validos.loc[sem_nome, 'nome'] = validos.loc[sem_nome, 'codigo'].map(nomes_conhecidos).fillna('')
+
+    invalido = validos['nome'] == ''
+    rejeitados = pd.DataFrame({
+        'Linha': validos['linha'][invalido],
+        'Código': validos['codigo'][invalido],
+        'Motivo': 'Nome obrigatório para código novo',
+    }, columns=COLUNAS_REJEITADOS)
+
+    return validos[~invalido], rejeitados
+
+
+def _agrupar(validos: pd.DataFrame) -> pd.DataFrame:
+    """Soma as linhas repetidas de código+tipo (um upsert por equipamento)"""
+    return (
+        validos.groupby(['codigo', 'tipo'], sort=False)
+        .agg(nome=('nome', 'first'), quantidade=('quantidade', 'sum'))
+        .reset_index()
+    )
+
+
+def _preparar_staging(db: Session):
+    """Tabela temporária que recebe os lotes antes da mesclagem"""
+    if db.bind.dialect.name == 'postgresql':
+        db.execute(text("""
+            CREATE TEMP TABLE IF NOT EXISTS importacao_estoque (
+                codigo TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                quantidade INTEGER NOT NULL
+            ) ON COMMIT DROP
+        """))
+    else:
+        db.execute(text("""
+            CREATE TEMP TABLE IF NOT EXISTS importacao_estoque (
+                codigo TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                quantidade INTEGER NOT NULL
+            )
+        """))
+    db.execute(text("DELETE FROM importacao_estoque"))
+
+
+def _carregar_lote(db: Session, lote: pd.DataFrame):
+    """
+    Envia o lote para a tabela temporária: COPY FROM STDIN no PostgreSQL,
+    executemany de um único INSERT no SQLite
+    """
+    if db.bind.dialect.name != 'postgresql':
+        db.execute(
+            text("INSERT INTO importacao_estoque (codigo, nome, tipo, quantidade) VALUES (:codigo, :nome, :tipo, :quantidade)"),
+            lote[['codigo', 'nome', 'tipo', 'quantidade']].to_dict('records')
+        )
+        return
+
+    buffer = io.StringIO()
+    lote[['codigo', 'nome', 'tipo', 'quantidade']].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY importacao_estoque (codigo, nome, tipo, quantidade) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _mesclar_staging(db: Session, usuario: str, motivo: str) -> int:
+    """
+    Mescla a tabela temporária em equipments (upsert por codigo+tipo) e grava uma
+    movimentação por equipamento, com comandos sobre o conjunto inteiro
+
+    Returns:
+        int: quantidade de equipamentos novos
+    """
+    parametros = {'agora': datetime.now(), 'usuario': usuario, 'motivo': motivo, 'seq': proxima_sequencia(db)}
+
+    if db.bind.dialect.name == 'postgresql':
+        return db.execute(text(f"""
+            WITH lote AS (
+                SELECT codigo, MIN(nome) AS nome, tipo, SUM(quantidade) AS quantidade
+                FROM importacao_estoque
+                GROUP BY codigo, tipo
+            ),
+            gravados AS (
+                INSERT INTO equipments (codigo, nome, tipo, quantidade, data_adicao, ultima_atualizacao, seq)
+                SELECT codigo, nome, tipo, quantidade, :agora, :agora, :seq FROM lote
+                ON CONFLICT (codigo, tipo) DO UPDATE
+                    SET quantidade = equipments.quantidade + excluded.quantidade,
+                        ultima_atualizacao = excluded.ultima_atualizacao,
+                        seq = excluded.seq
+                RETURNING id, codigo, tipo, quantidade, {SQL_INSERIDO_POSTGRESQL} AS inserido
+            ),
+            movimentos AS (
+                INSERT INTO stock_movements (equipment_id, codigo, tipo, delta, quantidade_apos, usuario, motivo, criado_em)
+                SELECT g.id, g.codigo, g.tipo, l.quantidade, g.quantidade, :usuario, :motivo, :agora
+                FROM gravados g
+                JOIN lote l ON l.codigo = g.codigo AND l.tipo = g.tipo
+            )
+            SELECT COUNT(*) FILTER (WHERE inserido) FROM gravados
+        """), parametros).scalar_one()
+
+    # SQLite não aceita INSERT em CTE: contagem, upsert e movimentações em comandos separados
+    novos = db.execute(text("""
+        SELECT COUNT(*) FROM (SELECT DISTINCT codigo, tipo FROM importacao_estoque) l
+        WHERE NOT EXISTS (SELECT 1 FROM equipments e WHERE e.codigo = l.codigo AND e.tipo = l.tipo)
+    """)).scalar_one()
+
+    # WHERE true evita a ambiguidade do parser entre ON CONFLICT e JOIN ... ON
+    db.execute(text("""
+        INSERT INTO equipments (codigo, nome, tipo, quantidade, data_adicao, ultima_atualizacao, seq)
+        SELECT codigo, MIN(nome), tipo, SUM(quantidade), :agora, :agora, :seq
+        FROM importacao_estoque
+        WHERE true
+        GROUP BY codigo, tipo
+        ON CONFLICT (codigo, tipo) DO UPDATE
+            SET quantidade = quantidade + excluded.quantidade,
+                ultima_atualizacao = excluded.ultima_atualizacao,
+                seq = excluded.seq
+    """), parametros)
+
+    db.execute(text("""
+        INSERT INTO stock_movements (equipment_id, codigo, tipo, delta, quantidade_apos, usuario, motivo, criado_em)
+        SELECT e.id, e.codigo, e.tipo, l.quantidade, e.quantidade, :usuario, :motivo, :agora
+        FROM (SELECT codigo, tipo, SUM(quantidade) AS quantidade FROM importacao_estoque GROUP BY codigo, tipo) l
+        JOIN equipments e ON e.codigo = l.codigo AND e.tipo = l.tipo
+    """), parametros)
+
+    db.execute(text("DROP TABLE temp.importacao_estoque"))
+    return novos
+
+
+def importar_estoque(db: Session, arquivo, nome_arquivo: str, usuario: str = None, motivo: str = None,
+                     tamanho_lote: int = TAMANHO_LOTE_IMPORTACAO, progresso=None) -> dict:
+    """
+    Importa um arquivo CSV/XLSX de entradas de estoque (colunas codigo, nome, tipo, quantidade)
+    Quantidades são somadas ao estoque existente de cada código+tipo; linhas inválidas
+    são rejeitadas individualmente sem interromper a importação
+
+    Args:
+        usuario, motivo: gravados no livro de movimentações
+        progresso: função opcional chamada a cada lote com (linhas_lidas, linhas_importadas)
+
+    Returns:
+        dict: {'linhas_lidas', 'linhas_importadas', 'equipamentos_novos',
+               'rejeitados': DataFrame (Linha, Código, Motivo), 'duracao', 'linhas_por_segundo'}
+    """
+    inicio = time.perf_counter()
+    motivo = motivo or None
+
+    _preparar_staging(db)
+
+    linhas_lidas = 0
+    linhas_importadas = 0
+    rejeitados = []
+    nomes_conhecidos = {}
+
+    for bruto in ler_em_lotes(arquivo, nome_arquivo, tamanho_lote):
+        linhas_lidas += len(bruto)
+
+        validos, rejeitados_validacao = validar_lote(bruto)
+        validos, rejeitados_nome = _completar_nomes(db, validos, nomes_conhecidos)
+        rejeitados.extend([rejeitados_validacao, rejeitados_nome])
+
+        if len(validos):
+            _carregar_lote(db, _agrupar(validos))
+            linhas_importadas += len(validos)
+
+        if progresso:
+            progresso(linhas_lidas, linhas_importadas)
+
+    equipamentos_novos = _mesclar_staging(db, usuario, motivo) if linhas_importadas else 0
+
+    duracao = time.perf_counter() - inicio
+    rejeitados = [df for df in rejeitados if len(df)]
+
+    return {
+        'linhas_lidas': linhas_lidas,
+        'linhas_importadas': linhas_importadas,
+        'equipamentos_novos': int(equipamentos_novos),
+        'rejeitados': (pd.concat(rejeitados, ignore_index=True).sort_values('Linha', ignore_index=True)
+                       if rejeitados else pd.DataFrame(columns=COLUNAS_REJEITADOS)),
+        'duracao': duracao,
+        'linhas_por_segundo': linhas_lidas / duracao if duracao > 0 else 0.0,
+    }
@@ -2,11 +2,21 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 from database import init_db, get_db_session, DATABASE_URL, engine
-from models import Equipment
 from auth import authenticate_user
+from consultas import (
+    obter_estatisticas, obter_top_equipamentos,
+    listar_equipamentos, contar_equipamentos, COLUNAS_ORDENACAO,
+    resumo_movimentacoes, listar_movimentacoes,
+    contar_alertas_estoque, listar_alertas_estoque
+)
+from cache import obter_em_cache, invalidar_cache
+from snapshot import obter_snapshot
+from busca import buscar_equipamentos, autocompletar_codigos, LIMITE_AUTOCOMPLETAR
+from operacoes import adicionar_estoque, adicionar_estoque_em_lote, remover_estoque, definir_minimo
+from importacao import importar_estoque
 from sqlalchemy import text
 
 # Configuração da página
@@ -43,8 +53,16 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+
+@st.cache_resource(show_spinner=False)
+def inicializar_banco():
+    """Executa o bootstrap do banco uma única vez por processo (não a cada rerun do Streamlit)"""
+    init_db()
+    return True
+
+
 # Inicializa o banco de dados
-init_db()
+inicializar_banco()
 
 # Inicializa variáveis de sessão
 if 'authenticated' not in st.session_state:
@@ -91,31 +109,21 @@ def dashboard_page():
     
     db = get_db_session()
     try:
-        equipments = db.query(Equipment).all()
+        estatisticas = obter_em_cache('estatisticas', lambda: obter_estatisticas(db))
         
-        if not equipments:
+        if not estatisticas['total_itens']:
             st.info("📭 Nenhum equipamento cadastrado ainda. Adicione equipamentos para visualizar o dashboard.")
             return
         
-        # Prepara dados para análise
-        df = pd.DataFrame([{
-            'Código': eq.codigo,
-            'Nome': getattr(eq, 'nome', 'N/A'),
-            'Tipo': eq.tipo,
-            'Quantidade': eq.quantidade,
-            'Data Adição': getattr(eq, 'data_adicao', None),
-            'Última Atualização': getattr(eq, 'ultima_atualizacao', None)
-        } for eq in equipments])
-        
         # Estatísticas gerais no topo
         st.subheader("📈 Estatísticas Gerais")
         col1, col2, col3, col4, col5 = st.columns(5)
         
-        total_tipos = len(equipments)  # Total de linhas (código+tipo)
-        total_quantidade = df['Quantidade'].sum()
-        total_novo = df[df['Tipo'] == 'NOVO']['Quantidade'].sum()
-        total_usado = df[df['Tipo'] == 'USADO']['Quantidade'].sum()
-        codigos_unicos = df['Código'].nunique()
+        total_tipos = estatisticas['total_itens']  # Total de linhas (código+tipo)
+        total_quantidade = estatisticas['total_quantidade']
+        total_novo = estatisticas['total_novo']
+        total_usado = estatisticas['total_usado']
+        codigos_unicos = estatisticas['codigos_unicos']
         
         with col1:
             st.metric("📦 Itens no Banco", total_tipos, help="Total de registros salvos")
@@ -128,6 +136,18 @@ def dashboard_page():
         with col5:
             st.metric("🏷️ Códigos Únicos", codigos_unicos, help="Total de códigos diferentes")
         
+        # Alertas de estoque mínimo (índice parcial: só os itens abaixo do mínimo)
+        total_alertas = obter_em_cache('alertas', lambda: contar_alertas_estoque(db))
+        if total_alertas:
+            st.badge(f"{total_alertas} abaixo do estoque mínimo", icon="⚠️", color="red")
+            with st.expander(f"⚠️ Itens abaixo do estoque mínimo ({total_alertas})"):
+                alertas = obter_em_cache('lista_alertas', lambda: listar_alertas_estoque(db))
+                st.dataframe(pd.DataFrame(alertas), use_container_width=True, hide_index=True)
+                if total_alertas > len(alertas):
+                    st.caption(f"Mostrando {len(alertas)} de {total_alertas} alertas")
+        else:
+            st.badge("Nenhum item abaixo do mínimo", icon="✅", color="green")
+        
         st.markdown("---")
         
         # Gráficos lado a lado
@@ -135,7 +155,7 @@ def dashboard_page():
         
         with col_grafico1:
             st.subheader("📊 Estoque por Tipo")
-            tipo_sum = df.groupby('Tipo')['Quantidade'].sum().reset_index()
+            tipo_sum = pd.DataFrame(estatisticas['por_tipo'])
             
             fig1 = px.pie(
                 tipo_sum,
@@ -150,21 +170,76 @@ def dashboard_page():
             st.plotly_chart(fig1, use_container_width=True)
         
         with col_grafico2:
-            st.subheader("📈 Top 5 Equipamentos")
-            top5 = df.nlargest(5, 'Quantidade')[['Nome', 'Quantidade', 'Tipo']]
+            col_n, col_tipo = st.columns(2)
+            with col_n:
+                quantidade_ranking = st.number_input("🔢 Quantos equipamentos", min_value=1, max_value=50, value=5, step=1)
+            with col_tipo:
+                tipo_ranking = st.selectbox("🏷️ Tipo", ["Todos", "NOVO", "USADO"], key="tipo_ranking")
+            tipo_filtro = None if tipo_ranking == "Todos" else tipo_ranking
             
-            fig2 = px.bar(
-                top5,
-                x='Quantidade',
-                y='Nome',
-                color='Tipo',
-                orientation='h',
-                color_discrete_map={'NOVO': '#2ecc71', 'USADO': '#e74c3c'},
-                text='Quantidade'
-            )
-            fig2.update_traces(texttemplate='%{text}', textposition='outside')
-            fig2.update_layout(height=400, showlegend=True)
-            st.plotly_chart(fig2, use_container_width=True)
+            st.subheader(f"📈 Top {quantidade_ranking} Equipamentos")
+            top_n = pd.DataFrame(obter_em_cache(
+                ('top', quantidade_ranking, tipo_filtro),
+                lambda: obter_top_equipamentos(db, quantidade_ranking, tipo_filtro)
+            ))
+            
+            if top_n.empty:
+                st.info(f"📭 Nenhum equipamento {tipo_ranking} cadastrado.")
+            else:
+                fig2 = px.bar(
+                    top_n,
+                    x='Quantidade',
+                    y='Nome',
+                    color='Tipo',
+                    orientation='h',
+                    color_discrete_map={'NOVO': '#2ecc71', 'USADO': '#e74c3c'},
+                    text='Quantidade'
+                )
+                fig2.update_traces(texttemplate='%{text}', textposition='outside')
+                fig2.update_layout(height=400, showlegend=True)
+                st.plotly_chart(fig2, use_container_width=True)
+        
+        # Menores estoques (mesma consulta do top, em ordem crescente)
+        st.subheader(f"📉 Menor Estoque ({quantidade_ranking})")
+        menores = pd.DataFrame(obter_em_cache(
+            ('menores', quantidade_ranking, tipo_filtro),
+            lambda: obter_top_equipamentos(db, quantidade_ranking, tipo_filtro, menores=True)
+        ))
+        
+        if menores.empty:
+            st.info(f"📭 Nenhum equipamento {tipo_ranking} cadastrado.")
+        else:
+            st.dataframe(menores, use_container_width=True, hide_index=True)
+        
+        st.markdown("---")
+        
+        # Movimentações do período (livro de movimentações)
+        st.subheader("🔄 Movimentações")
+        
+        hoje = datetime.now().date()
+        col_periodo1, col_periodo2 = st.columns(2)
+        with col_periodo1:
+            periodo_inicio = st.date_input("📅 De", value=hoje - timedelta(days=7), format="DD/MM/YYYY")
+        with col_periodo2:
+            periodo_fim = st.date_input("📅 Até", value=hoje, format="DD/MM/YYYY")
+        
+        inicio = datetime.combine(periodo_inicio, datetime.min.time())
+        fim = datetime.combine(periodo_fim, datetime.min.time()) + timedelta(days=1)
+        resumo = resumo_movimentacoes(db, inicio, fim)
+        
+        col_mov1, col_mov2, col_mov3 = st.columns(3)
+        with col_mov1:
+            st.metric("📥 Entradas", resumo['entradas'], help="Unidades adicionadas no período")
+        with col_mov2:
+            st.metric("📤 Saídas", resumo['saidas'], help="Unidades removidas no período")
+        with col_mov3:
+            st.metric("🧾 Movimentações", resumo['movimentacoes'], help="Operações registradas no período")
+        
+        if resumo['movimentacoes']:
+            with st.expander("📜 Últimas movimentações do período"):
+                df_mov = listar_movimentacoes(db, inicio, fim, limite=100)
+                df_mov['Data'] = pd.to_datetime(df_mov['Data']).dt.strftime('%d/%m/%Y %H:%M')
+                st.dataframe(df_mov, use_container_width=True, hide_index=True)
         
         st.markdown("---")
         
@@ -180,14 +255,30 @@ def dashboard_page():
         with col_filtro3:
             filtro_nome = st.text_input("🔍 Buscar por Nome", placeholder="Digite o nome")
         
-        # Aplica filtros
-        df_filtrado = df.copy()
-        if filtro_tipo:
-            df_filtrado = df_filtrado[df_filtrado['Tipo'].isin(filtro_tipo)]
-        if filtro_codigo:
-            df_filtrado = df_filtrado[df_filtrado['Código'].str.contains(filtro_codigo.upper(), case=False, na=False)]
-        if filtro_nome:
-            df_filtrado = df_filtrado[df_filtrado['Nome'].str.contains(filtro_nome, case=False, na=False)]
+        col_ordem1, col_ordem2, col_ordem3 = st.columns(3)
+        with col_ordem1:
+            ordenar_por = st.selectbox("↕️ Ordenar por", list(COLUNAS_ORDENACAO.keys()))
+        with col_ordem2:
+            decrescente = st.toggle("Ordem decrescente", value=False)
+        with col_ordem3:
+            por_pagina = st.selectbox("Itens por página", [25, 50, 100, 200], index=1)
+        
+        # Cursores das páginas visitadas; reinicia quando filtros ou ordenação mudam
+        assinatura = (tuple(filtro_tipo), filtro_codigo, filtro_nome, ordenar_por, decrescente, por_pagina)
+        if st.session_state.get('lista_assinatura') != assinatura:
+            st.session_state.lista_assinatura = assinatura
+            st.session_state.lista_cursores = [None]
+        
+        filtros = {'tipos': filtro_tipo, 'codigo': filtro_codigo, 'nome': filtro_nome}
+        pagina = listar_equipamentos(
+            db,
+            **filtros,
+            ordenar_por=ordenar_por,
+            decrescente=decrescente,
+            apos=st.session_state.lista_cursores[-1],
+            limite=por_pagina
+        )
+        df_filtrado = pagina['df']
         
         # Formata datas se existirem
         if 'Data Adição' in df_filtrado.columns:
@@ -210,7 +301,30 @@ def dashboard_page():
             }
         )
         
-        st.info(f"📊 Mostrando **{len(df_filtrado)}** de **{len(df)}** equipamentos")
+        numero_pagina = len(st.session_state.lista_cursores)
+        total_filtrado = contar_equipamentos(db, **filtros)
+        
+        col_nav1, col_nav2, col_nav3 = st.columns([1, 2, 1])
+        with col_nav1:
+            if st.button("⬅️ Anterior", disabled=numero_pagina == 1, use_container_width=True):
+                st.session_state.lista_cursores.pop()
+                st.rerun()
+        with col_nav2:
+            st.info(f"📊 Página **{numero_pagina}** - mostrando **{len(df_filtrado)}** de **{total_filtrado}** equipamentos filtrados (**{estatisticas['total_itens']}** no total)")
+        with col_nav3:
+            if st.button("Próxima ➡️", disabled=pagina['proximo'] is None, use_container_width=True):
+                st.session_state.lista_cursores.append(pagina['proximo'])
+                st.rerun()
+        
+        # A lista completa só é buscada no banco quando a exportação for solicitada
+        if st.button("📥 Exportar lista completa (CSV)"):
+            df = obter_snapshot(db)
+            st.download_button(
+                "💾 Baixar CSV",
+                df.to_csv(index=False).encode('utf-8'),
+                file_name=f"estoque_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv"
+            )
         
     except Exception as e:
         st.error(f"❌ Erro ao carregar dados: {str(e)}")
@@ -218,6 +332,136 @@ def dashboard_page():
         db.close()
 
 
+def _capturar_codigo_lote():
+    """Guarda o código lido e limpa só esse campo; tipo, quantidade e nome ficam para a próxima leitura"""
+    st.session_state.codigo_lote_lido = st.session_state.codigo_lote
+    st.session_state.codigo_lote = ""
+
+
+def modo_lote_leitor():
+    """Entrada em lote: acumula leituras do leitor de código de barras e grava tudo de uma vez"""
+    # Leituras pendentes agrupadas por (codigo, tipo): {'nome', 'quantidade'}
+    if 'lote_leituras' not in st.session_state:
+        st.session_state.lote_leituras = {}
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col2:
+        st.info("""
+        ### ℹ️ Modo lote
+        
+        - Leia os códigos em sequência com o leitor
+        - Leituras repetidas do mesmo código+tipo são somadas
+        - Nada é gravado até clicar em **Confirmar lote**
+        - O lote inteiro é gravado em uma única transação
+        
+        **Código novo:** preencha o nome antes da leitura
+        """)
+    
+    with col1:
+        st.subheader("📷 Leitura de Códigos")
+        
+        # O leitor envia Enter ao final da leitura, o que submete o formulário. O formulário não é
+        # limpo no envio (voltaria o tipo para NOVO a cada leitura): só o código é limpo, no callback
+        with st.form("leitura_lote_form"):
+            st.text_input("🏷️ Código", placeholder="Aponte o leitor ou digite o código", key="codigo_lote")
+            col_tipo, col_qtd = st.columns(2)
+            with col_tipo:
+                tipo_lote = st.selectbox("🔖 Tipo", ["NOVO", "USADO"], key="tipo_lote")
+            with col_qtd:
+                quantidade_lote = st.number_input("🔢 Quantidade", min_value=1, value=1, step=1)
+            nome_lote = st.text_input("📦 Nome", placeholder="Só para código novo")
+            
+            ler_button = st.form_submit_button(
+                "➕ Adicionar ao lote", use_container_width=True, on_click=_capturar_codigo_lote
+            )
+        
+        codigo_lido = st.session_state.pop('codigo_lote_lido', '')
+        if ler_button and codigo_lido.strip():
+            codigo_lido = codigo_lido.strip().upper()
+            chave = (codigo_lido, tipo_lote)
+            leituras = st.session_state.lote_leituras
+            
+            if chave in leituras:
+                leituras[chave]['quantidade'] += int(quantidade_lote)
+            else:
+                nome = next((item['nome'] for (codigo, _), item in leituras.items() if codigo == codigo_lido), None)
+                if nome is None:
+                    db = get_db_session()
+                    try:
+                        resultados = buscar_equipamentos(db, codigo_lido, campo='codigo', limite=1)
+                        if resultados and resultados[0]['codigo'] == codigo_lido:
+                            nome = resultados[0]['nome']
+                    finally:
+                        db.close()
+                
+                nome = nome or nome_lote.strip()
+                if nome:
+                    leituras[chave] = {'nome': nome, 'quantidade': int(quantidade_lote)}
+                else:
+                    st.error(f"❌ Código **{codigo_lido}** não cadastrado - preencha o nome e leia novamente")
+        
+        st.markdown("---")
+        
+        leituras = st.session_state.lote_leituras
+        if not leituras:
+            st.info("ℹ️ Nenhuma leitura no lote ainda.")
+            return
+        
+        df_lote = pd.DataFrame([{
+            'Código': codigo,
+            'Nome': item['nome'],
+            'Tipo': tipo,
+            'Quantidade': item['quantidade']
+        } for (codigo, tipo), item in leituras.items()])
+        
+        st.markdown(f"**📋 Lote atual:** {len(df_lote)} equipamentos, {int(df_lote['Quantidade'].sum())} unidades")
+        st.dataframe(df_lote, use_container_width=True, hide_index=True)
+        
+        motivo = st.text_input(
+            "📝 Motivo",
+            placeholder="Ex: Recebimento NF 1234",
+            help="Opcional - fica registrado no histórico de movimentações",
+            key="motivo_lote"
+        )
+        
+        col_btn1, col_btn2 = st.columns(2)
+        with col_btn1:
+            confirmar_button = st.button("✅ Confirmar lote", type="primary", use_container_width=True)
+        with col_btn2:
+            descartar_button = st.button("🗑️ Descartar lote", use_container_width=True)
+        
+        if descartar_button:
+            st.session_state.lote_leituras = {}
+            st.rerun()
+        
+        if confirmar_button:
+            db = get_db_session()
+            try:
+                resultados = adicionar_estoque_em_lote(
+                    db,
+                    [{'codigo': codigo, 'tipo': tipo, **item} for (codigo, tipo), item in leituras.items()],
+                    usuario=st.session_state.user['username'], motivo=motivo
+                )
+                db.commit()
+                invalidar_cache()
+                st.session_state.lote_leituras = {}
+                
+                novos = sum(1 for r in resultados if r['inserido'])
+                st.success(f"""
+                ✅ **Lote gravado com sucesso!**
+                
+                📦 **Equipamentos:** {len(resultados)} ({novos} novos)  
+                ➕ **Unidades adicionadas:** {sum(r['quantidade_adicionada'] for r in resultados)}  
+                🕐 **Gravado em:** {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}
+                """)
+            except Exception as e:
+                db.rollback()
+                st.error(f"❌ Erro ao gravar lote: {str(e)}")
+            finally:
+                db.close()
+
+
 def adicionar_equipamento_page():
     """Página para adicionar ou atualizar equipamentos com autocompletar"""
     st.title("➕ Adicionar / Atualizar Equipamento")
@@ -227,6 +471,10 @@ def adicionar_equipamento_page():
         st.warning("⚠️ Você não tem permissão para adicionar equipamentos. Apenas administradores podem realizar esta ação.")
         return
     
+    if st.toggle("📷 Modo lote (leitor de código de barras)", help="Acumula várias leituras e grava todas de uma vez"):
+        modo_lote_leitor()
+        return
+    
     # Inicializa variáveis de sessão
     if 'codigo_busca' not in st.session_state:
         st.session_state.codigo_busca = ""
@@ -238,25 +486,7 @@ def adicionar_equipamento_page():
     with col1:
         st.subheader("📝 Informações do Equipamento")
         
-        # Busca códigos existentes para o selectbox
-        db = get_db_session()
-        try:
-            equipamentos_existentes = db.query(Equipment.codigo, Equipment.nome).distinct().all()
-            codigos_existentes = [""] + [f"{eq.codigo} - {eq.nome}" for eq in equipamentos_existentes]
-        except:
-            codigos_existentes = [""]
-        finally:
-            db.close()
-        
-        # Opção de selecionar código existente
-        st.markdown("**Opção 1: Selecione um código existente**")
-        codigo_selecionado = st.selectbox(
-            "📋 Códigos Cadastrados",
-            codigos_existentes,
-            help="Selecione um código já cadastrado ou digite um novo abaixo"
-        )
-        
-        st.markdown("**Opção 2: Digite um código novo ou existente**")
+        st.markdown("**Opção 1: Digite um código novo ou existente**")
         
         # Busca de código
         col_codigo, col_buscar = st.columns([3, 1])
@@ -275,12 +505,30 @@ def adicionar_equipamento_page():
             st.write("")  # Espaçamento
             buscar_button = st.button("🔍 Buscar", use_container_width=True, type="secondary")
         
+        # Autocompletar: só os primeiros códigos que começam com o texto digitado
+        db = get_db_session()
+        try:
+            sugestoes = autocompletar_codigos(db, codigo_input, limite=LIMITE_AUTOCOMPLETAR)
+            codigos_existentes = [""] + [f"{s['codigo']} - {s['nome']}" for s in sugestoes]
+        except:
+            codigos_existentes = [""]
+        finally:
+            db.close()
+        
+        # Opção de selecionar código existente
+        st.markdown("**Opção 2: Selecione um código existente**")
+        codigo_selecionado = st.selectbox(
+            "📋 Códigos Cadastrados",
+            codigos_existentes,
+            help=f"Até {LIMITE_AUTOCOMPLETAR} códigos que começam com o texto digitado acima"
+        )
+        
         # Se selecionou da lista, usa esse código
-        if codigo_selecionado and not codigo_input:
+        if codigo_selecionado:
             codigo_da_lista = codigo_selecionado.split(" - ")[0]
+            if codigo_da_lista != st.session_state.codigo_busca:
+                buscar_button = True  # Força busca
             codigo_input = codigo_da_lista
-            st.session_state.codigo_busca = codigo_da_lista
-            buscar_button = True  # Força busca
         
         # Busca quando botão é clicado ou código muda
         realizar_busca = False
@@ -298,18 +546,18 @@ def adicionar_equipamento_page():
         if realizar_busca and st.session_state.codigo_busca:
             db = get_db_session()
             try:
-                # Busca qualquer equipamento com este código
-                equipamento = db.query(Equipment).filter(
-                    Equipment.codigo == st.session_state.codigo_busca
-                ).first()
+                # Busca indexada pelo código (correspondência exata vem primeiro)
+                resultados = buscar_equipamentos(db, st.session_state.codigo_busca, campo='codigo', fuzzy=True, limite=10)
                 
-                if equipamento:
+                if resultados and resultados[0]['codigo'] == st.session_state.codigo_busca:
                     st.session_state.equipamento_encontrado = {
-                        'codigo': equipamento.codigo,
-                        'nome': equipamento.nome
+                        'codigo': resultados[0]['codigo'],
+                        'nome': resultados[0]['nome']
                     }
+                    st.session_state.codigos_sugeridos = []
                 else:
                     st.session_state.equipamento_encontrado = None
+                    st.session_state.codigos_sugeridos = list(dict.fromkeys(r['codigo'] for r in resultados))[:5]
             except Exception as e:
                 st.error(f"Erro ao buscar: {str(e)}")
                 st.session_state.equipamento_encontrado = None
@@ -320,6 +568,7 @@ def adicionar_equipamento_page():
         if not codigo_input:
             st.session_state.equipamento_encontrado = None
             st.session_state.codigo_busca = ""
+            st.session_state.codigos_sugeridos = []
         
         # Mostra informações do equipamento encontrado
         if st.session_state.equipamento_encontrado:
@@ -330,6 +579,8 @@ def adicionar_equipamento_page():
         else:
             if codigo_input:
                 st.info("ℹ️ Código novo - preencha o nome do equipamento abaixo")
+                if st.session_state.get('codigos_sugeridos'):
+                    st.caption("🔎 Códigos parecidos já cadastrados: " + ", ".join(st.session_state.codigos_sugeridos))
             nome_readonly = ""
             nome_disabled = False
             placeholder_nome = "Ex: Notebook Dell Inspiron"
@@ -367,6 +618,21 @@ def adicionar_equipamento_page():
                 help="Quantidade que será adicionada ao estoque"
             )
             
+            minimo = st.number_input(
+                "📉 Estoque mínimo",
+                min_value=0,
+                value=None,
+                step=1,
+                placeholder="Manter o atual",
+                help="Opcional - abaixo desta quantidade o item aparece nos alertas do dashboard (0 desativa)"
+            )
+            
+            motivo = st.text_input(
+                "📝 Motivo",
+                placeholder="Ex: Compra, devolução, inventário",
+                help="Opcional - fica registrado no histórico de movimentações"
+            )
+            
             st.markdown("---")
             
             col_btn1, col_btn2 = st.columns(2)
@@ -397,48 +663,28 @@ def adicionar_equipamento_page():
                 else:
                     db = get_db_session()
                     try:
-                        # Verifica se já existe equipamento com o mesmo código e tipo
-                        existing = db.query(Equipment).filter(
-                            Equipment.codigo == codigo.upper(),
-                            Equipment.tipo == tipo
-                        ).first()
+                        # Insere ou soma à quantidade existente em um único comando atômico
+                        resultado = adicionar_estoque(
+                            db, codigo.upper(), nome, tipo, quantidade,
+                            usuario=st.session_state.user['username'], motivo=motivo,
+                            minimo=None if minimo is None else int(minimo)
+                        )
+                        db.commit()
+                        invalidar_cache()
                         
-                        if existing:
-                            # Atualiza a quantidade do equipamento existente
-                            quantidade_anterior = existing.quantidade
-                            existing.quantidade += quantidade
-                            existing.ultima_atualizacao = datetime.now()
-                            db.commit()
-                            
+                        if not resultado['inserido']:
                             st.success(f"""
                             ✅ **Quantidade atualizada com sucesso!**
                             
-                            📦 **Equipamento:** {existing.nome}  
+                            📦 **Equipamento:** {resultado['nome']}  
                             🏷️ **Código:** {codigo.upper()}  
                             🔖 **Tipo:** {tipo}  
-                            📊 **Quantidade anterior:** {quantidade_anterior}  
+                            📊 **Quantidade anterior:** {resultado['quantidade_anterior']}  
                             ➕ **Quantidade adicionada:** {quantidade}  
-                            🔢 **Quantidade atual:** {existing.quantidade}  
+                            🔢 **Quantidade atual:** {resultado['quantidade_atual']}  
                             🕐 **Atualizado em:** {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}
                             """)
-                            st.balloons()
-                            
-                            # Limpa campos após sucesso
-                            st.session_state.codigo_busca = ""
-                            st.session_state.equipamento_encontrado = None
                         else:
-                            # Cria novo equipamento
-                            novo_equipamento = Equipment(
-                                codigo=codigo.upper(),
-                                nome=nome,
-                                tipo=tipo,
-                                quantidade=quantidade,
-                                data_adicao=datetime.now(),
-                                ultima_atualizacao=datetime.now()
-                            )
-                            db.add(novo_equipamento)
-                            db.commit()
-                            
                             st.success(f"""
                             ✅ **Equipamento adicionado com sucesso!**
                             
@@ -448,11 +694,11 @@ def adicionar_equipamento_page():
                             🔢 **Quantidade:** {quantidade}  
                             🕐 **Adicionado em:** {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}
                             """)
-                            st.balloons()
-                            
-                            # Limpa campos após sucesso
-                            st.session_state.codigo_busca = ""
-                            st.session_state.equipamento_encontrado = None
+                        st.balloons()
+                        
+                        # Limpa campos após sucesso
+                        st.session_state.codigo_busca = ""
+                        st.session_state.equipamento_encontrado = None
                     except Exception as e:
                         db.rollback()
                         st.error(f"❌ Erro ao adicionar/atualizar equipamento: {str(e)}")
@@ -503,89 +749,8 @@ def remover_equipamento_page():
     
     db = get_db_session()
     try:
-        equipments = db.query(Equipment).all()
-        
-        if not equipments:
-            st.info("📭 Nenhum equipamento cadastrado para remover.")
-            return
-        
         col1, col2 = st.columns([2, 1])
         
-        with col1:
-            # Cria lista de opções para o selectbox
-            opcoes = [f"{eq.codigo} - {getattr(eq, 'nome', 'N/A')} - {eq.tipo} (Qtd: {eq.quantidade})" for eq in equipments]
-            
-            with st.form("remover_equipamento_form"):
-                st.subheader("🗑️ Selecione o equipamento")
-                
-                selected = st.selectbox("📦 Equipamento *", opcoes, help="Escolha o equipamento que deseja remover")
-                
-                # Extrai informações do equipamento selecionado
-                codigo_selecionado = selected.split(" - ")[0]
-                tipo_selecionado = selected.split(" - ")[2].split(" (")[0]
-                
-                equipment = db.query(Equipment).filter(
-                    Equipment.codigo == codigo_selecionado,
-                    Equipment.tipo == tipo_selecionado
-                ).first()
-                
-                if equipment:
-                    quantidade_disponivel = equipment.quantidade
-                    
-                    st.info(f"📊 **Quantidade disponível:** {quantidade_disponivel}")
-                    
-                    quantidade_remover = st.number_input(
-                        "🔢 Quantidade a remover *",
-                        min_value=1,
-                        max_value=quantidade_disponivel,
-                        value=min(1, quantidade_disponivel),
-                        step=1,
-                        help=f"Você pode remover de 1 até {quantidade_disponivel} unidades"
-                    )
-                    
-                    remover_tudo = st.checkbox("🗑️ Remover equipamento completamente do sistema", help="Marca esta opção para deletar o equipamento independente da quantidade")
-                    
-                    st.markdown("---")
-                    submit_button = st.form_submit_button("🗑️ Confirmar Remoção", type="primary", use_container_width=True)
-                    
-                    if submit_button:
-                        try:
-                            if remover_tudo or quantidade_remover >= quantidade_disponivel:
-                                # Remove o equipamento completamente
-                                db.delete(equipment)
-                                db.commit()
-                                st.success(f"""
-                                ✅ **Equipamento removido completamente!**
-                                
-                                📦 **Nome:** {equipment.nome}  
-                                🏷️ **Código:** {equipment.codigo}  
-                                🔖 **Tipo:** {equipment.tipo}  
-                                🔢 **Quantidade removida:** {equipment.quantidade}  
-                                🕐 **Removido em:** {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}
-                                """)
-                                st.rerun()
-                            else:
-                                # Remove apenas a quantidade especificada
-                                quantidade_anterior = equipment.quantidade
-                                equipment.quantidade -= quantidade_remover
-                                equipment.ultima_atualizacao = datetime.now()
-                                db.commit()
-                                st.success(f"""
-                                ✅ **Quantidade reduzida com sucesso!**
-                                
-                                📦 **Equipamento:** {equipment.nome}  
-                                🏷️ **Código:** {equipment.codigo}  
-                                🔖 **Tipo:** {equipment.tipo}  
-                                📊 **Quantidade anterior:** {quantidade_anterior}  
-                                ➖ **Quantidade removida:** {quantidade_remover}  
-                                🔢 **Quantidade restante:** {equipment.quantidade}  
-                                🕐 **Atualizado em:** {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}
-                                """)
-                                st.rerun()
-                        except Exception as e:
-                            db.rollback()
-                            st.error(f"❌ Erro ao remover equipamento: {str(e)}")
-        
         with col2:
             st.info("""
             ### ℹ️ Como funciona?
@@ -598,18 +763,227 @@ def remover_equipamento_page():
             - Marca "Remover completamente"
             - OU remove a quantidade total disponível
             - Deleta o equipamento do sistema
+            - Com estoque mínimo definido, zerar o estoque mantém o item (aparece nos alertas)
             
             **Dica:**
             - Use remoção parcial para saídas graduais
             - Use remoção total quando não usar mais o item
             """)
+        
+        with col1:
+            st.subheader("🗑️ Selecione o equipamento")
+            
+            # Opções carregadas sob demanda pela busca, não a tabela inteira
+            termo_busca = st.text_input("🔍 Buscar equipamento", placeholder="Digite o código ou nome")
+            
+            if not termo_busca:
+                st.info("ℹ️ Digite o código ou nome do equipamento que deseja remover.")
+                return
+            
+            resultados = buscar_equipamentos(db, termo_busca, limite=50)
+            
+            if not resultados:
+                st.info("📭 Nenhum equipamento encontrado para esta busca.")
+                return
+            
+            # Seleção pelo id; o rótulo é apenas exibição
+            opcoes = {eq['id']: eq for eq in resultados}
+            equipment_id = st.selectbox(
+                "📦 Equipamento *",
+                list(opcoes.keys()),
+                format_func=lambda id_: f"{opcoes[id_]['codigo']} - {opcoes[id_]['nome']} - {opcoes[id_]['tipo']} (Qtd: {opcoes[id_]['quantidade']})",
+                help="Escolha o equipamento que deseja remover"
+            )
+            equipment = opcoes[equipment_id]
+            quantidade_disponivel = equipment['quantidade']
             
+            with st.form("remover_equipamento_form"):
+                st.info(f"📊 **Quantidade disponível:** {quantidade_disponivel}")
+                
+                quantidade_remover = st.number_input(
+                    "🔢 Quantidade a remover *",
+                    min_value=1,
+                    max_value=max(quantidade_disponivel, 1),
+                    value=1,
+                    step=1,
+                    help=f"Você pode remover de 1 até {quantidade_disponivel} unidades"
+                )
+                
+                motivo = st.text_input(
+                    "📝 Motivo",
+                    placeholder="Ex: Venda, descarte, transferência",
+                    help="Opcional - fica registrado no histórico de movimentações"
+                )
+                
+                remover_tudo = st.checkbox("🗑️ Remover equipamento completamente do sistema", help="Marca esta opção para deletar o equipamento independente da quantidade")
+                
+                st.markdown("---")
+                submit_button = st.form_submit_button("🗑️ Confirmar Remoção", type="primary", use_container_width=True)
+                
+                if submit_button:
+                    try:
+                        # Decremento condicional atômico (não remove mais do que existe no banco)
+                        resultado = remover_estoque(
+                            db, equipment_id, int(quantidade_remover), remover_tudo,
+                            usuario=st.session_state.user['username'], motivo=motivo
+                        )
+                        
+                        if resultado is None:
+                            db.rollback()
+                            st.error("❌ Quantidade insuficiente ou equipamento já removido por outro operador. Busque novamente.")
+                        elif resultado['removido']:
+                            db.commit()
+                            invalidar_cache()
+                            st.success(f"""
+                            ✅ **Equipamento removido completamente!**
+                            
+                            📦 **Nome:** {resultado['nome']}  
+                            🏷️ **Código:** {resultado['codigo']}  
+                            🔖 **Tipo:** {resultado['tipo']}  
+                            🔢 **Quantidade removida:** {resultado['quantidade_removida']}  
+                            🕐 **Removido em:** {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}
+                            """)
+                            st.rerun()
+                        else:
+                            db.commit()
+                            invalidar_cache()
+                            if resultado['abaixo_minimo']:
+                                st.toast(f"{resultado['codigo']} ({resultado['tipo']}) ficou abaixo do mínimo: "
+                                         f"{resultado['quantidade_restante']} de {resultado['minimo']}", icon="⚠️")
+                            st.success(f"""
+                            ✅ **Quantidade reduzida com sucesso!**
+                            
+                            📦 **Equipamento:** {resultado['nome']}  
+                            🏷️ **Código:** {resultado['codigo']}  
+                            🔖 **Tipo:** {resultado['tipo']}  
+                            📊 **Quantidade anterior:** {resultado['quantidade_restante'] + resultado['quantidade_removida']}  
+                            ➖ **Quantidade removida:** {resultado['quantidade_removida']}  
+                            🔢 **Quantidade restante:** {resultado['quantidade_restante']}  
+                            🕐 **Atualizado em:** {datetime.now().strftime('%d/%m/%Y às %H:%M:%S')}
+                            """)
+                            st.rerun()
+                    except Exception as e:
+                        db.rollback()
+                        st.error(f"❌ Erro ao remover equipamento: {str(e)}")
+            
+            with st.expander(f"📉 Estoque mínimo (atual: {equipment['minimo']})"):
+                with st.form("estoque_minimo_form"):
+                    novo_minimo = st.number_input(
+                        "📉 Estoque mínimo",
+                        min_value=0,
+                        value=int(equipment['minimo']),
+                        step=1,
+                        help="Abaixo desta quantidade o item aparece nos alertas do dashboard (0 desativa)"
+                    )
+                    
+                    if st.form_submit_button("💾 Salvar mínimo", use_container_width=True):
+                        try:
+                            if definir_minimo(db, equipment_id, int(novo_minimo)):
+                                db.commit()
+                                invalidar_cache()
+                                st.success(f"✅ Estoque mínimo de {equipment['codigo']} ({equipment['tipo']}) definido em {int(novo_minimo)}")
+                            else:
+                                db.rollback()
+                                st.error("❌ Equipamento já removido por outro operador. Busque novamente.")
+                        except Exception as e:
+                            db.rollback()
+                            st.error(f"❌ Erro ao definir estoque mínimo: {str(e)}")
+        
     except Exception as e:
         st.error(f"❌ Erro ao processar remoção: {str(e)}")
     finally:
         db.close()
 
 
+def importar_estoque_page():
+    """Página para importar entradas de estoque em lote a partir de CSV ou Excel"""
+    st.title("📥 Importar Estoque")
+    st.markdown("---")
+    
+    if st.session_state.user['role'] != 'admin':
+        st.warning("⚠️ Você não tem permissão para importar estoque. Apenas administradores podem realizar esta ação.")
+        return
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col2:
+        st.info("""
+        ### ℹ️ Formato do arquivo
+        
+        **Colunas (cabeçalho na 1ª linha):**
+        - `codigo` - obrigatório
+        - `nome` - obrigatório para código novo
+        - `tipo` - NOVO ou USADO
+        - `quantidade` - inteiro maior que zero
+        
+        **Como funciona:**
+        - A quantidade é somada ao estoque do código+tipo
+        - Código novo é cadastrado automaticamente
+        - Linhas inválidas são listadas e não impedem o restante
+        - CSV com `,` ou `;` e planilhas XLSX
+        """)
+    
+    with col1:
+        st.subheader("📄 Arquivo de entrada")
+        
+        arquivo = st.file_uploader("Selecione o arquivo", type=["csv", "xlsx"])
+        motivo = st.text_input(
+            "📝 Motivo",
+            placeholder="Ex: Recebimento NF 1234",
+            help="Opcional - fica registrado no histórico de movimentações"
+        )
+        
+        if arquivo is None:
+            return
+        
+        if st.button("🚀 Importar", type="primary", use_container_width=True):
+            status = st.empty()
+            
+            def mostrar_progresso(linhas_lidas, linhas_importadas):
+                status.info(f"⏳ {linhas_lidas} linhas lidas, {linhas_importadas} importadas...")
+            
+            db = get_db_session()
+            try:
+                resultado = importar_estoque(
+                    db, arquivo, arquivo.name,
+                    usuario=st.session_state.user['username'], motivo=motivo,
+                    progresso=mostrar_progresso
+                )
+                db.commit()
+                invalidar_cache()
+                status.empty()
+            except Exception as e:
+                db.rollback()
+                status.empty()
+                st.error(f"❌ Erro ao importar arquivo: {str(e)}")
+                return
+            finally:
+                db.close()
+            
+            rejeitados = resultado['rejeitados']
+            st.success(f"✅ **Importação concluída em {resultado['duracao']:.1f}s** ({resultado['linhas_por_segundo']:.0f} linhas/s)")
+            
+            col_res1, col_res2, col_res3, col_res4 = st.columns(4)
+            with col_res1:
+                st.metric("📄 Linhas lidas", resultado['linhas_lidas'])
+            with col_res2:
+                st.metric("✅ Importadas", resultado['linhas_importadas'])
+            with col_res3:
+                st.metric("✨ Códigos novos", resultado['equipamentos_novos'])
+            with col_res4:
+                st.metric("❌ Rejeitadas", len(rejeitados))
+            
+            if len(rejeitados):
+                st.warning("⚠️ Algumas linhas foram rejeitadas e não entraram no estoque:")
+                st.dataframe(rejeitados, use_container_width=True, hide_index=True)
+                st.download_button(
+                    "📥 Baixar linhas rejeitadas (CSV)",
+                    rejeitados.to_csv(index=False).encode('utf-8'),
+                    file_name=f"rejeitados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
+                )
+
+
 def main():
     """Função principal da aplicação"""
     
@@ -638,7 +1012,8 @@ def main():
             pages = {
                 "📊 Dashboard": dashboard_page,
                 "➕ Adicionar Equipamento": adicionar_equipamento_page,
-                "➖ Remover Equipamento": remover_equipamento_page
+                "➖ Remover Equipamento": remover_equipamento_page,
+                "📥 Importar Estoque": importar_estoque_page
             }
             
             # Se for usuário comum, remove opções de admin
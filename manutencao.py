@@ -0,0 +1,400 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Agendador de manutenção do banco (multiplataforma, substitui o agendar_backup.bat)
+Roda as tarefas periódicas dentro de uma janela de pouco uso (padrão: 23:00 às 05:00):
+
+    backup        backup do banco (SQLite: incremental; PostgreSQL: COPY em paralelo)
+    retencao      retenção GFS dos backups (ver catalogo_backups.py)
+    vacuum        SQLite: PRAGMA incremental_vacuum em passos; PostgreSQL: VACUUM por tabela
+    estatisticas  SQLite: PRAGMA optimize (ou ANALYZE); PostgreSQL: ANALYZE
+
+Cada tarefa tem um intervalo; a data da última execução fica em manutencao_estado.json,
+então reiniciar o agendador não repete o que já foi feito. Uma tarefa que falha é tentada
+de novo depois de RETENTAR_APOS. O log registra duração e bytes gravados/liberados
+
+Uso:
+    python manutencao.py                         # daemon: verifica a cada minuto
+    python manutencao.py --janela 01:00-04:00 --log manutencao.log
+    python manutencao.py --uma-vez               # executa o que estiver pendente e sai (cron)
+    python manutencao.py --tarefa vacuum         # executa uma tarefa agora, fora da janela
+    python manutencao.py --status
+"""
+
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database import engine, init_db
+from backup import aplicar_retencao_gfs, criar_backup_incremental, criar_backup_postgresql
+
+
+# Janela de pouco uso (HH:MM-HH:MM; pode passar da meia-noite)
+JANELA_PADRAO = '23:00-05:00'
+
+# Intervalo mínimo entre duas execuções de cada tarefa, na ordem em que rodam na janela
+INTERVALOS = {
+    'backup': timedelta(days=1),
+    'retencao': timedelta(days=1),
+    'vacuum': timedelta(days=7),
+    'estatisticas': timedelta(days=1),
+}
+
+# Espera para tentar de novo uma tarefa que falhou (ex: banco ocupado)
+RETENTAR_APOS = timedelta(minutes=30)
+
+# Intervalo entre as verificações do daemon (segundos)
+VERIFICAR_A_CADA = 60
+
+# Páginas liberadas por passo do incremental_vacuum (2048 de 4 KB = 8 MB); entre os passos
+# quem escreve no banco não espera
+PAGINAS_VACUUM_POR_PASSO = 2048
+
+# Sem auto_vacuum, um VACUUM completo (que converte o banco para auto_vacuum=INCREMENTAL) só
+# quando as páginas livres passam desta fração do arquivo
+FRACAO_LIVRE_VACUUM_COMPLETO = 0.1
+
+# Linhas amostradas por índice no ANALYZE do SQLite (0 = todas)
+LIMITE_ANALISE = 1000
+
+_parar = threading.Event()
+_log_arquivo = None
+
+
+def _log(mensagem: str):
+    """Mensagem com data e hora na saída padrão e, se configurado, no arquivo de log"""
+    linha = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {mensagem}"
+    print(linha, flush=True)
+    if _log_arquivo:
+        with open(_log_arquivo, 'a', encoding='utf-8') as f:
+            f.write(linha + "\n")
+
+
+def _mb(n: int) -> str:
+    """Bytes em MB, para o log"""
+    return f"{n / 2**20:.2f} MB"
+
+
+def _tamanho_sqlite(caminho: str) -> int:
+    """Tamanho do banco SQLite com o -wal"""
+    return sum(os.path.getsize(c) for c in (caminho, f"{caminho}-wal") if os.path.exists(c))
+
+
+# --- Tarefas: cada uma retorna um dict com o resultado e uma linha de resumo em 'resumo' ---
+
+def tarefa_backup(pasta_backups: str) -> dict:
+    """Backup do banco configurado: incremental no SQLite, COPY paralelo no PostgreSQL"""
+    if engine.dialect.name == 'postgresql':
+        manifesto = criar_backup_postgresql(engine, pasta_backups)
+        gravados = manifesto and manifesto['tamanho_arquivo']
+    else:
+        manifesto = criar_backup_incremental(engine.url.database, pasta_backups)
+        gravados = manifesto and manifesto['bytes_novos']
+
+    if manifesto is None:
+        raise RuntimeError("backup não foi criado (ver mensagens acima)")
+
+    return {
+        'arquivo': manifesto['arquivo'],
+        'bytes_gravados': gravados,
+        'resumo': f"{manifesto['arquivo']}, {_mb(gravados)} gravados",
+    }
+
+
+def tarefa_retencao(pasta_backups: str) -> dict:
+    """Retenção GFS com a política padrão de backup.py"""
+    resultado = aplicar_retencao_gfs(pasta_backups)
+    return dict(resultado, bytes_liberados=resultado['bytes'],
+                resumo=f"{resultado['backups']} backup(s) e {resultado['chunks']} chunk(s) removidos, "
+                       f"{_mb(resultado['bytes'])} liberados")
+
+
+def _vacuum_sqlite(conn) -> dict:
+    """
+    Devolve ao sistema as páginas livres do SQLite
+    Com auto_vacuum=INCREMENTAL, PRAGMA incremental_vacuum em passos de PAGINAS_VACUUM_POR_PASSO
+    até esvaziar a lista de páginas livres ou acabar a janela. Sem auto_vacuum, o banco é
+    convertido (auto_vacuum=INCREMENTAL + VACUUM completo) quando as páginas livres passam de
+    FRACAO_LIVRE_VACUUM_COMPLETO; o VACUUM completo bloqueia o banco enquanto roda
+    """
+    def pragma(nome):
+        return conn.exec_driver_sql(f"PRAGMA {nome}").scalar()
+
+    caminho = engine.url.database
+    antes = _tamanho_sqlite(caminho)
+    livres_antes = pragma('freelist_count')
+    modo = 'incremental'
+
+    if pragma('auto_vacuum') != 2:
+        if livres_antes < pragma('page_count') * FRACAO_LIVRE_VACUUM_COMPLETO:
+            return {'modo': 'nenhum', 'paginas_livres': livres_antes, 'bytes_liberados': 0,
+                    'resumo': f"sem auto_vacuum e só {livres_antes} página(s) livre(s), nada a fazer"}
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        modo = 'completo (convertido para auto_vacuum=INCREMENTAL)'
+    else:
+        # O cursor do sqlite3 executa o incremental_vacuum um passo só (uma página);
+        # executescript roda o comando até o fim
+        dbapi = conn.connection.driver_connection
+        while pragma('freelist_count') and _dentro_da_janela_atual():
+            dbapi.executescript(f"PRAGMA incremental_vacuum({PAGINAS_VACUUM_POR_PASSO});")
+
+    conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    liberados = max(antes - _tamanho_sqlite(caminho), 0)
+    return {
+        'modo': modo,
+        'paginas_livres': livres_antes,
+        'paginas_restantes': pragma('freelist_count'),
+        'bytes_liberados': liberados,
+        'resumo': f"{modo}, {livres_antes} página(s) livre(s), {_mb(liberados)} liberados",
+    }
+
+
+def _vacuum_postgresql(conn) -> dict:
+    """VACUUM tabela por tabela (as do models.py), medindo tamanho e tuplas mortas antes e depois"""
+    from models import Base
+
+    tabelas = [t.name for t in Base.metadata.sorted_tables]
+
+    def tamanho():
+        return conn.exec_driver_sql(
+            "SELECT COALESCE(SUM(pg_total_relation_size(to_regclass(t))), 0) FROM unnest(%(t)s::text[]) AS t",
+            {'t': tabelas}
+        ).scalar()
+
+    def mortas():
+        return conn.exec_driver_sql(
+            "SELECT COALESCE(SUM(n_dead_tup), 0) FROM pg_stat_user_tables WHERE relname = ANY(%(t)s)",
+            {'t': tabelas}
+        ).scalar()
+
+    antes, mortas_antes = tamanho(), mortas()
+    for tabela in tabelas:
+        if not _dentro_da_janela_atual():
+            break
+        conn.exec_driver_sql(f"VACUUM {tabela}")
+    liberados = max(antes - tamanho(), 0)
+
+    return {
+        'tuplas_mortas': int(mortas_antes),
+        'bytes_liberados': int(liberados),
+        'resumo': f"{len(tabelas)} tabela(s), {int(mortas_antes)} tupla(s) morta(s), {_mb(liberados)} devolvidos ao disco",
+    }
+
+
+def tarefa_vacuum(pasta_backups: str) -> dict:
+    """Libera o espaço de registros apagados (fora de transação: VACUUM exige autocommit)"""
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if conn.dialect.name == 'postgresql':
+            return _vacuum_postgresql(conn)
+        return _vacuum_sqlite(conn)
+
+
+def tarefa_estatisticas(pasta_backups: str) -> dict:
+    """
+    Atualiza as estatísticas do planejador de consultas
+    SQLite 3.46+: PRAGMA optimize=0x10002 (só as tabelas com estatísticas desatualizadas);
+    versões anteriores: ANALYZE com PRAGMA analysis_limit (amostra por índice). PostgreSQL: ANALYZE
+    """
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.exec_driver_sql("ANALYZE")
+            return {'comando': 'ANALYZE', 'resumo': 'ANALYZE'}
+
+        if sqlite3.sqlite_version_info >= (3, 46, 0):
+            comando = "PRAGMA optimize=0x10002"
+        else:
+            conn.exec_driver_sql(f"PRAGMA analysis_limit = {LIMITE_ANALISE}")
+            comando = "ANALYZE"
+        conn.exec_driver_sql(comando)
+        return {'comando': comando, 'resumo': comando}
+
+
+TAREFAS = {
+    'backup': tarefa_backup,
+    'retencao': tarefa_retencao,
+    'vacuum': tarefa_vacuum,
+    'estatisticas': tarefa_estatisticas,
+}
+
+
+# --- Janela, estado e execução ---
+
+_janela = None
+
+
+def interpretar_janela(texto: str) -> tuple:
+    """'23:00-05:00' -> (time(23, 0), time(5, 0))"""
+    inicio, fim = (datetime.strptime(parte.strip(), '%H:%M').time() for parte in texto.split('-'))
+    return inicio, fim
+
+
+def dentro_da_janela(janela: tuple, agora: datetime = None) -> bool:
+    """Se o horário está na janela (que pode passar da meia-noite); None = sempre"""
+    if janela is None:
+        return True
+    inicio, fim = janela
+    hora = (agora or datetime.now()).time()
+    if inicio <= fim:
+        return inicio <= hora < fim
+    return hora >= inicio or hora < fim
+
+
+def _dentro_da_janela_atual() -> bool:
+    """Tarefas longas param entre passos quando a janela acaba (ou o daemon é interrompido)"""
+    return not _parar.is_set() and dentro_da_janela(_janela)
+
+
+def carregar_estado(caminho: str) -> dict:
+    """Última execução de cada tarefa ({} se o arquivo não existe)"""
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def salvar_estado(caminho: str, estado: dict):
+    """Grava o estado com rename atômico"""
+    with open(f"{caminho}.parcial", 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False, indent=2)
+    os.replace(f"{caminho}.parcial", caminho)
+
+
+def tarefa_pendente(nome: str, estado: dict, agora: datetime = None) -> bool:
+    """Se a tarefa já passou do intervalo desde o último sucesso (e do prazo de nova tentativa)"""
+    agora = agora or datetime.now()
+    registro = estado.get(nome, {})
+
+    if registro.get('ultima_tentativa') and not registro.get('ok', True):
+        if agora < datetime.fromisoformat(registro['ultima_tentativa']) + RETENTAR_APOS:
+            return False
+
+    if not registro.get('ultimo_sucesso'):
+        return True
+    return agora >= datetime.fromisoformat(registro['ultimo_sucesso']) + INTERVALOS[nome]
+
+
+def executar_tarefa(nome: str, pasta_backups: str, estado: dict) -> bool:
+    """Executa uma tarefa, registra no log (duração e bytes) e atualiza o estado"""
+    _log(f"▶️ {nome}: iniciando")
+    inicio = time.perf_counter()
+    agora = datetime.now().isoformat(timespec='seconds')
+
+    try:
+        resultado = TAREFAS[nome](pasta_backups)
+    except Exception as e:
+        duracao = time.perf_counter() - inicio
+        _log(f"❌ {nome}: falhou em {duracao:.2f}s: {str(e)}")
+        estado[nome] = dict(estado.get(nome, {}), ultima_tentativa=agora, ok=False, erro=str(e))
+        return False
+
+    duracao = time.perf_counter() - inicio
+    resumo = resultado.pop('resumo')
+    _log(f"✅ {nome}: {resumo} ({duracao:.2f}s)")
+    estado[nome] = {
+        'ultima_tentativa': agora,
+        'ultimo_sucesso': agora,
+        'ok': True,
+        'duracao': round(duracao, 3),
+        'resultado': resultado,
+    }
+    return True
+
+
+def executar_pendentes(pasta_backups: str, caminho_estado: str, ignorar_janela: bool = False) -> int:
+    """
+    Executa, na ordem de INTERVALOS, as tarefas pendentes enquanto estiver na janela
+
+    Returns:
+        int: quantidade de tarefas que falharam
+    """
+    falhas = 0
+    for nome in INTERVALOS:
+        if _parar.is_set() or not (ignorar_janela or dentro_da_janela(_janela)):
+            break
+        estado = carregar_estado(caminho_estado)
+        if not tarefa_pendente(nome, estado):
+            continue
+        if not executar_tarefa(nome, pasta_backups, estado):
+            falhas += 1
+        salvar_estado(caminho_estado, estado)
+    return falhas
+
+
+def mostrar_status(caminho_estado: str):
+    """Última execução e próxima data de cada tarefa"""
+    estado = carregar_estado(caminho_estado)
+    print(f"\n🗓️ MANUTENÇÃO - janela {_janela[0].strftime('%H:%M')}-{_janela[1].strftime('%H:%M')}")
+    print("-" * 60)
+    for nome, intervalo in INTERVALOS.items():
+        registro = estado.get(nome, {})
+        if registro.get('ultimo_sucesso'):
+            proxima = datetime.fromisoformat(registro['ultimo_sucesso']) + intervalo
+            print(f"{nome}: último sucesso {registro['ultimo_sucesso']} ({registro['duracao']}s), "
+                  f"próxima a partir de {proxima.isoformat(timespec='minutes')}")
+        else:
+            print(f"{nome}: nunca executada")
+        if registro.get('ok') is False:
+            print(f"   ⚠️ última tentativa {registro['ultima_tentativa']} falhou: {registro.get('erro')}")
+
+
+def main():
+    global _janela, _log_arquivo
+
+    parser = argparse.ArgumentParser(description="Agendador de manutenção: backup, retenção, vacuum e estatísticas")
+    parser.add_argument('--janela', default=JANELA_PADRAO, help="Janela de pouco uso, HH:MM-HH:MM")
+    parser.add_argument('--pasta', default='backups', help="Pasta dos backups")
+    parser.add_argument('--estado', default='manutencao_estado.json', help="Arquivo com a última execução de cada tarefa")
+    parser.add_argument('--log', help="Também grava o log neste arquivo")
+    parser.add_argument('--uma-vez', action='store_true', help="Executa as tarefas pendentes e sai")
+    parser.add_argument('--ignorar-janela', action='store_true', help="Com --uma-vez: executa mesmo fora da janela")
+    parser.add_argument('--tarefa', choices=list(TAREFAS), help="Executa só esta tarefa, agora, e sai")
+    parser.add_argument('--status', action='store_true', help="Mostra a última execução de cada tarefa")
+    args = parser.parse_args()
+
+    _janela = interpretar_janela(args.janela)
+    _log_arquivo = args.log
+
+    if args.status:
+        mostrar_status(args.estado)
+        return 0
+
+    init_db()
+
+    if args.tarefa:
+        # Fora da janela por pedido explícito: passos longos não param pelo horário
+        _janela = None
+        estado = carregar_estado(args.estado)
+        ok = executar_tarefa(args.tarefa, args.pasta, estado)
+        salvar_estado(args.estado, estado)
+        return 0 if ok else 1
+
+    if args.uma_vez:
+        if args.ignorar_janela:
+            _janela = None
+        elif not dentro_da_janela(_janela):
+            _log(f"⏸️ Fora da janela {args.janela}, nada executado (use --ignorar-janela)")
+            return 0
+        return 1 if executar_pendentes(args.pasta, args.estado) else 0
+
+    # Daemon: Ctrl+C ou SIGTERM (systemd, docker stop) terminam depois do passo em andamento
+    signal.signal(signal.SIGINT, lambda *_: _parar.set())
+    signal.signal(signal.SIGTERM, lambda *_: _parar.set())
+    _log(f"🗓️ Agendador iniciado, janela {args.janela}, verificando a cada {VERIFICAR_A_CADA}s")
+
+    while not _parar.is_set():
+        if dentro_da_janela(_janela):
+            executar_pendentes(args.pasta, args.estado)
+        _parar.wait(VERIFICAR_A_CADA)
+
+    _log("⏹️ Agendador encerrado")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,354 @@
+"""
+Migrações versionadas do banco de dados
+Cada migração é numerada, roda uma única vez e fica registrada na tabela schema_version.
+As migrações são idempotentes: rodar de novo uma migração já aplicada não altera nada.
+
+Para alterar o schema, adicione uma nova função ao final de MIGRACOES com o próximo número.
+"""
+
+from datetime import datetime
+from sqlalchemy import text
+from busca import configurar_busca
+from resumo import configurar_resumo
+from models import Base, StockMovement, EquipmentTombstone, ChangeSequence, StockSummary
+
+
+# Registros copiados por transação nas reconstruções de tabela
+TAMANHO_LOTE = 5000
+
+
+def _tabela_existe(conn, tabela: str) -> bool:
+    """Verifica se a tabela existe (SQLite ou PostgreSQL)"""
+    if conn.dialect.name == 'postgresql':
+        sql = "SELECT 1 FROM information_schema.tables WHERE table_schema='public' AND table_name=:tabela"
+    else:
+        sql = "SELECT 1 FROM sqlite_master WHERE type='table' AND name=:tabela"
+    return conn.execute(text(sql), {'tabela': tabela}).fetchone() is not None
+
+
+def _coluna_existe(conn, tabela: str, coluna: str) -> bool:
+    """Verifica se a coluna existe na tabela (SQLite ou PostgreSQL)"""
+    if conn.dialect.name == 'postgresql':
+        return conn.execute(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_schema='public' AND table_name=:tabela AND column_name=:coluna"
+        ), {'tabela': tabela, 'coluna': coluna}).fetchone() is not None
+    return coluna in [row[1] for row in conn.execute(text(f"PRAGMA table_info({tabela})"))]
+
+
+def reconstruir_tabela(engine, tabela: str, ddl_nova: str, colunas: list, expressoes: list,
+                       progresso=print, tamanho_lote: int = TAMANHO_LOTE):
+    """
+    Reconstrói uma tabela SQLite copiando os dados em lotes, cada lote em sua própria
+    transação curta (o app continua gravando entre os lotes)
+
+    A cópia pode ser retomada: se for interrompida, a tabela <tabela>_new permanece e a
+    próxima execução continua a partir do maior id já copiado. A troca final (alinhamento
+    das alterações feitas durante a cópia, DROP e RENAME) acontece em uma única transação.
+    Índices e triggers da tabela original são recriados na nova.
+
+    Args:
+        ddl_nova: CREATE TABLE IF NOT EXISTS <tabela>_new (...)
+        colunas: colunas de destino
+        expressoes: expressões SELECT sobre a tabela original, na mesma ordem de colunas
+    """
+    nova = f"{tabela}_new"
+    lista_colunas = ", ".join(colunas)
+    selecao = ", ".join(expressoes)
+
+    with engine.begin() as conn:
+        conn.execute(text(ddl_nova))
+        total = conn.execute(text(f"SELECT COUNT(*) FROM {tabela}")).scalar()
+        ultimo_id = conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {nova}")).scalar()
+        copiados = conn.execute(text(f"SELECT COUNT(*) FROM {nova}")).scalar()
+
+        # Índices e triggers a recriar após a troca (autoindex de UNIQUE não tem sql)
+        objetos = [sql for (sql,) in conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = :tabela AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+        ), {'tabela': tabela})]
+
+    if copiados:
+        progresso(f"↩️ Retomando cópia de '{tabela}' a partir do id {ultimo_id} ({copiados}/{total})")
+
+    inicio = datetime.now()
+    while True:
+        with engine.begin() as conn:
+            limite = conn.execute(text(
+                f"SELECT MAX(id) FROM (SELECT id FROM {tabela} WHERE id > :ultimo ORDER BY id LIMIT :lote)"
+            ), {'ultimo': ultimo_id, 'lote': tamanho_lote}).scalar()
+
+            if limite is None:
+                break
+
+            resultado = conn.execute(text(
+                f"INSERT INTO {nova} ({lista_colunas}) SELECT {selecao} FROM {tabela} WHERE id > :ultimo AND id <= :limite"
+            ), {'ultimo': ultimo_id, 'limite': limite})
+
+        copiados += resultado.rowcount
+        ultimo_id = limite
+        progresso(f"   {copiados}/{total} registros copiados")
+
+    with engine.begin() as conn:
+        # Alinha o que mudou na tabela original durante a cópia
+        conn.execute(text(f"DELETE FROM {nova} WHERE id NOT IN (SELECT id FROM {tabela})"))
+        conn.execute(text(
+            f"INSERT OR REPLACE INTO {nova} ({lista_colunas}) "
+            f"SELECT {selecao} FROM {tabela} EXCEPT SELECT {lista_colunas} FROM {nova}"
+        ))
+
+        copiados = conn.execute(text(f"SELECT COUNT(*) FROM {nova}")).scalar()
+
+        conn.execute(text(f"DROP TABLE {tabela}"))
+        conn.execute(text(f"ALTER TABLE {nova} RENAME TO {tabela}"))
+
+        for sql in objetos:
+            conn.execute(text(sql))
+
+    duracao = (datetime.now() - inicio).total_seconds()
+    progresso(f"✅ Tabela '{tabela}' reconstruída: {copiados} registros em {duracao:.1f}s")
+
+
+def _m001_colunas_equipments(engine, progresso):
+    """Adiciona as colunas nome, data_adicao e ultima_atualizacao em bancos antigos (SQLite)"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    with engine.begin() as conn:
+        if not _tabela_existe(conn, 'equipments'):
+            return
+
+        columns = [row[1] for row in conn.execute(text("PRAGMA table_info(equipments)"))]
+
+        if 'nome' not in columns:
+            conn.execute(text("ALTER TABLE equipments ADD COLUMN nome TEXT DEFAULT ''"))
+            conn.execute(text("UPDATE equipments SET nome = 'Sem nome' WHERE nome IS NULL OR nome = ''"))
+
+        # O SQLite não aceita ADD COLUMN com DEFAULT CURRENT_TIMESTAMP: adiciona e preenche
+        for coluna in ('data_adicao', 'ultima_atualizacao'):
+            if coluna not in columns:
+                conn.execute(text(f"ALTER TABLE equipments ADD COLUMN {coluna} DATETIME"))
+                conn.execute(text(f"UPDATE equipments SET {coluna} = CURRENT_TIMESTAMP WHERE {coluna} IS NULL"))
+
+
+def _m002_remove_unique_codigo(engine, progresso):
+    """Remove o UNIQUE do código (mesmo código com NOVO e USADO) em bancos SQLite antigos"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    with engine.begin() as conn:
+        if not _tabela_existe(conn, 'equipments'):
+            return
+
+        # Índice ix_equipments_codigo criado como UNIQUE por versões antigas do modelo
+        indices = conn.execute(text("PRAGMA index_list(equipments)")).fetchall()
+        if any(idx[1] == 'ix_equipments_codigo' and idx[2] == 1 for idx in indices):
+            progresso("🔄 Recriando índice do código sem UNIQUE...")
+            conn.execute(text("DROP INDEX ix_equipments_codigo"))
+            conn.execute(text("CREATE INDEX ix_equipments_codigo ON equipments (codigo)"))
+
+        # UNIQUE declarado na coluna codigo do CREATE TABLE
+        table_sql = conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type='table' AND name='equipments'"
+        )).scalar() or ""
+
+    needs_fix = False
+    for line in table_sql.split('\n'):
+        line_upper = line.upper().strip()
+        if 'CODIGO' in line_upper and 'UNIQUE' in line_upper and 'CONSTRAINT' not in line_upper:
+            needs_fix = True
+            break
+
+    if not needs_fix:
+        return
+
+    progresso("🔄 Corrigindo constraint UNIQUE do código...")
+    reconstruir_tabela(
+        engine,
+        'equipments',
+        """
+            CREATE TABLE IF NOT EXISTS equipments_new (
+                id INTEGER PRIMARY KEY,
+                codigo TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                quantidade INTEGER NOT NULL DEFAULT 0,
+                data_adicao DATETIME DEFAULT CURRENT_TIMESTAMP,
+                ultima_atualizacao DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """,
+        ['id', 'codigo', 'nome', 'tipo', 'quantidade', 'data_adicao', 'ultima_atualizacao'],
+        ['id', 'codigo', "COALESCE(nome, 'Sem nome')", 'tipo', 'quantidade',
+         'COALESCE(data_adicao, CURRENT_TIMESTAMP)', 'COALESCE(ultima_atualizacao, CURRENT_TIMESTAMP)'],
+        progresso=progresso
+    )
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_equipments_codigo ON equipments (codigo)"))
+    progresso("✅ Constraint corrigida! Agora você pode ter o mesmo código com tipos diferentes.")
+
+
+def _m003_indice_unico_codigo_tipo(engine, progresso):
+    """Funde registros duplicados de código+tipo e cria o índice único (codigo, tipo)"""
+    with engine.begin() as conn:
+        if not _tabela_existe(conn, 'equipments'):
+            return
+
+        # Soma as quantidades duplicadas no registro mais antigo e remove os demais
+        conn.execute(text("""
+            UPDATE equipments SET quantidade = (
+                SELECT SUM(e2.quantidade) FROM equipments e2
+                WHERE e2.codigo = equipments.codigo AND e2.tipo = equipments.tipo
+            )
+            WHERE id IN (
+                SELECT MIN(id) FROM equipments GROUP BY codigo, tipo HAVING COUNT(*) > 1
+            )
+        """))
+        conn.execute(text("""
+            DELETE FROM equipments
+            WHERE id NOT IN (SELECT MIN(id) FROM equipments GROUP BY codigo, tipo)
+        """))
+        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_equipments_codigo_tipo ON equipments (codigo, tipo)"))
+
+
+def _m004_indices_busca(engine, progresso):
+    """Índices de busca por código/nome (FTS5 no SQLite, pg_trgm no PostgreSQL)"""
+    configurar_busca(engine)
+
+
+def _m005_stock_movements(engine, progresso):
+    """Cria o livro de movimentações de estoque (stock_movements) e seus índices"""
+    Base.metadata.create_all(bind=engine, tables=[StockMovement.__table__])
+
+
+def _m006_tombstones_e_marca_dagua(engine, progresso):
+    """Tabela de remoções (equipment_tombstones) e índice de equipments.ultima_atualizacao"""
+    Base.metadata.create_all(bind=engine, tables=[EquipmentTombstone.__table__])
+
+    with engine.begin() as conn:
+        if _tabela_existe(conn, 'equipments'):
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_equipments_ultima_atualizacao ON equipments (ultima_atualizacao)"))
+
+
+def _m007_sequencia_alteracoes(engine, progresso):
+    """Sequência global de alterações: change_sequence e coluna seq em equipments e equipment_tombstones"""
+    Base.metadata.create_all(bind=engine, tables=[ChangeSequence.__table__])
+
+    with engine.begin() as conn:
+        for tabela in ('equipments', 'equipment_tombstones'):
+            if not _tabela_existe(conn, tabela):
+                continue
+            if not _coluna_existe(conn, tabela, 'seq'):
+                conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN seq INTEGER"))
+            # O que já existia antes da sequência entra como sequência 1
+            conn.execute(text(f"UPDATE {tabela} SET seq = 1 WHERE seq IS NULL"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{tabela}_seq ON {tabela} (seq)"))
+
+        if not conn.execute(text("SELECT 1 FROM change_sequence WHERE nome = 'equipments'")).fetchone():
+            conn.execute(text("INSERT INTO change_sequence (nome, valor) VALUES ('equipments', 1)"))
+
+
+def _m008_resumo_estoque(engine, progresso):
+    """Resumo pré-calculado do estoque (stock_summary), mantido por triggers em equipments"""
+    Base.metadata.create_all(bind=engine, tables=[StockSummary.__table__])
+    configurar_resumo(engine)
+
+
+def _m009_indices_ranking(engine, progresso):
+    """Índices de quantidade para os maiores/menores estoques do dashboard (geral e por tipo)"""
+    with engine.begin() as conn:
+        if _tabela_existe(conn, 'equipments'):
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_equipments_quantidade ON equipments (quantidade, id)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_equipments_tipo_quantidade ON equipments (tipo, quantidade, id)"))
+
+
+def _m010_estoque_minimo(engine, progresso):
+    """Coluna minimo (ponto de reposição) e índice parcial dos itens abaixo do mínimo"""
+    with engine.begin() as conn:
+        if not _tabela_existe(conn, 'equipments'):
+            return
+        if not _coluna_existe(conn, 'equipments', 'minimo'):
+            conn.execute(text("ALTER TABLE equipments ADD COLUMN minimo INTEGER NOT NULL DEFAULT 0"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_equipments_abaixo_minimo ON equipments (tipo, codigo) "
+            "WHERE quantidade < minimo"
+        ))
+
+
+def _m011_corrige_triggers_resumo(engine, progresso):
+    """
+    Recria os triggers SQLite do stock_summary (a 008 usa CREATE TRIGGER IF NOT EXISTS e não
+    substitui os antigos, que contavam errado codigos_unicos ao trocar código ou tipo) e
+    recalcula o resumo. No PostgreSQL configurar_resumo já recria a função e os triggers
+    """
+    with engine.begin() as conn:
+        if not _tabela_existe(conn, 'stock_summary'):
+            return
+        if conn.dialect.name == 'sqlite':
+            for nome in ('stock_summary_au_quantidade', 'stock_summary_ai',
+                         'stock_summary_ad', 'stock_summary_au_chave'):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {nome}"))
+    configurar_resumo(engine)
+
+
+# Migrações em ordem: (número, descrição, função)
+MIGRACOES = [
+    (1, "Colunas nome/data_adicao/ultima_atualizacao", _m001_colunas_equipments),
+    (2, "Remove UNIQUE do código", _m002_remove_unique_codigo),
+    (3, "Índice único (codigo, tipo)", _m003_indice_unico_codigo_tipo),
+    (4, "Índices de busca (FTS5 / pg_trgm)", _m004_indices_busca),
+    (5, "Livro de movimentações (stock_movements)", _m005_stock_movements),
+    (6, "Remoções (equipment_tombstones) e índice de ultima_atualizacao", _m006_tombstones_e_marca_dagua),
+    (7, "Sequência global de alterações (change_sequence)", _m007_sequencia_alteracoes),
+    (8, "Resumo do estoque (stock_summary) mantido por triggers", _m008_resumo_estoque),
+    (9, "Índices de quantidade (maiores/menores estoques)", _m009_indices_ranking),
+    (10, "Estoque mínimo (coluna minimo e índice parcial de alertas)", _m010_estoque_minimo),
+    (11, "Corrige os triggers do resumo na troca de código/tipo", _m011_corrige_triggers_resumo),
+]
+
+
+def versao_mais_recente() -> int:
+    """Número da última migração conhecida pelo código"""
+    return MIGRACOES[-1][0]
+
+
+def versoes_aplicadas(engine) -> set:
+    """Números das migrações já registradas em schema_version"""
+    with engine.connect() as conn:
+        if not _tabela_existe(conn, 'schema_version'):
+            return set()
+        return {versao for (versao,) in conn.execute(text("SELECT versao FROM schema_version"))}
+
+
+def executar_migracoes(engine, progresso=print) -> list:
+    """
+    Executa, em ordem, as migrações ainda não registradas em schema_version
+
+    Returns:
+        list: números das migrações aplicadas nesta execução
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version (versao INTEGER PRIMARY KEY, aplicada_em TIMESTAMP)"
+        ))
+
+    aplicadas = versoes_aplicadas(engine)
+    executadas = []
+
+    for versao, descricao, migracao in MIGRACOES:
+        if versao in aplicadas:
+            continue
+
+        inicio = datetime.now()
+        migracao(engine, progresso)
+
+        with engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO schema_version (versao, aplicada_em) VALUES (:versao, :agora)"),
+                {'versao': versao, 'agora': datetime.now()}
+            )
+
+        duracao = (datetime.now() - inicio).total_seconds()
+        progresso(f"🗂️ Migração {versao:03d} aplicada: {descricao} ({duracao:.1f}s)")
+        executadas.append(versao)
+
+    return executadas
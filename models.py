@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Index, text
 from sqlalchemy.orm import DeclarativeBase
 from datetime import datetime
 import enum
@@ -24,12 +24,85 @@ class User(Base):
 
 class Equipment(Base):
     __tablename__ = 'equipments'
+    __table_args__ = (
+        # Um registro por código+tipo (alvo do ON CONFLICT das adições)
+        Index('ux_equipments_codigo_tipo', 'codigo', 'tipo', unique=True),
+        # Marca d'água da atualização incremental do snapshot
+        Index('ix_equipments_ultima_atualizacao', 'ultima_atualizacao'),
+        # Alterações depois da sequência N
+        Index('ix_equipments_seq', 'seq'),
+        # Maiores/menores estoques (ORDER BY quantidade, id ... LIMIT N), geral e por tipo
+        Index('ix_equipments_quantidade', 'quantidade', 'id'),
+        Index('ix_equipments_tipo_quantidade', 'tipo', 'quantidade', 'id'),
+        # Índice parcial: só os itens abaixo do mínimo (alertas de estoque)
+        Index('ix_equipments_abaixo_minimo', 'tipo', 'codigo',
+              sqlite_where=text('quantidade < minimo'), postgresql_where=text('quantidade < minimo')),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     codigo = Column(String, nullable=False, index=True)
     nome = Column(String, nullable=False)
     tipo = Column(String, nullable=False)  # 'NOVO' ou 'USADO'
     quantidade = Column(Integer, nullable=False, default=0)
+    minimo = Column(Integer, nullable=False, default=0, server_default='0')  # Ponto de reposição (0 = sem alerta)
     data_adicao = Column(DateTime, default=datetime.now)
     ultima_atualizacao = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    seq = Column(Integer, nullable=True)  # Sequência global da última alteração (change_sequence)
 
+
+
+class SchemaVersion(Base):
+    __tablename__ = 'schema_version'
+    
+    versao = Column(Integer, primary_key=True)
+    aplicada_em = Column(DateTime, default=datetime.now)
+
+
+class StockMovement(Base):
+    __tablename__ = 'stock_movements'
+    __table_args__ = (
+        # Consultas por período e por equipamento+período
+        Index('ix_stock_movements_criado_em', 'criado_em'),
+        Index('ix_stock_movements_equipment_criado_em', 'equipment_id', 'criado_em'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    equipment_id = Column(Integer, nullable=False)  # Sem FK: o histórico sobrevive à remoção do equipamento
+    codigo = Column(String, nullable=False)
+    tipo = Column(String, nullable=False)
+    delta = Column(Integer, nullable=False)  # Positivo = entrada, negativo = saída
+    quantidade_apos = Column(Integer, nullable=False)
+    usuario = Column(String, nullable=True)
+    motivo = Column(String, nullable=True)
+    criado_em = Column(DateTime, nullable=False, default=datetime.now)
+
+
+class EquipmentTombstone(Base):
+    __tablename__ = 'equipment_tombstones'
+    __table_args__ = (
+        Index('ix_equipment_tombstones_removido_em', 'removido_em'),
+        Index('ix_equipment_tombstones_seq', 'seq'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    equipment_id = Column(Integer, nullable=False)  # id do equipamento removido
+    codigo = Column(String, nullable=False)
+    tipo = Column(String, nullable=False)
+    removido_em = Column(DateTime, nullable=False, default=datetime.now)
+    seq = Column(Integer, nullable=True)  # Sequência global da remoção
+
+
+class ChangeSequence(Base):
+    __tablename__ = 'change_sequence'
+    
+    nome = Column(String, primary_key=True)  # 'equipments'
+    valor = Column(Integer, nullable=False, default=0)
+
+
+class StockSummary(Base):
+    __tablename__ = 'stock_summary'
+    
+    tipo = Column(String, primary_key=True)  # 'NOVO', 'USADO' ou '*' (total geral)
+    itens = Column(Integer, nullable=False, default=0)
+    quantidade = Column(BigInteger, nullable=False, default=0)
+    codigos_unicos = Column(Integer, nullable=False, default=0)
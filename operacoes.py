@@ -0,0 +1,302 @@
+"""
+Operações de escrita no estoque
+Cada alteração de saldo é um único comando SQL atômico, registrado no livro de
+movimentações (stock_movements) na mesma transação; remoções de equipamento também
+ficam em equipment_tombstones. Cada operação recebe um número da sequência global de
+alterações (coluna seq), usado por quem sincroniza "alterações depois de N".
+O commit fica com quem chama
+"""
+
+from datetime import datetime
+from sqlalchemy import update, delete, insert, select, tuple_, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import Equipment, StockMovement, EquipmentTombstone, ChangeSequence
+
+
+# No RETURNING de um INSERT ... ON CONFLICT do PostgreSQL: verdadeiro se a linha foi inserida
+# (xmax é 0 na versão nova de uma linha inserida; o DO UPDATE grava o xid da transação)
+SQL_INSERIDO_POSTGRESQL = "(xmax = 0)"
+
+
+def _insert(db: Session):
+    """Retorna o insert com suporte a ON CONFLICT do dialeto em uso"""
+    return postgresql.insert if db.bind.dialect.name == 'postgresql' else sqlite.insert
+
+
+def _gravar_adicoes(db: Session, itens: list, seq: int, atualizar_minimo: bool = False) -> list:
+    """
+    Grava as adições com um único INSERT multi-linha ... ON CONFLICT (codigo, tipo) DO UPDATE
+    SET quantidade = quantidade + excluded.quantidade RETURNING
+    Inserção ou atualização vem de um marcador explícito: (xmax = 0) no PostgreSQL; no SQLite,
+    as quantidades existentes são lidas antes na mesma transação (a sequência já reservada
+    trava a escrita no banco até o commit, então a leitura não fica desatualizada)
+
+    Args:
+        itens: [{'codigo', 'nome', 'tipo', 'quantidade', 'minimo'}], sem código+tipo repetido
+        atualizar_minimo: grava o minimo também nos registros existentes
+
+    Returns:
+        list: [{'id', 'codigo', 'nome', 'tipo', 'quantidade_anterior', 'quantidade_atual', 'inserido'}]
+    """
+    agora = datetime.now()
+    postgres = db.bind.dialect.name == 'postgresql'
+    insert = _insert(db)
+
+    anteriores = {}
+    if not postgres:
+        anteriores = {
+            (linha.codigo, linha.tipo): linha.quantidade
+            for linha in db.execute(
+                select(Equipment.codigo, Equipment.tipo, Equipment.quantidade)
+                .where(tuple_(Equipment.codigo, Equipment.tipo).in_([(i['codigo'], i['tipo']) for i in itens]))
+            )
+        }
+
+    stmt = insert(Equipment).values([{
+        'codigo': item['codigo'],
+        'nome': item['nome'],
+        'tipo': item['tipo'],
+        'quantidade': item['quantidade'],
+        'minimo': item.get('minimo') or 0,
+        'data_adicao': agora,
+        'ultima_atualizacao': agora,
+        'seq': seq,
+    } for item in itens])
+    atualizar = {
+        'quantidade': Equipment.quantidade + stmt.excluded.quantidade,
+        'ultima_atualizacao': stmt.excluded.ultima_atualizacao,
+        'seq': stmt.excluded.seq,
+    }
+    if atualizar_minimo:
+        atualizar['minimo'] = stmt.excluded.minimo
+
+    colunas = [Equipment.id, Equipment.codigo, Equipment.nome, Equipment.tipo, Equipment.quantidade]
+    if postgres:
+        colunas.append(literal_column(SQL_INSERIDO_POSTGRESQL).label('inserido'))
+    stmt = stmt.on_conflict_do_update(index_elements=['codigo', 'tipo'], set_=atualizar).returning(*colunas)
+
+    quantidades = {(item['codigo'], item['tipo']): item['quantidade'] for item in itens}
+    resultados = []
+    for linha in db.execute(stmt).all():
+        chave = (linha.codigo, linha.tipo)
+        if postgres:
+            inserido = linha.inserido
+            anterior = 0 if inserido else linha.quantidade - quantidades[chave]
+        else:
+            inserido = chave not in anteriores
+            anterior = anteriores.get(chave, 0)
+
+        resultados.append({
+            'id': linha.id,
+            'codigo': linha.codigo,
+            'nome': linha.nome,
+            'tipo': linha.tipo,
+            'quantidade_anterior': anterior,
+            'quantidade_atual': linha.quantidade,
+            'inserido': inserido,
+        })
+
+    return resultados
+
+
+def proxima_sequencia(db: Session) -> int:
+    """
+    Reserva o próximo número da sequência global de alterações
+    O UPDATE trava a linha do contador até o commit, então as sequências se tornam visíveis
+    em ordem: quem lê "alterações depois de N" nunca perde uma sequência menor gravada depois
+    """
+    return db.execute(
+        update(ChangeSequence)
+        .where(ChangeSequence.nome == 'equipments')
+        .values(valor=ChangeSequence.valor + 1)
+        .returning(ChangeSequence.valor)
+    ).scalar_one()
+
+
+def registrar_movimentacao(db: Session, equipment_id: int, codigo: str, tipo: str, delta: int,
+                           quantidade_apos: int, usuario: str = None, motivo: str = None):
+    """Acrescenta uma linha ao livro de movimentações (append-only), na transação corrente"""
+    db.execute(insert(StockMovement).values(
+        equipment_id=equipment_id,
+        codigo=codigo,
+        tipo=tipo,
+        delta=delta,
+        quantidade_apos=quantidade_apos,
+        usuario=usuario,
+        motivo=motivo or None,
+        criado_em=datetime.now()
+    ))
+
+
+def adicionar_estoque(db: Session, codigo: str, nome: str, tipo: str, quantidade: int,
+                      usuario: str = None, motivo: str = None, minimo: int = None) -> dict:
+    """
+    Adiciona quantidade ao equipamento código+tipo, criando-o se não existir, com um único
+    INSERT ... ON CONFLICT (codigo, tipo) DO UPDATE SET quantidade = quantidade + excluded.quantidade
+    RETURNING (seguro contra adições concorrentes)
+
+    Args:
+        usuario, motivo: gravados no livro de movimentações
+        minimo: novo ponto de reposição (None mantém o atual; 0 em registro novo)
+
+    Returns:
+        dict: {'id', 'nome', 'quantidade_anterior', 'quantidade_atual', 'inserido'}
+    """
+    seq = proxima_sequencia(db)
+    gravado, = _gravar_adicoes(db, [{
+        'codigo': codigo, 'nome': nome, 'tipo': tipo, 'quantidade': quantidade, 'minimo': minimo,
+    }], seq, atualizar_minimo=minimo is not None)
+
+    registrar_movimentacao(db, gravado['id'], codigo, tipo, quantidade, gravado['quantidade_atual'], usuario, motivo)
+
+    return {
+        'id': gravado['id'],
+        'nome': gravado['nome'],
+        'quantidade_anterior': gravado['quantidade_anterior'],
+        'quantidade_atual': gravado['quantidade_atual'],
+        'inserido': gravado['inserido'],
+    }
+
+
+def adicionar_estoque_em_lote(db: Session, itens: list, usuario: str = None, motivo: str = None) -> list:
+    """
+    Aplica várias adições de uma vez (ex: leituras de um leitor de código de barras) com um
+    único INSERT multi-linha ... ON CONFLICT (codigo, tipo) DO UPDATE ... RETURNING
+    Itens repetidos de código+tipo são somados antes de gravar
+
+    Args:
+        itens: [{'codigo', 'nome', 'tipo', 'quantidade'}]
+        usuario, motivo: gravados no livro de movimentações
+
+    Returns:
+        list: [{'codigo', 'nome', 'tipo', 'quantidade_adicionada', 'quantidade_atual', 'inserido'}]
+    """
+    agrupados = {}
+    for item in itens:
+        chave = (item['codigo'], item['tipo'])
+        if chave in agrupados:
+            agrupados[chave]['quantidade'] += item['quantidade']
+        else:
+            agrupados[chave] = dict(item)
+
+    if not agrupados:
+        return []
+
+    seq = proxima_sequencia(db)
+
+    resultados = []
+    for gravado in _gravar_adicoes(db, list(agrupados.values()), seq):
+        quantidade = agrupados[(gravado['codigo'], gravado['tipo'])]['quantidade']
+        registrar_movimentacao(db, gravado['id'], gravado['codigo'], gravado['tipo'], quantidade,
+                               gravado['quantidade_atual'], usuario, motivo)
+        resultados.append({
+            'codigo': gravado['codigo'],
+            'nome': gravado['nome'],
+            'tipo': gravado['tipo'],
+            'quantidade_adicionada': quantidade,
+            'quantidade_atual': gravado['quantidade_atual'],
+            'inserido': gravado['inserido'],
+        })
+
+    return resultados
+
+
+def remover_estoque(db: Session, equipment_id: int, quantidade: int, remover_tudo: bool = False,
+                    usuario: str = None, motivo: str = None) -> dict:
+    """
+    Remove quantidade do equipamento com um decremento condicional atômico:
+    UPDATE ... SET quantidade = quantidade - :q WHERE id = :id AND quantidade >= :q RETURNING
+    O registro é apagado quando a quantidade chega a zero (ou se remover_tudo), exceto se
+    tiver estoque mínimo definido: aí fica com zero, na lista de alertas
+
+    Args:
+        usuario, motivo: gravados no livro de movimentações
+
+    Returns:
+        dict: {'codigo', 'nome', 'tipo', 'quantidade_removida', 'quantidade_restante', 'removido',
+               'minimo', 'abaixo_minimo'}
+        ou None se o equipamento não existe mais ou não tem quantidade suficiente
+    """
+    colunas = (Equipment.codigo, Equipment.nome, Equipment.tipo, Equipment.quantidade, Equipment.minimo)
+    seq = proxima_sequencia(db)
+
+    if not remover_tudo:
+        linha = db.execute(
+            update(Equipment)
+            .where(Equipment.id == equipment_id, Equipment.quantidade >= quantidade)
+            .values(quantidade=Equipment.quantidade - quantidade, ultima_atualizacao=datetime.now(), seq=seq)
+            .returning(*colunas)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+
+        if linha is None:
+            return None
+
+        if linha.quantidade > 0 or linha.minimo > 0:
+            registrar_movimentacao(db, equipment_id, linha.codigo, linha.tipo, -quantidade,
+                                   linha.quantidade, usuario, motivo)
+            return {
+                'codigo': linha.codigo,
+                'nome': linha.nome,
+                'tipo': linha.tipo,
+                'quantidade_removida': quantidade,
+                'quantidade_restante': linha.quantidade,
+                'removido': False,
+                'minimo': linha.minimo,
+                'abaixo_minimo': linha.quantidade < linha.minimo,
+            }
+
+    # Remoção total, ou o decremento zerou o estoque de um item sem mínimo
+    condicoes = [Equipment.id == equipment_id]
+    if not remover_tudo:
+        condicoes.append(Equipment.quantidade == 0)
+
+    linha = db.execute(
+        delete(Equipment)
+        .where(*condicoes)
+        .returning(*colunas)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+
+    if linha is None:
+        return None
+
+    quantidade_removida = linha.quantidade if remover_tudo else quantidade
+    registrar_movimentacao(db, equipment_id, linha.codigo, linha.tipo, -quantidade_removida, 0, usuario, motivo)
+
+    # A remoção fica registrada para quem sincroniza de forma incremental
+    db.execute(insert(EquipmentTombstone).values(
+        equipment_id=equipment_id,
+        codigo=linha.codigo,
+        tipo=linha.tipo,
+        removido_em=datetime.now(),
+        seq=seq
+    ))
+
+    return {
+        'codigo': linha.codigo,
+        'nome': linha.nome,
+        'tipo': linha.tipo,
+        'quantidade_removida': quantidade_removida,
+        'quantidade_restante': 0,
+        'removido': True,
+        'minimo': linha.minimo,
+        'abaixo_minimo': False,
+    }
+
+
+def definir_minimo(db: Session, equipment_id: int, minimo: int) -> bool:
+    """
+    Define o estoque mínimo (ponto de reposição) do equipamento; 0 desativa o alerta
+
+    Returns:
+        bool: False se o equipamento não existe mais
+    """
+    resultado = db.execute(
+        update(Equipment)
+        .where(Equipment.id == equipment_id)
+        .values(minimo=minimo, ultima_atualizacao=datetime.now(), seq=proxima_sequencia(db))
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount > 0
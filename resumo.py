@@ -0,0 +1,191 @@
+"""
+Resumo pré-calculado do estoque (tabela stock_summary)
+Uma linha por tipo e uma linha '*' com o total geral, mantidas por triggers do banco
+(SQLite ou PostgreSQL) a cada insert, update e delete em equipments. Os cards e o
+gráfico por tipo do dashboard leem só essas poucas linhas, qualquer que seja o estoque.
+"""
+
+from sqlalchemy import text
+
+# Linha com os totais de todos os tipos
+TIPO_TOTAL = '*'
+
+_TRIGGERS_SQLITE = [
+    # Só a quantidade mudou (caso comum): um único UPDATE no tipo e no total
+    """
+    CREATE TRIGGER IF NOT EXISTS stock_summary_au_quantidade AFTER UPDATE OF quantidade ON equipments
+    WHEN old.codigo = new.codigo AND old.tipo = new.tipo BEGIN
+        UPDATE stock_summary SET quantidade = quantidade + new.quantidade - old.quantidade
+        WHERE tipo IN (new.tipo, '*');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stock_summary_ai AFTER INSERT ON equipments BEGIN
+        INSERT OR IGNORE INTO stock_summary (tipo, itens, quantidade, codigos_unicos) VALUES (new.tipo, 0, 0, 0);
+        UPDATE stock_summary SET itens = itens + 1, quantidade = quantidade + new.quantidade,
+            codigos_unicos = codigos_unicos + 1
+        WHERE tipo = new.tipo;
+        UPDATE stock_summary SET itens = itens + 1, quantidade = quantidade + new.quantidade,
+            codigos_unicos = codigos_unicos + (NOT EXISTS (
+                SELECT 1 FROM equipments WHERE codigo = new.codigo AND id <> new.id))
+        WHERE tipo = '*';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stock_summary_ad AFTER DELETE ON equipments BEGIN
+        UPDATE stock_summary SET itens = itens - 1, quantidade = quantidade - old.quantidade,
+            codigos_unicos = codigos_unicos - 1
+        WHERE tipo = old.tipo;
+        UPDATE stock_summary SET itens = itens - 1, quantidade = quantidade - old.quantidade,
+            codigos_unicos = codigos_unicos - (NOT EXISTS (
+                SELECT 1 FROM equipments WHERE codigo = old.codigo))
+        WHERE tipo = '*';
+    END
+    """,
+    # Mudança de código ou tipo: sai da linha antiga e entra na nova. No SQLite o NOT prefixo
+    # tem precedência menor que + e -, por isso cada NOT EXISTS fica entre parênteses
+    """
+    CREATE TRIGGER IF NOT EXISTS stock_summary_au_chave AFTER UPDATE OF codigo, tipo ON equipments
+    WHEN old.codigo <> new.codigo OR old.tipo <> new.tipo BEGIN
+        UPDATE stock_summary SET itens = itens - 1, quantidade = quantidade - old.quantidade,
+            codigos_unicos = codigos_unicos - 1
+        WHERE tipo = old.tipo;
+        INSERT OR IGNORE INTO stock_summary (tipo, itens, quantidade, codigos_unicos) VALUES (new.tipo, 0, 0, 0);
+        UPDATE stock_summary SET itens = itens + 1, quantidade = quantidade + new.quantidade,
+            codigos_unicos = codigos_unicos + 1
+        WHERE tipo = new.tipo;
+        UPDATE stock_summary SET quantidade = quantidade + new.quantidade - old.quantidade,
+            codigos_unicos = codigos_unicos
+                - (NOT EXISTS (SELECT 1 FROM equipments WHERE codigo = old.codigo))
+                + (old.codigo <> new.codigo
+                   AND NOT EXISTS (SELECT 1 FROM equipments WHERE codigo = new.codigo AND id <> new.id))
+        WHERE tipo = '*';
+    END
+    """,
+]
+
+# No PostgreSQL os triggers são por comando (FOR EACH STATEMENT) e leem as tabelas de transição:
+# triggers por linha rodam só ao fim do comando e, num INSERT de várias linhas (importação),
+# cada linha já enxergaria as outras do mesmo código. Uma só consulta aplica o saldo do comando.
+# O corpo fica só em ASCII: bancos com codificação SQL_ASCII recusam acentos no comando
+_FUNCAO_POSTGRESQL = """
+    CREATE OR REPLACE FUNCTION stock_summary_atualizar() RETURNS trigger AS $$
+    DECLARE
+        mudancas text;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            mudancas := 'SELECT codigo, tipo, quantidade, 1 AS sinal FROM novos';
+        ELSIF TG_OP = 'DELETE' THEN
+            mudancas := 'SELECT codigo, tipo, quantidade, -1 AS sinal FROM antigos';
+        ELSE
+            mudancas := 'SELECT codigo, tipo, quantidade, 1 AS sinal FROM novos '
+                        'UNION ALL SELECT codigo, tipo, quantidade, -1 FROM antigos';
+        END IF;
+
+        EXECUTE 'WITH mudancas AS (' || mudancas || '),
+            por_tipo AS (
+                SELECT tipo, SUM(sinal) AS itens, SUM(sinal * quantidade) AS quantidade
+                FROM mudancas GROUP BY tipo
+            ),
+            codigos AS (
+                SELECT codigo, SUM(sinal) AS saldo FROM mudancas GROUP BY codigo HAVING SUM(sinal) <> 0
+            ),
+            codigos_unicos AS (
+                SELECT COALESCE(SUM((atual.linhas > 0)::int - ((atual.linhas - c.saldo) > 0)::int), 0) AS saldo
+                FROM codigos c
+                CROSS JOIN LATERAL (SELECT COUNT(*) AS linhas FROM equipments e WHERE e.codigo = c.codigo) atual
+            )
+            INSERT INTO stock_summary (tipo, itens, quantidade, codigos_unicos)
+            SELECT tipo, itens, quantidade, itens FROM por_tipo
+            UNION ALL
+            SELECT ''*'', COALESCE(SUM(itens), 0), COALESCE(SUM(quantidade), 0), (SELECT saldo FROM codigos_unicos)
+            FROM por_tipo
+            ON CONFLICT (tipo) DO UPDATE SET
+                itens = stock_summary.itens + EXCLUDED.itens,
+                quantidade = stock_summary.quantidade + EXCLUDED.quantidade,
+                codigos_unicos = stock_summary.codigos_unicos + EXCLUDED.codigos_unicos';
+
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+# Tabelas de transição exigem um trigger por evento
+_TRIGGERS_POSTGRESQL = {
+    'stock_summary_insert': "AFTER INSERT ON equipments REFERENCING NEW TABLE AS novos",
+    'stock_summary_update': "AFTER UPDATE ON equipments REFERENCING OLD TABLE AS antigos NEW TABLE AS novos",
+    'stock_summary_delete': "AFTER DELETE ON equipments REFERENCING OLD TABLE AS antigos",
+}
+
+
+def configurar_resumo(engine):
+    """Cria (se necessário) os triggers que mantêm stock_summary e recalcula o resumo"""
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text(_FUNCAO_POSTGRESQL))
+            for nome, evento in _TRIGGERS_POSTGRESQL.items():
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {nome} ON equipments"))
+                conn.execute(text(
+                    f"CREATE TRIGGER {nome} {evento} FOR EACH STATEMENT EXECUTE FUNCTION stock_summary_atualizar()"
+                ))
+        else:
+            for trigger in _TRIGGERS_SQLITE:
+                conn.execute(text(trigger))
+
+        reconstruir_resumo(conn)
+
+
+def reconstruir_resumo(conn):
+    """Recalcula stock_summary a partir de equipments (na transação da conexão recebida)"""
+    if conn.dialect.name == 'postgresql':
+        # Bloqueia escritas em equipments até o commit, para nenhuma alteração escapar do recálculo
+        conn.execute(text("LOCK TABLE equipments IN SHARE ROW EXCLUSIVE MODE"))
+    conn.execute(text("DELETE FROM stock_summary"))
+    conn.execute(text("""
+        INSERT INTO stock_summary (tipo, itens, quantidade, codigos_unicos)
+        SELECT tipo, COUNT(*), COALESCE(SUM(quantidade), 0), COUNT(DISTINCT codigo)
+        FROM equipments
+        GROUP BY tipo
+    """))
+    conn.execute(text("""
+        INSERT INTO stock_summary (tipo, itens, quantidade, codigos_unicos)
+        SELECT '*', COUNT(*), COALESCE(SUM(quantidade), 0), COUNT(DISTINCT codigo)
+        FROM equipments
+    """))
+
+
+def verificar_resumo(conn) -> list:
+    """
+    Compara stock_summary com os totais calculados direto de equipments
+
+    Returns:
+        list: divergências [(tipo, coluna, valor no resumo, valor calculado)]; vazia se ok
+    """
+    resumo = {
+        tipo: (itens, quantidade, codigos)
+        for tipo, itens, quantidade, codigos in conn.execute(text(
+            "SELECT tipo, itens, quantidade, codigos_unicos FROM stock_summary"
+        ))
+    }
+
+    calculado = {
+        tipo: (itens, quantidade, codigos)
+        for tipo, itens, quantidade, codigos in conn.execute(text("""
+            SELECT tipo, COUNT(*), COALESCE(SUM(quantidade), 0), COUNT(DISTINCT codigo)
+            FROM equipments GROUP BY tipo
+            UNION ALL
+            SELECT '*', COUNT(*), COALESCE(SUM(quantidade), 0), COUNT(DISTINCT codigo)
+            FROM equipments
+        """))
+    }
+
+    divergencias = []
+    for tipo in sorted(set(resumo) | set(calculado)):
+        # Tipo que ficou sem nenhum registro permanece no resumo zerado
+        valores_resumo = resumo.get(tipo, (0, 0, 0))
+        valores_calculados = calculado.get(tipo, (0, 0, 0))
+        for coluna, no_resumo, real in zip(('itens', 'quantidade', 'codigos_unicos'), valores_resumo, valores_calculados):
+            if int(no_resumo) != int(real):
+                divergencias.append((tipo, coluna, int(no_resumo), int(real)))
+
+    return divergencias
@@ -0,0 +1,58 @@
+"""
+Snapshot incremental da lista completa de equipamentos
+Mantém em memória o último DataFrame carregado e a sequência de alteração até onde ele
+está atualizado; a cada leitura busca só os registros alterados depois dessa sequência
+e as remoções registradas em equipment_tombstones, e aplica essas mudanças ao DataFrame
+"""
+
+import threading
+import pandas as pd
+from sqlalchemy.orm import Session
+from consultas import carregar_equipamentos_df, listar_remocoes, sequencia_atual
+
+# Estado compartilhado por todas as sessões do processo (como em cache.py)
+_lock = threading.Lock()
+_snapshot = None
+_seq = None
+
+
+def obter_snapshot(db: Session) -> pd.DataFrame:
+    """
+    Retorna a lista completa de equipamentos (DataFrame indexado pelo id) atualizada
+    O primeiro acesso carrega tudo; os seguintes custam proporcional ao que mudou
+
+    O DataFrame retornado é compartilhado entre sessões e não deve ser alterado
+    """
+    global _snapshot, _seq
+
+    with _lock:
+        # Lida antes das consultas: tudo até ela já está visível; o que tiver commit
+        # durante as consultas é relido (e substituído) na próxima atualização
+        seq = sequencia_atual(db)
+
+        if _snapshot is None:
+            _snapshot = carregar_equipamentos_df(db)
+        elif seq != _seq:
+            alterados = carregar_equipamentos_df(db, desde_seq=_seq)
+            removidos = listar_remocoes(db, _seq)
+
+            if len(alterados) or removidos:
+                _snapshot = _aplicar_alteracoes(_snapshot, alterados, removidos)
+
+        _seq = seq
+        return _snapshot
+
+
+def _aplicar_alteracoes(snapshot: pd.DataFrame, alterados: pd.DataFrame, removidos: list) -> pd.DataFrame:
+    """
+    Gera o novo snapshot: tira os ids removidos ou alterados e acrescenta as versões atuais
+    (um id removido e recriado aparece em alterados e volta ao snapshot)
+    """
+    descartar = alterados.index.union(pd.Index(removidos, dtype='int64'))
+    partes = [snapshot.drop(index=descartar, errors='ignore')]
+    if len(alterados):
+        partes.append(alterados)
+
+    novo = pd.concat(partes)
+    novo['Tipo'] = novo['Tipo'].astype('category')
+    return novo
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Script de Teste - Resumo do Estoque (stock_summary)
+Aplica inserções, alterações de quantidade, troca de código, troca de tipo e remoções em
+equipamentos de teste e confere, depois de cada passo, que verificar_resumo não acha divergência
+"""
+
+import sys
+from datetime import datetime
+from sqlalchemy import text
+from database import init_db, engine
+from resumo import verificar_resumo
+
+PREFIXO = "TESTE-RESUMO-"
+
+# (descrição, comando SQL); os códigos de teste começam com PREFIXO
+PASSOS = [
+    ("Insere EQ002/NOVO, EQ002/USADO e EQ005/NOVO",
+     f"INSERT INTO equipments (codigo, nome, tipo, quantidade, data_adicao, ultima_atualizacao, seq) VALUES "
+     f"('{PREFIXO}EQ002', 'Teste', 'NOVO', 10, :agora, :agora, 0), "
+     f"('{PREFIXO}EQ002', 'Teste', 'USADO', 5, :agora, :agora, 0), "
+     f"('{PREFIXO}EQ005', 'Teste', 'NOVO', 3, :agora, :agora, 0)"),
+    ("Altera a quantidade de EQ002/NOVO",
+     f"UPDATE equipments SET quantidade = 7 WHERE codigo = '{PREFIXO}EQ002' AND tipo = 'NOVO'"),
+    ("Troca o código de EQ002/NOVO para EQ009 (EQ002 continua em USADO)",
+     f"UPDATE equipments SET codigo = '{PREFIXO}EQ009' WHERE codigo = '{PREFIXO}EQ002' AND tipo = 'NOVO'"),
+    ("Troca o tipo de EQ005 (único com esse código) para USADO",
+     f"UPDATE equipments SET tipo = 'USADO' WHERE codigo = '{PREFIXO}EQ005'"),
+    ("Troca o tipo de EQ009 para USADO",
+     f"UPDATE equipments SET tipo = 'USADO' WHERE codigo = '{PREFIXO}EQ009'"),
+    ("Troca o código de EQ005/USADO para EQ009/NOVO (código que já existe)",
+     f"UPDATE equipments SET codigo = '{PREFIXO}EQ009', tipo = 'NOVO' WHERE codigo = '{PREFIXO}EQ005'"),
+    ("Troca o código de EQ002/USADO para EQ003 (código some)",
+     f"UPDATE equipments SET codigo = '{PREFIXO}EQ003' WHERE codigo = '{PREFIXO}EQ002'"),
+    ("Remove EQ009/NOVO",
+     f"DELETE FROM equipments WHERE codigo = '{PREFIXO}EQ009' AND tipo = 'NOVO'"),
+]
+
+
+def _limpar():
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM equipments WHERE codigo LIKE '{PREFIXO}%'"))
+
+
+def main():
+    print("\n" + "=" * 70)
+    print("🧪 TESTE: Resumo do estoque mantido pelos triggers")
+    print("=" * 70)
+
+    print("\n1️⃣ Inicializando banco de dados...")
+    init_db()
+    _limpar()
+
+    with engine.begin() as conn:
+        divergencias = verificar_resumo(conn)
+    if divergencias:
+        print(f"⚠️ O resumo já diverge antes do teste: {divergencias}")
+        print("   Execute python verificar_resumo.py --corrigir e rode o teste de novo")
+        return 1
+    print("✅ Banco inicializado, resumo confere")
+
+    print("\n2️⃣ Aplicando alterações e verificando o resumo após cada uma...")
+    falhas = 0
+    try:
+        for descricao, comando in PASSOS:
+            with engine.begin() as conn:
+                conn.execute(text(comando), {'agora': datetime.now()})
+            with engine.begin() as conn:
+                divergencias = verificar_resumo(conn)
+
+            if divergencias:
+                falhas += 1
+                print(f"   ❌ {descricao}")
+                for tipo, coluna, no_resumo, real in divergencias:
+                    print(f"      - {tipo} / {coluna}: resumo {no_resumo}, calculado {real}")
+            else:
+                print(f"   ✅ {descricao}")
+    finally:
+        print("\n3️⃣ Limpando dados de teste...")
+        _limpar()
+        print("   ✅ Dados de teste removidos")
+
+    print("\n" + "=" * 70)
+    if falhas:
+        print(f"❌ {falhas} passo(s) deixaram o resumo divergente")
+        print("   Execute python verificar_resumo.py --corrigir para recalcular")
+    else:
+        print("✅ TESTE CONCLUÍDO COM SUCESSO! O resumo confere em todos os passos")
+    print("=" * 70 + "\n")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
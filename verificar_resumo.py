@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Verificação do resumo do estoque (stock_summary)
+Compara os totais mantidos pelos triggers com os calculados direto de equipments
+
+Uso:
+    python verificar_resumo.py              # só verifica (código de saída 1 se divergir)
+    python verificar_resumo.py --corrigir   # recalcula o resumo se houver divergência
+"""
+
+import argparse
+import sys
+from database import engine, init_db
+from resumo import verificar_resumo, reconstruir_resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica o resumo do estoque contra a tabela equipments")
+    parser.add_argument('--corrigir', action='store_true', help="Recalcula stock_summary se houver divergência")
+    args = parser.parse_args()
+
+    init_db()
+
+    print("\n🔍 Verificando stock_summary contra equipments...")
+    with engine.begin() as conn:
+        divergencias = verificar_resumo(conn)
+
+        if not divergencias:
+            print("✅ Resumo confere com a tabela de equipamentos")
+            return 0
+
+        print(f"⚠️ {len(divergencias)} divergência(s):")
+        for tipo, coluna, no_resumo, real in divergencias:
+            print(f"   - {tipo} / {coluna}: resumo {no_resumo}, calculado {real}")
+
+        if not args.corrigir:
+            print("\n💡 Execute com --corrigir para recalcular o resumo")
+            return 1
+
+        reconstruir_resumo(conn)
+        print("✅ Resumo recalculado")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())